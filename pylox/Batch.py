@@ -0,0 +1,150 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from .Interpreter import Interpreter
+from .ProgramCache import ProgramCache
+from .Session import Session
+
+
+class BatchResult:
+    """
+    How running one script of a batch went: the exit code ``plox`` would
+    have exited with (0, 65 for a syntax or resolution error or a script
+    that is not UTF-8, 70 for a runtime error, including running out of
+    stack, or 66 if the script could not be read), what it printed and
+    how many seconds it took.
+    """
+
+    __slots__ = ("path", "exit_code", "output", "seconds")
+
+    path: str
+    exit_code: int
+    output: str
+    seconds: float
+
+    def __init__(self, path: str, exit_code: int, output: str, seconds: float):
+        self.path = path
+        self.exit_code = exit_code
+        self.output = output
+        self.seconds = seconds
+
+    def __repr__(self):
+        return "<BatchResult {} exited {} in {:.3f}s>".format(self.path,
+                                                                self.exit_code,
+                                                                self.seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# The settings of the sessions scripts are run in, set once in each
+# worker process by ``start_worker``.
+_settings: Dict[str, Any] = {}
+
+
+def start_worker(engine: str = Interpreter.engine,
+                 scanner: str = "char",
+                 memory_map: bool = False,
+                 cache_dir: Optional[str] = None,
+                 optimize: bool = False) -> None:
+    """
+    Set up a worker process to run scripts with the given settings. The
+    ``ProgramCache``, if any, is opened once here and then shared by all
+    the scripts the worker runs.
+    """
+
+    _settings.clear()
+    _settings.update(engine=engine,
+                     scanner=scanner,
+                     memory_map=memory_map,
+                     cache=(ProgramCache(cache_dir) if cache_dir is not None
+                            else None),
+                     optimize=optimize)
+
+
+def run_script(path: str) -> BatchResult:
+    """
+    Run the script at ``path`` in a ``Session`` of its own, so that it
+    sees nothing another script defined, and capture what it prints.
+    """
+
+    stdout: StringIO = StringIO()
+    start: float = time.perf_counter()
+    session: Session = Session(sink=stdout, **_settings)
+    message: Optional[str] = None
+    try:
+        session.run_file(Path(path))
+    except OSError as error:
+        message = "Cannot read script: {}".format(error.strerror)
+        exit_code: int = 66
+    except UnicodeDecodeError as error:
+        message = "Cannot decode script: {}".format(error.reason)
+        exit_code = 65
+    except RecursionError:
+        message = "Stack overflow."
+        exit_code = 70
+    except Exception as error:
+
+        # Whatever went wrong, it only fails this script, not the batch.
+        message = "Internal error: {!r}".format(error)
+        exit_code = 70
+    else:
+        exit_code = (65 if session.had_error else
+                     70 if session.had_runtime_error else
+                     0)
+    if message is not None:
+        session.output.write("{}\n".format(message))
+        session.output.flush()
+    return BatchResult(path,
+                       exit_code,
+                       stdout.getvalue(),
+                       time.perf_counter() - start)
+
+
+def read_manifest(manifest: Union[str, Path]) -> List[str]:
+    """
+    Read the script paths listed in ``manifest``, one per line. Blank
+    lines and lines starting with "#" are skipped, and relative paths are
+    taken relative to the manifest's directory.
+    """
+
+    manifest = Path(manifest)
+    paths: List[str] = []
+    line: str
+    for line in manifest.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            paths.append(str(manifest.parent / line))
+    return paths
+
+
+def run_batch(paths: Iterable[str],
+              workers: Optional[int] = None,
+              chunk_size: int = 16,
+              engine: str = Interpreter.engine,
+              scanner: str = "char",
+              memory_map: bool = False,
+              cache_dir: Optional[str] = None,
+              optimize: bool = False) -> Iterator[BatchResult]:
+    """
+    Run the scripts at ``paths`` in a pool of ``workers`` processes (by
+    default, one per CPU) and yield their results in the same order.
+
+    Each worker is set up once (see ``start_worker``) and then runs
+    script after script, so the cost of starting a process and importing
+    pylox is paid once per worker rather than once per script. Scripts
+    are handed to workers ``chunk_size`` at a time to keep the overhead
+    of passing them between processes down.
+    """
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=start_worker,
+                             initargs=(engine,
+                                       scanner,
+                                       memory_map,
+                                       cache_dir,
+                                       optimize)) as executor:
+        yield from executor.map(run_script, paths, chunksize=chunk_size)
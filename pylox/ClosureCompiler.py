@@ -0,0 +1,731 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .Environment import Environment, Layout, Resolution, UNDEFINED
+from .ExprOrStmt import (Assign, Block, Binary, Call, Class, Expr,
+                         ExprVisitor, Expression, For, Function, If, Literal,
+                         Logical, Get, Grouping, Print, Return, Set, Stmt,
+                         StmtVisitor, Super, This, Unary, Variable, Var,
+                         While)
+from .InlineCache import InlineCache
+from .Interpreter import (Interpreter, LoxCallable, LoxClass, LoxFunction,
+                          LoxInstance, Native, Shape)
+from .PyloxRuntimeError import PyloxRuntimeError
+from .Return import Return as ReturnException
+from .Token import Token
+from .TokenType import TokenType
+
+# A compiled expression or statement. It is called with the environment
+# that is current at that point of the program and returns the value of
+# the expression (statements return ``None``).
+Closure = Callable[[Environment], Any]
+
+# Compiled code that stores a value, computed elsewhere, in a variable. It
+# is called with the current environment and the value.
+Setter = Callable[[Environment, Any], None]
+
+
+class ClosureCompiler(ExprVisitor, StmtVisitor):
+    """
+    Turn a resolved AST into nested Python closures.
+
+    Every node is compiled exactly once into a function that already holds
+    the compiled closures of its children, its operator and, for variable
+    accesses, the slot computed by the ``Resolver``. Running the result
+    therefore does no node dispatch, no operator-token comparisons and no
+    decoding of resolutions.
+    """
+
+    _interpreter: Interpreter
+
+    def __init__(self, interpreter: Interpreter):
+        self._interpreter = interpreter
+
+    def compile(self, exprs_or_stmts: List[Union[Expr, Stmt]]) -> Closure:
+        return self.compile_block(exprs_or_stmts)
+
+    def compile_single(self, expr_or_stmt: Union[Expr, Stmt]) -> Closure:
+        return expr_or_stmt.accept(self)
+
+    def compile_block(self,
+                      exprs_or_stmts: List[Union[Expr, Stmt]]) -> Closure:
+        closures: List[Closure] = [self.compile_single(expr_or_stmt)
+                                   for expr_or_stmt in exprs_or_stmts]
+        if len(closures) == 1:
+            return closures[0]
+
+        def run(env: Environment) -> None:
+            for closure in closures:
+                closure(env)
+        return run
+
+    def visit(self, expr_or_stmt: Union[Expr, Stmt]) -> Closure:
+        raise RuntimeError("Invalid expression: {}".format(expr_or_stmt))
+
+    def compile_define(self,
+                       resolution: Resolution,
+                       value_: Closure) -> Closure:
+        """
+        Compile the definition of the variable a declaration resolved to
+        ``resolution`` declares, with the value ``value_`` evaluates to.
+        """
+
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+
+            def define_local(env: Environment) -> None:
+                env.slots[index] = value_(env)
+            return define_local
+
+        # A captured local gets a new cell every time it is defined.
+        if kind == Interpreter.CELL:
+
+            def define_cell(env: Environment) -> None:
+                env.slots[index] = [value_(env)]
+            return define_cell
+
+        slots: List[Any] = self._interpreter._globals.slots
+
+        def define_global(env: Environment) -> None:
+            slots[index] = value_(env)
+        return define_global
+
+    def compile_bind(self, resolution: Resolution) -> Setter:
+        """
+        Like ``compile_define``, but for a value that is computed
+        elsewhere.
+        """
+
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+
+            def bind_local(env: Environment, value: Any) -> None:
+                env.slots[index] = value
+            return bind_local
+
+        if kind == Interpreter.CELL:
+
+            def bind_cell(env: Environment, value: Any) -> None:
+                env.slots[index] = [value]
+            return bind_cell
+
+        slots: List[Any] = self._interpreter._globals.slots
+
+        def bind_global(env: Environment, value: Any) -> None:
+            slots[index] = value
+        return bind_global
+
+    def compile_store(self, resolution: Resolution) -> Setter:
+        """
+        Compile storing a value in a variable that is known to be
+        defined, e.g., in the variable a class was just declared as.
+        """
+
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+
+            def store_local(env: Environment, value: Any) -> None:
+                env.slots[index] = value
+            return store_local
+
+        if kind == Interpreter.CELL:
+
+            def store_cell(env: Environment, value: Any) -> None:
+                env.slots[index][0] = value
+            return store_cell
+
+        slots: List[Any] = self._interpreter._globals.slots
+
+        def store_global(env: Environment, value: Any) -> None:
+            slots[index] = value
+        return store_global
+
+    def compile_get(self, name: Token, resolution: Resolution) -> Closure:
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+            return lambda env: env.slots[index]
+        if kind == Interpreter.CELL:
+            return lambda env: env.slots[index][0]
+        if kind == Interpreter.UPVALUE:
+            return lambda env: env.cells[index][0]
+        slots: List[Any] = self._interpreter._globals.slots
+        undefined: Callable[[Token], PyloxRuntimeError] = \
+            self._interpreter._globals.undefined
+
+        def get_global(env: Environment) -> Any:
+            value: Any = slots[index]
+            if value is UNDEFINED:
+                raise undefined(name)
+            return value
+        return get_global
+
+    def compile_assign(self,
+                       name: Token,
+                       resolution: Resolution,
+                       value_: Closure) -> Closure:
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+
+            def assign_local(env: Environment) -> Any:
+                value: Any = value_(env)
+                env.slots[index] = value
+                return value
+            return assign_local
+
+        if kind == Interpreter.CELL:
+
+            def assign_cell(env: Environment) -> Any:
+                value: Any = value_(env)
+                env.slots[index][0] = value
+                return value
+            return assign_cell
+
+        if kind == Interpreter.UPVALUE:
+
+            def assign_upvalue(env: Environment) -> Any:
+                value: Any = value_(env)
+                env.cells[index][0] = value
+                return value
+            return assign_upvalue
+
+        slots: List[Any] = self._interpreter._globals.slots
+        undefined: Callable[[Token], PyloxRuntimeError] = \
+            self._interpreter._globals.undefined
+
+        def assign_global(env: Environment) -> Any:
+            value: Any = value_(env)
+            if slots[index] is UNDEFINED:
+                raise undefined(name)
+            slots[index] = value
+            return value
+        return assign_global
+
+    def visit_literal_expr(self, expr: Literal) -> Closure:
+        value: Any = expr.value
+        return lambda env: value
+
+    def visit_grouping_expr(self, expr: Grouping) -> Closure:
+        return self.compile_single(expr.expr_or_stmt)
+
+    def visit_variable_expr(self, expr: Variable) -> Closure:
+        return self.compile_get(expr.name, expr.resolution)
+
+    def visit_this_expr(self, expr: This) -> Closure:
+        return self.compile_get(expr.keyword, expr.resolution)
+
+    def visit_assign_expr(self, expr: Assign) -> Closure:
+        return self.compile_assign(expr.name,
+                                   expr.resolution,
+                                   self.compile_single(expr.value))
+
+    def visit_unary_expr(self, expr: Unary) -> Closure:
+        right_: Closure = self.compile_single(expr.right)
+        operator: Token = expr.operator
+        if operator.token_type == TokenType.BANG:
+
+            def not_(env: Environment) -> bool:
+                right: Any = right_(env)
+                return right is None or right is False
+            return not_
+
+        def negate(env: Environment) -> float:
+            right: Any = right_(env)
+            if not isinstance(right, float):
+                raise PyloxRuntimeError("Operand must be a number.",
+                                        token=operator)
+            return -right
+        return negate
+
+    def visit_binary_expr(self, expr: Binary) -> Closure:
+        left_: Closure = self.compile_single(expr.left)
+        right_: Closure = self.compile_single(expr.right)
+        operator: Token = expr.operator
+        operator_type: TokenType = operator.token_type
+
+        if operator_type == TokenType.PLUS:
+
+            def add(env: Environment) -> Any:
+                left: Any = left_(env)
+                right: Any = right_(env)
+                if isinstance(left, float) and isinstance(right, float):
+                    return left + right
+                if isinstance(left, str) and isinstance(right, str):
+                    return left + right
+                raise PyloxRuntimeError("Operands must be two numbers or two "
+                                        "strings.",
+                                        token=operator)
+            return add
+
+        if operator_type == TokenType.EQUAL_EQUAL:
+            return lambda env: Interpreter.is_equal(left_(env), right_(env))
+
+        if operator_type == TokenType.BANG_EQUAL:
+            return lambda env: not Interpreter.is_equal(left_(env),
+                                                        right_(env))
+
+        function: Callable[[float, float], Any] = \
+            self.number_operators[operator_type]
+
+        def arithmetic(env: Environment) -> Any:
+            left: Any = left_(env)
+            right: Any = right_(env)
+            if isinstance(left, float) and isinstance(right, float):
+                return function(left, right)
+            raise PyloxRuntimeError("Operands must be numbers.",
+                                    token=operator)
+        return arithmetic
+
+    number_operators: Dict[TokenType, Callable[[float, float], Any]] = \
+        {TokenType.GREATER:       lambda left, right: left > right,
+         TokenType.GREATER_EQUAL: lambda left, right: left >= right,
+         TokenType.LESS:          lambda left, right: left < right,
+         TokenType.LESS_EQUAL:    lambda left, right: left <= right,
+         TokenType.MINUS:         lambda left, right: left - right,
+         TokenType.SLASH:         lambda left, right: left/right,
+         TokenType.STAR:          lambda left, right: left*right}
+
+    def visit_logical_expr(self, expr: Logical) -> Closure:
+        left_: Closure = self.compile_single(expr.left)
+        right_: Closure = self.compile_single(expr.right)
+        if expr.operator.token_type == TokenType.OR:
+
+            def or_(env: Environment) -> Any:
+                left: Any = left_(env)
+                if left is not None and left is not False: return left
+                return right_(env)
+            return or_
+
+        def and_(env: Environment) -> Any:
+            left: Any = left_(env)
+            if left is None or left is False: return left
+            return right_(env)
+        return and_
+
+    def visit_call_expr(self, expr: Call) -> Closure:
+        if isinstance(expr.callee, Get):
+            return self.compile_invoke(expr, expr.callee)
+        callee_: Closure = self.compile_single(expr.callee)
+        arguments_: List[Closure] = [self.compile_single(argument)
+                                     for argument in expr.arguments]
+        paren: Token = expr.paren
+        line_number: int = paren.line_number
+        interpreter: Interpreter = self._interpreter
+
+        def call_value(callee: Any, arguments: List[Any]) -> Any:
+            if not isinstance(callee, LoxCallable):
+                raise PyloxRuntimeError("Can only call functions and "
+                                        "classes.",
+                                        paren)
+            if len(arguments) != callee.arity:
+                raise PyloxRuntimeError("Expected {} arguments but got {}."
+                                        .format(callee.arity,
+                                                len(arguments)),
+                                        paren)
+            try:
+                return callee.call(interpreter, arguments)
+            except PyloxRuntimeError as error:
+                raise error.at(line_number)
+
+        # Natives are passed the values of the arguments directly, rather
+        # than in a list, when there are few of them.
+        if not arguments_:
+            def call_0(env: Environment) -> Any:
+                callee: Any = callee_(env)
+                if type(callee) is Native and callee.arity == 0:
+                    try:
+                        return callee.function()
+                    except PyloxRuntimeError as error:
+                        raise error.at(line_number)
+                return call_value(callee, [])
+            return call_0
+        if len(arguments_) == 1:
+            argument_: Closure = arguments_[0]
+
+            def call_1(env: Environment) -> Any:
+                callee: Any = callee_(env)
+                if type(callee) is Native and callee.arity == 1:
+                    try:
+                        return callee.function(argument_(env))
+                    except PyloxRuntimeError as error:
+                        raise error.at(line_number)
+                return call_value(callee, [argument_(env)])
+            return call_1
+        if len(arguments_) == 2:
+            first_: Closure = arguments_[0]
+            second_: Closure = arguments_[1]
+
+            def call_2(env: Environment) -> Any:
+                callee: Any = callee_(env)
+                if type(callee) is Native and callee.arity == 2:
+                    try:
+                        return callee.function(first_(env), second_(env))
+                    except PyloxRuntimeError as error:
+                        raise error.at(line_number)
+                return call_value(callee, [first_(env), second_(env)])
+            return call_2
+
+        def call(env: Environment) -> Any:
+            callee: Any = callee_(env)
+            return call_value(callee,
+                              [argument(env) for argument in arguments_])
+        return call
+
+    def compile_invoke(self, expr: Call, get: Get) -> Closure:
+        """
+        Compile a method call, which passes the instance to the method as
+        its receiver instead of creating a bound method first.
+        """
+
+        object__: Closure = self.compile_single(get.object)
+        arguments_: List[Closure] = [self.compile_single(argument)
+                                     for argument in expr.arguments]
+        name: Token = get.name
+        lexeme: str = name.lexeme
+        cache: InlineCache = InlineCache(lexeme)
+        interpreter: Interpreter = self._interpreter
+
+        def invoke(env: Environment) -> Any:
+            object_: Any = object__(env)
+            if not isinstance(object_, LoxInstance):
+                raise PyloxRuntimeError("Only instances have properties.",
+                                        name)
+            shape: Shape = object_.shape
+            slot: Optional[int] = \
+                cache.slot if shape is cache.shape else cache.field(shape)
+            if slot is not None:
+                return interpreter.call(expr,
+                                        object_.values[slot],
+                                        [argument(env)
+                                         for argument in arguments_])
+            klass: LoxClass = object_.klass
+            method: Optional[LoxFunction] = \
+                cache.method if klass is cache.klass else cache.lookup(klass)
+            if method is None:
+                raise PyloxRuntimeError("Undefined property '{}'."
+                                        .format(lexeme),
+                                        name)
+            arguments: List[Any] = [argument(env) for argument in arguments_]
+            if len(arguments) != method.arity:
+                raise PyloxRuntimeError("Expected {} arguments but got {}."
+                                        .format(method.arity,
+                                                len(arguments)),
+                                        expr.paren)
+            return method.invoke(interpreter, object_, arguments)
+        return invoke
+
+    def visit_get_expr(self, expr: Get) -> Closure:
+        object__: Closure = self.compile_single(expr.object)
+        name: Token = expr.name
+        lexeme: str = name.lexeme
+        cache: InlineCache = InlineCache(lexeme)
+
+        def get(env: Environment) -> Any:
+            object_: Any = object__(env)
+            if not isinstance(object_, LoxInstance):
+                raise PyloxRuntimeError("Only instances have properties.",
+                                        name)
+            shape: Shape = object_.shape
+            slot: Optional[int] = \
+                cache.slot if shape is cache.shape else cache.field(shape)
+            if slot is not None:
+                return object_.values[slot]
+            klass: LoxClass = object_.klass
+            method: Optional[LoxFunction] = \
+                cache.method if klass is cache.klass else cache.lookup(klass)
+            if method is None:
+                raise PyloxRuntimeError("Undefined property '{}'."
+                                        .format(lexeme),
+                                        name)
+            return method.bind(object_)
+        return get
+
+    def visit_set_expr(self, expr: Set) -> Closure:
+        object__: Closure = self.compile_single(expr.object)
+        value_: Closure = self.compile_single(expr.value)
+        name: Token = expr.name
+        cache: InlineCache = InlineCache(name.lexeme)
+
+        def set_(env: Environment) -> Any:
+            object_: Any = object__(env)
+            if not isinstance(object_, LoxInstance):
+                raise PyloxRuntimeError("Only instances have fields.", name)
+            value: Any = value_(env)
+            shape: Shape = object_.shape
+            slot: Optional[int] = \
+                cache.slot if shape is cache.shape else cache.field(shape)
+            if slot is None:
+                object_.add_field(name.lexeme, value)
+            else:
+                object_.values[slot] = value
+            return value
+        return set_
+
+    def visit_super_expr(self, expr: Super) -> Closure:
+        super_class_: Closure = self.compile_get(expr.keyword,
+                                                 expr.resolution)
+        object__: Closure = self.compile_get(expr.keyword, expr.receiver)
+        method_name: Token = expr.method
+        cache: InlineCache = InlineCache(method_name.lexeme)
+
+        def super_(env: Environment) -> Any:
+            super_class: LoxClass = super_class_(env)
+            object_: LoxInstance = object__(env)
+            method: Optional[LoxFunction] = cache.lookup(super_class)
+            if method is None:
+                raise PyloxRuntimeError("Undefined property '{}'."
+                                        .format(method_name.lexeme),
+                                        method_name)
+            return method.bind(object_)
+        return super_
+
+    def visit_expression_stmt(self, stmt: Expression) -> Closure:
+        expression: Closure = self.compile_single(stmt.expression)
+        if not self._interpreter.session.repl:
+            return expression
+        write: Callable[[str], None] = self._interpreter.session.output.write
+
+        def expression_repl(env: Environment) -> None:
+            write(Interpreter.stringify(expression(env)) + "\n")
+        return expression_repl
+
+    def visit_print_stmt(self, stmt: Print) -> Closure:
+        expression: Closure = self.compile_single(stmt.expression)
+        stringify: Callable[[Any], str] = Interpreter.stringify
+        write: Callable[[str], None] = self._interpreter.session.output.write
+
+        def print_(env: Environment) -> None:
+            write(stringify(expression(env)) + "\n")
+        return print_
+
+    def visit_var_stmt(self, stmt: Var) -> Closure:
+        initializer: Closure = lambda env: None
+        if stmt.initializer is not None:
+            initializer = self.compile_single(stmt.initializer)
+        return self.compile_define(stmt.resolution, initializer)
+
+    def visit_block_stmt(self, stmt: Block) -> Closure:
+        return self.compile_block(stmt.exprs_or_stmts)
+
+    def visit_if_stmt(self, stmt: If) -> Closure:
+        condition_: Closure = self.compile_single(stmt.condition)
+        then_branch: Closure = self.compile_single(stmt.then_branch)
+        if stmt.else_branch is None:
+
+            def if_(env: Environment) -> None:
+                condition: Any = condition_(env)
+                if condition is not None and condition is not False:
+                    then_branch(env)
+            return if_
+
+        else_branch: Closure = self.compile_single(stmt.else_branch)
+
+        def if_else(env: Environment) -> None:
+            condition: Any = condition_(env)
+            if condition is not None and condition is not False:
+                then_branch(env)
+            else:
+                else_branch(env)
+        return if_else
+
+    def visit_while_stmt(self, stmt: While) -> Closure:
+        condition_: Closure = self.compile_single(stmt.condition)
+        body: Closure = self.compile_single(stmt.body)
+
+        def while_(env: Environment) -> None:
+            condition: Any = condition_(env)
+            while condition is not None and condition is not False:
+                body(env)
+                condition = condition_(env)
+        return while_
+
+    def visit_for_stmt(self, stmt: For) -> Closure:
+        initializer: Closure = lambda env: None
+        if stmt.initializer is not None:
+            initializer = self.compile_single(stmt.initializer)
+        body: Closure = self.compile_single(stmt.body)
+        increment: Closure = lambda env: None
+        if stmt.increment is not None:
+            increment = self.compile_single(stmt.increment)
+
+        counter: Optional[Tuple[int, float]] = \
+            self._interpreter.counter(stmt)
+        if counter is not None:
+            return self.compile_count(stmt, initializer, body, increment,
+                                      *counter)
+
+        if stmt.condition is None:
+
+            def for_ever(env: Environment) -> None:
+                initializer(env)
+                while True:
+                    body(env)
+                    increment(env)
+            return for_ever
+
+        condition_: Closure = self.compile_single(stmt.condition)
+
+        def for_(env: Environment) -> None:
+            initializer(env)
+            condition: Any = condition_(env)
+            while condition is not None and condition is not False:
+                body(env)
+                increment(env)
+                condition = condition_(env)
+        return for_
+
+    def compile_count(self,
+                      stmt: For,
+                      initializer: Closure,
+                      body: Closure,
+                      increment: Closure,
+                      slot: int,
+                      step: float) -> Closure:
+        """
+        Compile a loop that ``Interpreter.counter`` recognized; see
+        ``Interpreter.count``.
+        """
+
+        condition: Binary = stmt.condition
+        limit_: Closure = self.compile_single(condition.right)
+        operator: Token = condition.operator
+        compare: Callable[[float, float], bool] = \
+            Interpreter.comparisons[operator.token_type]
+
+        def count(env: Environment) -> None:
+            initializer(env)
+            slots: List[Any] = env.slots
+            while True:
+                value: Any = slots[slot]
+                limit: Any = limit_(env)
+                if not (isinstance(value, float) and
+                        isinstance(limit, float)):
+                    raise PyloxRuntimeError("Operands must be numbers.",
+                                            token=operator)
+                if not compare(value, limit):
+                    break
+                body(env)
+                value = slots[slot]
+                if isinstance(value, float):
+                    slots[slot] = value + step
+                else:
+                    increment(env)
+        return count
+
+    def visit_return_stmt(self, stmt: Return) -> Closure:
+        if stmt.value is None:
+
+            def return_nil(env: Environment) -> None:
+                raise ReturnException(None)
+            return return_nil
+
+        value: Closure = self.compile_single(stmt.value)
+
+        def return_(env: Environment) -> None:
+            raise ReturnException(value(env))
+        return return_
+
+    def visit_function_stmt(self, stmt: Function) -> Closure:
+        layout: Layout = stmt.layout
+        body: Closure = self.compile_block(stmt.body)
+
+        def function(env: Environment) -> CompiledFunction:
+            return CompiledFunction(stmt,
+                                    layout,
+                                    env.capture(layout.upvalues),
+                                    False,
+                                    body)
+
+        resolution: Resolution = stmt.resolution
+        if resolution[0] != Interpreter.CELL:
+            return self.compile_define(resolution, function)
+
+        # The function captures itself, so its cell has to exist before
+        # the function is created.
+        bind: Setter = self.compile_bind(resolution)
+        store: Setter = self.compile_store(resolution)
+
+        def recursive_function(env: Environment) -> None:
+            bind(env, None)
+            store(env, function(env))
+        return recursive_function
+
+    def visit_class_stmt(self, stmt: Class) -> Closure:
+        name: Token = stmt.name
+        super_class_: Optional[Closure] = None
+        bind_super: Optional[Setter] = None
+        if stmt.super_class is not None:
+            super_class_ = self.compile_single(stmt.super_class)
+            bind_super = self.compile_bind(stmt.super_resolution)
+        methods_: List[Function] = stmt.methods
+        layouts: List[Layout] = [method.layout for method in methods_]
+        bodies: List[Closure] = [self.compile_block(method.body)
+                                 for method in methods_]
+        bind: Setter = self.compile_bind(stmt.resolution)
+        store: Setter = self.compile_store(stmt.resolution)
+
+        def class_(env: Environment) -> None:
+            super_class: Any = None
+            if super_class_ is not None:
+                super_class = super_class_(env)
+                if not isinstance(super_class, LoxClass):
+                    raise PyloxRuntimeError("Superclass must be a class.",
+                                            stmt.super_class.name)
+            bind(env, None)
+            if bind_super is not None:
+                bind_super(env, super_class)
+            methods: Dict[str, LoxFunction] = {}
+            for method, layout, body in zip(methods_, layouts, bodies):
+                methods[method.name.lexeme] = \
+                    CompiledFunction(method,
+                                     layout,
+                                     env.capture(layout.upvalues),
+                                     method.name.lexeme == "init",
+                                     body)
+            store(env, LoxClass(name.lexeme, super_class, methods))
+        return class_
+
+
+class CompiledFunction(LoxFunction):
+
+    _body: Closure
+
+    def __init__(self,
+                 declaration: Function,
+                 layout: Layout,
+                 cells: List[List[Any]],
+                 is_initializer: bool,
+                 body: Closure,
+                 receiver: Optional[LoxInstance] = None):
+        super().__init__(declaration, layout, cells, is_initializer, receiver)
+        self._body = body
+
+    def bind(self, instance: LoxInstance) -> "CompiledFunction":
+        return CompiledFunction(self._declaration,
+                                self._layout,
+                                self._cells,
+                                self._is_initializer,
+                                self._body,
+                                instance)
+
+    def invoke(self,
+               interpreter: Interpreter,
+               receiver: Optional[LoxInstance],
+               arguments: List[Any]) -> Any:
+        try:
+            self._body(self.environment(receiver, arguments))
+        except ReturnException as return_value:
+            if self._is_initializer:
+                return receiver
+            return return_value.value
+        if self._is_initializer:
+            return receiver
+        return None
@@ -1,66 +1,134 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .PyloxRuntimeError import PyloxRuntimeError
 from .Token import Token
 
 
-class Environment:
+# Marks a global slot whose name has been seen but not defined yet.
+UNDEFINED: Any = object()
+
+# Where a variable lives, as (kind, index); see ``Interpreter``.
+Resolution = Sequence[int]
 
-    enclosing: "Environment"
-    values: Dict[str, Any] = {}
 
-    def __init__(self, enclosing: Optional["Environment"] = None):
-        self.enclosing = enclosing
-        self.values = {}
+class Environment:
+    """
+    The locals of one call of a function, or of the top-level script, at
+    run time.
+
+    Every local of the function has its own slot in ``slots``, at the
+    index the ``Resolver`` assigned to it, so blocks need no environment of
+    their own. A local that closures capture is stored in a cell (a
+    one-element list) instead, which the function and its closures share.
+    ``cells`` holds the cells that the function itself captured when it was
+    created; nothing else of the enclosing calls is kept alive.
+    """
+
+    slots: List[Any]
+    cells: List[List[Any]]
+
+    def __init__(self,
+                 slots: Optional[List[Any]] = None,
+                 cells: Optional[List[List[Any]]] = None):
+        self.slots = [] if slots is None else slots
+        self.cells = [] if cells is None else cells
 
     def __str__(self):
-        return "Environment: {}".format(self.values)
+        return "Environment: {}".format(self.slots)
 
     def __repr__(self):
         return str(self)
 
-    def get(self, name: Token) -> Any:
-
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
-
-        if self.enclosing is not None:
-            return self.enclosing.get(name)
+    def capture(self, upvalues: List[Tuple[bool, int]]) -> List[List[Any]]:
+        """
+        Collect the cells a closure with the given ``Layout.upvalues``
+        captures from this environment.
+        """
+
+        return [self.slots[index] if is_local else self.cells[index]
+                for is_local, index in upvalues]
+
+
+class Layout:
+    """
+    The shape of a function's ``Environment``, as worked out by the
+    ``Resolver``.
+
+    A call has ``slot_count`` slots, starting with the receiver (for
+    methods) and the parameters. ``cell_slots`` lists those of them that
+    closures capture, so they are moved into cells on entry. Each of
+    ``upvalues`` says where the function's closure finds a captured
+    variable when it is created: ``(True, slot)`` for a slot, holding a
+    cell, of the enclosing ``Environment`` and ``(False, index)`` for one
+    of the enclosing function's own ``cells``.
+    """
+
+    receiver: bool
+    slot_count: int
+    cell_slots: List[int]
+    upvalues: List[Tuple[bool, int]]
+
+    def __init__(self, receiver: bool = False):
+        self.receiver = receiver
+        self.slot_count = 0
+        self.cell_slots = []
+        self.upvalues = []
+
+
+class GlobalEnvironment(Environment):
+    """
+    The outermost scope.
+
+    Every global name is interned into an index the first time it is
+    seen, either when it is defined or when the ``Resolver`` finds a use
+    of it, so that each use site can cache its index and read
+    ``slots[index]`` directly. Slots of names that have not been defined
+    yet hold ``UNDEFINED``.
+    """
+
+    indices: Dict[str, int]
+    names: List[str]
+
+    def __init__(self):
+        super().__init__()
+        self.indices = {}
+        self.names = []
 
-        raise PyloxRuntimeError("Undefined variable '{}'.".format(name.lexeme),
-                                token=name)
+    def __str__(self):
+        return "Environment: {}".format(
+            {name: value for name, value in zip(self.names, self.slots)
+             if value is not UNDEFINED})
+
+    def index(self, name: str) -> int:
+        index: Optional[int] = self.indices.get(name)
+        if index is None:
+            index = len(self.names)
+            self.indices[name] = index
+            self.names.append(name)
+            self.slots.append(UNDEFINED)
+        return index
+
+    def undefined(self, name: Token) -> PyloxRuntimeError:
+        return PyloxRuntimeError("Undefined variable '{}'."
+                                 .format(name.lexeme),
+                                 token=name)
 
-    def assign(self, name: Token, value: Any) -> None:
+    def define(self, name: str, value: Any) -> None:
+        self.slots[self.index(name)] = value
 
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
-            return
+    def get(self, name: Token) -> Any:
+        return self.get_global(self.index(name.lexeme), name)
 
-        if self.enclosing is not None:
-            self.enclosing.assign(name, value)
-            return
+    def get_global(self, index: int, name: Token) -> Any:
+        value: Any = self.slots[index]
+        if value is UNDEFINED:
+            raise self.undefined(name)
+        return value
 
-        raise PyloxRuntimeError("Undefined variable '{}'."
-                                .format(name.lexeme),
-                                name)
+    def assign(self, name: Token, value: Any) -> None:
+        self.assign_global(self.index(name.lexeme), name, value)
 
-    def define(self, name: str, value: Any) -> None:
-        self.values[name] = value
-
-    def get_at(self, distance: int, name: str) -> Any:
-        return self.ancestor(distance).values[name]
-
-    def assign_at(self,
-                  distance: int,
-                  name: Token,
-                  value: Any) -> None:
-        x = self.ancestor(distance).values
-        x[name.lexeme] = value
-
-    def ancestor(self, distance: int) -> "Environment":
-        environment: Environment = self
-        i: int = 0
-        while i < distance:
-            environment = environment.enclosing
-            i += 1
-        return environment
+    def assign_global(self, index: int, name: Token, value: Any) -> None:
+        if self.slots[index] is UNDEFINED:
+            raise self.undefined(name)
+        self.slots[index] = value
@@ -1,5 +1,7 @@
 from typing import Any, Optional
 
+from .Environment import Layout, Resolution
+from .InlineCache import InlineCache
 from .Token import Token
 from typing import List, Union
 
@@ -14,28 +16,74 @@ class ExprVisitor:
     def visit(self, expr: "Expr") -> "ExprVisitor":
         return self
 
+    def visit_assign_expr(self, expr: "Assign") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_binary_expr(self, expr: "Binary") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_call_expr(self, expr: "Call") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_get_expr(self, expr: "Get") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_grouping_expr(self, expr: "Grouping") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_literal_expr(self, expr: "Literal") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_logical_expr(self, expr: "Logical") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_set_expr(self, expr: "Set") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_super_expr(self, expr: "Super") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_this_expr(self, expr: "This") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_unary_expr(self, expr: "Unary") -> Optional[Any]:
+        return self.visit(expr)
+
+    def visit_variable_expr(self, expr: "Variable") -> Optional[Any]:
+        return self.visit(expr)
+
 
 class Expr:
 
+    __slots__ = ()
+
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
         return visitor.visit(self)
 
 
 class Assign(Expr):
 
+    __slots__ = ("name", "value", "resolution")
+
     name: Token
     value: Expr
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+
     def __init__(self, name: Token, value: Expr):
         self.name = name
         self.value = value
+        self.resolution = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_assign_expr(self)
 
 
 class Binary(Expr):
 
+    __slots__ = ("left", "operator", "right")
+
     left: Expr
     operator: Token
     right: Expr
@@ -46,11 +94,13 @@ class Binary(Expr):
         self.right = right
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_binary_expr(self)
 
 
 class Call(Expr):
 
+    __slots__ = ("callee", "paren", "arguments")
+
     callee: Expr
     paren: Token
     arguments: List[Union[Expr, "Stmt"]]
@@ -61,46 +111,62 @@ class Call(Expr):
         self.arguments = arguments
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_call_expr(self)
 
 
 class Get(Expr):
 
+    __slots__ = ("object", "name", "cache")
+
     object: Expr
     name: Token
 
+    # Filled in after parsing.
+    cache: Optional[InlineCache]
+
     def __init__(self, object: Expr, name: Token):
         self.object = object
         self.name = name
+        self.cache = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_get_expr(self)
 
 
 class Grouping(Expr):
 
+    __slots__ = ("expr_or_stmt",)
+
     expr_or_stmt: Union[Expr, "Stmt"]
 
     def __init__(self, expr_or_stmt: Union[Expr, "Stmt"]):
         self.expr_or_stmt = expr_or_stmt
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_grouping_expr(self)
 
 
 class Literal(Expr):
 
+    __slots__ = ("value", "line_number")
+
     value: Any
 
+    # Filled in after parsing.
+    line_number: Optional[int]
+
     def __init__(self, value: Any):
         self.value = value
+        self.line_number = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_literal_expr(self)
 
 
 class Logical(Expr):
 
+    __slots__ = ("left", "operator", "right")
+
     left: Expr
     operator: Token
     right: Expr
@@ -111,50 +177,74 @@ class Logical(Expr):
         self.right = right
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_logical_expr(self)
 
 
 class Set(Expr):
 
+    __slots__ = ("object", "name", "value", "cache")
+
     object: Expr
     name: Token
     value: Expr
 
+    # Filled in after parsing.
+    cache: Optional[InlineCache]
+
     def __init__(self, object: Expr, name: Token, value: Expr):
         self.object = object
         self.name = name
         self.value = value
+        self.cache = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_set_expr(self)
 
 
 class Super(Expr):
 
+    __slots__ = ("keyword", "method", "resolution", "receiver", "cache")
+
     keyword: Token
     method: Token
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+    receiver: Optional[Resolution]
+    cache: Optional[InlineCache]
+
     def __init__(self, keyword: Token, method: Token):
         self.keyword = keyword
         self.method = method
+        self.resolution = None
+        self.receiver = None
+        self.cache = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_super_expr(self)
 
 
 class This(Expr):
 
+    __slots__ = ("keyword", "resolution")
+
     keyword: Token
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+
     def __init__(self, keyword: Token):
         self.keyword = keyword
+        self.resolution = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_this_expr(self)
 
 
 class Unary(Expr):
 
+    __slots__ = ("operator", "right")
+
     operator: Token
     right: Expr
 
@@ -163,18 +253,24 @@ class Unary(Expr):
         self.right = right
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_unary_expr(self)
 
 
 class Variable(Expr):
 
+    __slots__ = ("name", "resolution")
+
     name: Token
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+
     def __init__(self, name: Token):
         self.name = name
+        self.resolution = None
 
     def accept(self, visitor: ExprVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_variable_expr(self)
 
 
 class StmtVisitor:
@@ -185,67 +281,140 @@ class StmtVisitor:
     def visit(self, expr: "Stmt") -> "StmtVisitor":
         return self
 
+    def visit_block_stmt(self, stmt: "Block") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_expression_stmt(self, stmt: "Expression") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_class_stmt(self, stmt: "Class") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_for_stmt(self, stmt: "For") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_function_stmt(self, stmt: "Function") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_if_stmt(self, stmt: "If") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_print_stmt(self, stmt: "Print") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_return_stmt(self, stmt: "Return") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_var_stmt(self, stmt: "Var") -> Optional[Any]:
+        return self.visit(stmt)
+
+    def visit_while_stmt(self, stmt: "While") -> Optional[Any]:
+        return self.visit(stmt)
+
 
 class Stmt:
 
+    __slots__ = ()
+
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
         return visitor.visit(self)
 
 
 class Block(Stmt):
 
+    __slots__ = ("exprs_or_stmts",)
+
     exprs_or_stmts: List[Union[Expr, Stmt]]
 
     def __init__(self, exprs_or_stmts: List[Union[Expr, Stmt]]):
         self.exprs_or_stmts = exprs_or_stmts
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_block_stmt(self)
 
 
 class Expression(Stmt):
 
+    __slots__ = ("expression",)
+
     expression: Union[Expr, Stmt]
 
     def __init__(self, expression: Union[Expr, Stmt]):
         self.expression = expression
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_expression_stmt(self)
 
 
 class Class(Stmt):
 
+    __slots__ = ("name", "super_class", "methods", "resolution", "super_resolution")
+
     name: Token
     super_class: Optional[Variable]
     methods: List["Function"]
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+    super_resolution: Optional[Resolution]
+
     def __init__(self, name: Token, super_class: Optional[Variable], methods: List["Function"]):
         self.name = name
         self.super_class = super_class
         self.methods = methods
+        self.resolution = None
+        self.super_resolution = None
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_class_stmt(self)
+
+
+class For(Stmt):
+
+    __slots__ = ("initializer", "condition", "increment", "body")
+
+    initializer: Optional[Stmt]
+    condition: Optional[Union[Expr, Stmt]]
+    increment: Optional[Union[Expr, Stmt]]
+    body: Stmt
+
+    def __init__(self, initializer: Optional[Stmt], condition: Optional[Union[Expr, Stmt]], increment: Optional[Union[Expr, Stmt]], body: Stmt):
+        self.initializer = initializer
+        self.condition = condition
+        self.increment = increment
+        self.body = body
+
+    def accept(self, visitor: StmtVisitor) -> Optional[Any]:
+        return visitor.visit_for_stmt(self)
 
 
 class Function(Stmt):
 
+    __slots__ = ("name", "params", "body", "resolution", "layout")
+
     name: Token
     params: List[Token]
     body: List[Union[Expr, Stmt]]
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+    layout: Optional[Layout]
+
     def __init__(self, name: Token, params: List[Token], body: List[Union[Expr, Stmt]]):
         self.name = name
         self.params = params
         self.body = body
+        self.resolution = None
+        self.layout = None
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_function_stmt(self)
 
 
 class If(Stmt):
 
+    __slots__ = ("condition", "then_branch", "else_branch")
+
     condition: Union[Expr, Stmt]
     then_branch: Union[Expr, Stmt]
     else_branch: Union[Expr, Stmt]
@@ -256,22 +425,26 @@ class If(Stmt):
         self.else_branch = else_branch
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_if_stmt(self)
 
 
 class Print(Stmt):
 
+    __slots__ = ("expression",)
+
     expression: Union[Expr, Stmt]
 
     def __init__(self, expression: Union[Expr, Stmt]):
         self.expression = expression
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_print_stmt(self)
 
 
 class Return(Stmt):
 
+    __slots__ = ("keyword", "value")
+
     keyword: Token
     value: Union[Expr, Stmt]
 
@@ -280,24 +453,32 @@ class Return(Stmt):
         self.value = value
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_return_stmt(self)
 
 
 class Var(Stmt):
 
+    __slots__ = ("name", "initializer", "resolution")
+
     name: Token
     initializer: Union[Expr, Stmt]
 
+    # Filled in after parsing.
+    resolution: Optional[Resolution]
+
     def __init__(self, name: Token, initializer: Union[Expr, Stmt]):
         self.name = name
         self.initializer = initializer
+        self.resolution = None
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_var_stmt(self)
 
 
 class While(Stmt):
 
+    __slots__ = ("condition", "body")
+
     condition: Union[Expr, Stmt]
     body: Stmt
 
@@ -306,4 +487,4 @@ class While(Stmt):
         self.body = body
 
     def accept(self, visitor: StmtVisitor) -> Optional[Any]:
-        return visitor.visit(self)
+        return visitor.visit_while_stmt(self)
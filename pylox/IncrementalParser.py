@@ -0,0 +1,249 @@
+from typing import Dict, Iterator, List, Optional, Set, Union
+
+import pylox
+from .Environment import Layout
+from .ExprOrStmt import Expr, Literal, Stmt
+from .Interpreter import Interpreter
+from .Parser import Parser
+from .Resolver import Resolver
+from .Scanner import Scanner
+from .Token import Token
+from .TokenType import TokenType
+
+
+def nodes(expr_or_stmt: Union[Expr, Stmt]) -> Iterator[Union[Expr, Stmt]]:
+    """
+    Yield ``expr_or_stmt`` and every node below it.
+    """
+
+    stack: List[Union[Expr, Stmt]] = [expr_or_stmt]
+    while stack:
+        node: Union[Expr, Stmt] = stack.pop()
+        yield node
+        name: str
+        for name in type(node).__slots__:
+            value: object = getattr(node, name)
+            if isinstance(value, (Expr, Stmt)):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value
+                             if isinstance(item, (Expr, Stmt)))
+
+
+class Declaration:
+    """
+    A top-level declaration (or statement) of an ``IncrementalParser``'s
+    source: the offsets of the start of its first token, the end of its
+    last one and the end of the token after it, which the parser looked
+    at to decide where it ended (it may start an "else"), what it parsed
+    to and how many slots of the script's ``Environment`` it uses.
+
+    Whether there were errors is kept separately for the text before its
+    first token, since an edit there rescans that text without parsing
+    the declaration again.
+    """
+
+    __slots__ = ("start", "end", "lookahead_end", "expr_or_stmt",
+                 "slot_count", "had_error", "had_leading_error")
+
+    start: int
+    end: int
+    lookahead_end: int
+    expr_or_stmt: Optional[Union[Expr, Stmt]]
+    slot_count: int
+    had_error: bool
+    had_leading_error: bool
+
+    def __init__(self, start: int, had_leading_error: bool):
+        self.start = start
+        self.end = start
+        self.lookahead_end = start
+        self.expr_or_stmt = None
+        self.slot_count = 0
+        self.had_error = False
+        self.had_leading_error = had_leading_error
+
+    def __repr__(self):
+        return "<Declaration {}:{} {!r}>".format(self.start,
+                                                 self.end,
+                                                 self.expr_or_stmt)
+
+    def shift(self, offset: int, lines: int) -> None:
+        self.start += offset
+        self.end += offset
+        self.lookahead_end += offset
+        if lines and self.expr_or_stmt is not None:
+            seen: Set[int] = set()
+            node: Union[Expr, Stmt]
+            for node in nodes(self.expr_or_stmt):
+                if (isinstance(node, Literal)
+                        and node.line_number is not None):
+                    node.line_number += lines
+                    continue
+                name: str
+                for name in type(node).__slots__:
+                    value: object = getattr(node, name)
+                    tokens: List[object] = (value if isinstance(value, list)
+                                            else [value])
+                    token: object
+                    for token in tokens:
+                        if isinstance(token, Token) and id(token) not in seen:
+                            seen.add(id(token))
+                            token.line_number += lines
+
+
+class IncrementalParser:
+    """
+    Scans, parses and resolves a source, and then keeps the result up to
+    date as the source is edited by re-scanning and re-parsing only the
+    top-level declarations that an edit touches.
+
+    Scanning starts again at the end of the last declaration before the
+    edit and stops as soon as it reaches the first token of a declaration
+    that lay wholly after it: the rest of the source is then the same
+    text, scanned and parsed from the same state, so those declarations
+    and what was resolved for them are kept, only moved. Top-level
+    declarations are resolved independently of each other, since globals
+    are looked up by name, so each is resolved on its own; the script's
+    ``Layout`` just needs as many slots as the largest of them uses.
+
+    Scanning is done a token at a time by a ``Scanner``, so that no more
+    of the source is scanned than is parsed.
+    """
+
+    interpreter: Interpreter
+    source: str
+    declarations: List[Declaration]
+    had_trailing_error: bool
+    token_start: int
+    token_end: int
+    consumed_end: int
+    lookahead_error: bool
+
+    def __init__(self, interpreter: Interpreter, source: str = ""):
+        self.interpreter = interpreter
+        self.source = ""
+        self.declarations = []
+        self.had_trailing_error = False
+        self.token_start = 0
+        self.token_end = 0
+        self.consumed_end = 0
+        self.lookahead_error = False
+        self.edit(0, 0, source)
+
+    def __repr__(self):
+        return "<IncrementalParser of {} declarations>".format(
+            len(self.declarations))
+
+    @property
+    def exprs_or_stmts(self) -> List[Union[Expr, Stmt]]:
+        return [declaration.expr_or_stmt
+                for declaration in self.declarations]
+
+    @property
+    def had_error(self) -> bool:
+        return self.had_trailing_error or any(
+            declaration.had_error or declaration.had_leading_error
+            for declaration in self.declarations)
+
+    def edit(self,
+             start: int,
+             end: int,
+             text: str) -> List[Union[Expr, Stmt]]:
+        """
+        Replace ``source[start:end]`` with ``text`` and return the program
+        as it now parses.
+
+        Errors are reported as the declarations they are in are parsed
+        again, and the ``had_error`` of the interpreter's session is left
+        set if any declaration of the program has errors, whether reported
+        now or by an earlier edit.
+        """
+
+        old: List[Declaration] = self.declarations
+        offset: int = len(text) - (end - start)
+        lines: int = text.count("\n") - self.source.count("\n", start, end)
+        self.source = self.source[:start] + text + self.source[end:]
+
+        # A declaration is parsed again if the edit starts before the token
+        # after it has been scanned, including the two characters past it
+        # that scanning a number may look at.
+        first: int = 0
+        while first < len(old) and old[first].lookahead_end + 2 <= start:
+            first += 1
+        resume: int = old[first - 1].end if first else 0
+        resync: Dict[int, int] = {old[index].start + offset: index
+                                  for index in range(first, len(old))
+                                  if old[index].start >= end}
+
+        parsed: List[Declaration] = []
+        session: pylox.Session = self.interpreter.session
+        parser: Parser = Parser(self.tokens(resume), session)
+        rest: int = len(old)
+        while True:
+            if self.token_start in resync:
+                rest = resync[self.token_start]
+                old[rest].had_leading_error = self.lookahead_error
+                break
+            if parser.is_at_end():
+                self.had_trailing_error = self.lookahead_error
+                break
+            declaration: Declaration = Declaration(self.token_start,
+                                                   self.lookahead_error)
+            self.lookahead_error = False
+            session.had_error = False
+            declaration.expr_or_stmt = parser.declaration()
+            declaration.end = self.consumed_end
+            declaration.lookahead_end = self.token_end
+            if (declaration.expr_or_stmt is not None and
+                not session.had_error):
+                Resolver(self.interpreter).resolve_single(
+                    declaration.expr_or_stmt)
+                declaration.slot_count = self.interpreter._script.slot_count
+            declaration.had_error = session.had_error
+            parsed.append(declaration)
+
+        declaration: Declaration
+        for declaration in old[rest:]:
+            declaration.shift(offset, lines)
+        self.declarations = old[:first] + parsed + old[rest:]
+
+        script: Layout = Layout()
+        script.slot_count = max((declaration.slot_count
+                                 for declaration in self.declarations),
+                                default=0)
+        self.interpreter.resolve_script(script)
+        session.had_error = self.had_error
+        return self.exprs_or_stmts
+
+    def tokens(self, start: int) -> Iterator[Token]:
+        """
+        Scan the source from ``start``, which must be where a token ends
+        (or 0), as the parser asks for tokens, keeping the offsets of the
+        last one and whether there were errors in scanning it, which are
+        kept out of the session's ``had_error`` until the parser moves past
+        it.
+        """
+
+        session: pylox.Session = self.interpreter.session
+        scanner: Scanner = Scanner(self.source, session)
+        scanner.current = start
+        scanner.line_number = 1 + self.source.count("\n", 0, start)
+        self.token_start = self.token_end = start
+        self.lookahead_error = False
+        while True:
+            self.consumed_end = self.token_end
+            had_error: bool = session.had_error or self.lookahead_error
+            session.had_error = False
+            while not scanner.tokens and not scanner.is_at_end():
+                scanner.start = scanner.current
+                scanner.scan_token()
+            self.lookahead_error = session.had_error
+            session.had_error = had_error
+            if not scanner.tokens:
+                break
+            self.token_start = scanner.start
+            self.token_end = scanner.current
+            yield scanner.tokens.pop()
+        self.token_start = self.token_end = len(self.source)
+        yield Token(TokenType.EOF, "", None, scanner.line_number)
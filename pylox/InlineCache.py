@@ -0,0 +1,45 @@
+from typing import Any, Optional
+
+
+class InlineCache:
+    """
+    A monomorphic cache for the lookups at one property access site.
+
+    It remembers the class of the last instance seen at the site and what
+    ``name`` resolved to on that class, so as long as the site keeps
+    seeing instances of one class a lookup is a single identity check.
+    Separately, it remembers the last instance shape seen and the slot
+    ``name`` occupies in it, if any, so field reads and writes on
+    instances built the same way are a check and an index.
+    """
+
+    name: str
+    klass: Any
+    method: Any
+    shape: Any
+    slot: Optional[int]
+
+    def __init__(self, name: str):
+        self.name = name
+        self.klass = None
+        self.method = None
+        self.shape = None
+        self.slot = None
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "<cache {}>".format(self.name)
+
+    def lookup(self, klass: Any) -> Optional[Any]:
+        if klass is not self.klass:
+            self.method = klass.find_method(self.name)
+            self.klass = klass
+        return self.method
+
+    def field(self, shape: Any) -> Optional[int]:
+        if shape is not self.shape:
+            self.slot = shape.slots.get(self.name)
+            self.shape = shape
+        return self.slot
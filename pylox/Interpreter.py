@@ -1,286 +1,485 @@
-import time
-from typing import Any, Dict, List, Optional, Union
+import operator
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import pylox
-from .Environment import Environment
+from .Environment import Environment, GlobalEnvironment, Layout, Resolution
 from .ExprOrStmt import (Assign, Block, Binary, Call, Class, Expr,
-                         ExprVisitor, Expression, Function, If, Literal,
+                         ExprVisitor, Expression, For, Function, If, Literal,
                          Logical, Get, Grouping, Print, Return, Set, Stmt,
                          StmtVisitor, Super, This, Unary, Variable, Var,
                          While)
+from .InlineCache import InlineCache
 from .PyloxRuntimeError import PyloxRuntimeError
 from .Return import Return as ReturnException
 from .Token import Token
 from .TokenType import TokenType
 
-
 class Interpreter(ExprVisitor, StmtVisitor):
 
-    _globals: Environment = Environment()
-    _environment: Environment = _globals
-    _locals: Dict[Expr, int] = {}
-
-    def __init__(self) -> None:
-        self._globals.define("clock", Clock())
+    # The session the interpreter reports runtime errors to.
+    session: "pylox.Session"
+    _globals: GlobalEnvironment
+    _environment: Environment
+
+    # What the ``Resolver`` works out is stored on the nodes themselves,
+    # so that it goes away with the program. Each variable access has a
+    # ``resolution`` saying where it finds its variable, as (kind, index):
+    # LOCAL and CELL variables are in slot ``index`` of the current
+    # ``Environment`` (a CELL slot holds a cell, since closures capture
+    # the variable), UPVALUE ones are the current function's captured
+    # cell ``index`` and GLOBAL ones are at ``index`` in ``_globals``.
+    # A ``super`` expression also has the ``receiver`` it finds "this"
+    # in. Declarations are resolved the same way (a subclass's implicit
+    # "super" in its ``super_resolution``) and every function has its
+    # ``Layout``; that of the top-level script is kept in ``_script``.
+    _script: Layout
+    GLOBAL: int = -1
+    LOCAL: int = 0
+    CELL: int = 1
+    UPVALUE: int = 2
+
+    # Execution engines: "tree" walks the AST node by node, "closure"
+    # first compiles the resolved AST into nested Python closures (see
+    # ``ClosureCompiler``) and "vm" compiles it to bytecode for the stack
+    # machine in ``pylox.vm``.
+    engines: Tuple[str, ...] = ("tree", "closure", "vm")
+    engine: str = "tree"
+
+    # The comparisons a counting loop (see ``counter``) may test its
+    # counter with.
+    comparisons: Dict[TokenType, Callable[[float, float], bool]] = \
+        {TokenType.GREATER:       operator.gt,
+         TokenType.GREATER_EQUAL: operator.ge,
+         TokenType.LESS:          operator.lt,
+         TokenType.LESS_EQUAL:    operator.le}
+
+    def __init__(self, session: Optional["pylox.Session"] = None) -> None:
+        self.session = session if session is not None else pylox.Lox.Lox
+        self._globals = GlobalEnvironment()
+        self._environment = Environment()
+        self._script = Layout()
+        name: str
+        value: Native
+        for name, value in natives.items():
+            self._globals.define(name, value)
 
     def interpret(self, exprs_or_stmts: List[Union[Expr, Stmt]]) -> None:
+        self._environment = Environment([None]*self._script.slot_count)
         try:
-            for expr_or_stmt in exprs_or_stmts:
-                self.execute(expr_or_stmt)
+            if self.engine == "closure":
+                program: Callable[[Environment], Any] = \
+                    pylox.ClosureCompiler(self).compile(exprs_or_stmts)
+                program(self._environment)
+            elif self.engine == "vm":
+                script: pylox.vm.VMFunction = \
+                    pylox.vm.Compiler(self._globals,
+                                      self.session).compile(exprs_or_stmts)
+
+                # Don't run a chunk the compiler could not encode.
+                if not self.session.had_error:
+                    pylox.vm.VM(self).run(script)
+            else:
+                for expr_or_stmt in exprs_or_stmts:
+                    self.execute(expr_or_stmt)
         except PyloxRuntimeError as error:
-            pylox.Lox.Lox.run_time_error(error)
+            self.session.run_time_error(error)
+        finally:
+            self.session.output.flush()
 
     def visit(self,
               expr_or_stmt: Union[Expr, Stmt]) -> Optional[Any]:
+        raise RuntimeError("Invalid expression: {}".format(expr_or_stmt))
 
-        value: Optional[Any]
-        left: Optional[Any]
-        righ: Optional[Any]
-        if isinstance(expr_or_stmt, Literal):
+    def visit_literal_expr(self, expr: Literal) -> Optional[Any]:
+        return expr.value
 
-            return expr_or_stmt.value
+    def visit_unary_expr(self, expr: Unary) -> Optional[Any]:
+        right: Optional[Any] = self.evaluate(expr.right)
+        if expr.operator.token_type == TokenType.BANG:
+            return not self.is_truthy(right)
+        elif expr.operator.token_type == TokenType.MINUS:
+            Interpreter.check_number_operand(expr.operator, right)
+            return -float(right)
 
-        elif isinstance(expr_or_stmt, Unary):
-
-            right = self.evaluate(expr_or_stmt.right)
-            if expr_or_stmt.operator.token_type == TokenType.BANG:
-                return not self.is_truthy(right)
-            elif expr_or_stmt.operator.token_type == TokenType.MINUS:
-                Interpreter.check_number_operand(expr_or_stmt.operator, right)
-                return -float(right)
-
-            # Unreachable.
-            return None
+        # Unreachable.
+        return None
 
-        elif isinstance(expr_or_stmt, Variable):
-
-            return self.look_up_variable(expr_or_stmt.name,
-                                         expr_or_stmt)
-
-        elif isinstance(expr_or_stmt, Grouping):
-
-            return self.evaluate(expr_or_stmt.expr_or_stmt)
-
-        elif isinstance(expr_or_stmt, Binary):
-
-            left = self.evaluate(expr_or_stmt.left)
-            right = self.evaluate(expr_or_stmt.right)
-
-            if expr_or_stmt.operator.token_type == TokenType.GREATER:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left) > float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.GREATER_EQUAL:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left) >= float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.LESS:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left) < float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.LESS_EQUAL:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left) <= float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.MINUS:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left) - float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.PLUS:
-                if isinstance(left, float) and isinstance(right, float):
-                    return float(left) + float(right)
-                if isinstance(left, str) and isinstance(right, str):
-                    return str(left) + str(right)
-                raise PyloxRuntimeError("Operands must be two numbers or two strings.",
-                                        token=expr_or_stmt.operator)
-            elif expr_or_stmt.operator.token_type == TokenType.SLASH:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left)/float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.STAR:
-                Interpreter.check_number_operands(expr_or_stmt.operator, left, right)
-                return float(left)*float(right)
-            elif expr_or_stmt.operator.token_type == TokenType.BANG_EQUAL:
-                return not self.is_equal(left, right)
-            elif expr_or_stmt.operator.token_type == TokenType.EQUAL_EQUAL:
-                return Interpreter.is_equal(left, right)
-
-            # Unreachable.
-            return None
+    def visit_variable_expr(self, expr: Variable) -> Optional[Any]:
+        return self.look_up_variable(expr.name, expr)
+
+    def visit_grouping_expr(self, expr: Grouping) -> Optional[Any]:
+        return self.evaluate(expr.expr_or_stmt)
+
+    def visit_binary_expr(self, expr: Binary) -> Optional[Any]:
+        left: Optional[Any] = self.evaluate(expr.left)
+        right: Optional[Any] = self.evaluate(expr.right)
+
+        operator_type: TokenType = expr.operator.token_type
+        if operator_type == TokenType.GREATER:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left) > float(right)
+        elif operator_type == TokenType.GREATER_EQUAL:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left) >= float(right)
+        elif operator_type == TokenType.LESS:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left) < float(right)
+        elif operator_type == TokenType.LESS_EQUAL:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left) <= float(right)
+        elif operator_type == TokenType.MINUS:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left) - float(right)
+        elif operator_type == TokenType.PLUS:
+            if isinstance(left, float) and isinstance(right, float):
+                return float(left) + float(right)
+            if isinstance(left, str) and isinstance(right, str):
+                return str(left) + str(right)
+            raise PyloxRuntimeError("Operands must be two numbers or two strings.",
+                                    token=expr.operator)
+        elif operator_type == TokenType.SLASH:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left)/float(right)
+        elif operator_type == TokenType.STAR:
+            Interpreter.check_number_operands(expr.operator, left, right)
+            return float(left)*float(right)
+        elif operator_type == TokenType.BANG_EQUAL:
+            return not self.is_equal(left, right)
+        elif operator_type == TokenType.EQUAL_EQUAL:
+            return Interpreter.is_equal(left, right)
+
+        # Unreachable.
+        return None
 
-        elif isinstance(expr_or_stmt, Call):
+    def visit_call_expr(self, expr: Call) -> Optional[Any]:
+        if isinstance(expr.callee, Get):
+            return self.invoke(expr, expr.callee)
 
-            callee: Any = self.evaluate(expr_or_stmt.callee)
+        callee: Any = self.evaluate(expr.callee)
+        if type(callee) is Native and callee.arity == len(expr.arguments):
+            return self.call_native(expr, callee)
+        return self.call(expr, callee, self.evaluate_arguments(expr))
 
-            arguments: List[Union[Expr, Stmt]] = []
-            argument: Union[Expr, Stmt]
-            for i in range(len(expr_or_stmt.arguments)):
-                argument = expr_or_stmt.arguments[i]
-                arguments.append(self.evaluate(argument))
+    def call_native(self, expr: Call, callee: "Native") -> Any:
+        """
+        Call a native, passing it the values of the arguments directly
+        rather than collecting them in a list first.
+        """
 
-            if not isinstance(callee, LoxCallable):
-                raise PyloxRuntimeError("Can only call functions and classes.",
-                                        expr_or_stmt.paren)
+        arguments: List[Union[Expr, Stmt]] = expr.arguments
+        function: Callable[..., Any] = callee.function
+        try:
+            if not arguments:
+                return function()
+            if len(arguments) == 1:
+                return function(self.evaluate(arguments[0]))
+            if len(arguments) == 2:
+                return function(self.evaluate(arguments[0]),
+                                self.evaluate(arguments[1]))
+            return function(*[self.evaluate(argument)
+                              for argument in arguments])
+        except PyloxRuntimeError as error:
+            raise error.at(expr.paren.line_number)
+
+    def invoke(self, expr: Call, get: Get) -> Optional[Any]:
+        """
+        Call a method without creating a bound method for it first, by
+        passing the instance as the receiver.
+        """
+
+        object_: Any = self.evaluate(get.object)
+        if not isinstance(object_, LoxInstance):
+            return self.call(expr,
+                             self.get_property(object_, get),
+                             self.evaluate_arguments(expr))
+        cache: InlineCache = self.inline_cache(get)
+        slot: Optional[int] = object_.field(get.name, cache)
+        if slot is not None:
+            return self.call(expr,
+                             object_.values[slot],
+                             self.evaluate_arguments(expr))
+        method: LoxFunction = object_.find_method(get.name, cache)
+        arguments: List[Any] = self.evaluate_arguments(expr)
+        if len(arguments) != method.arity:
+            raise PyloxRuntimeError("Expected {} arguments but got {}."
+                                    .format(method.arity,
+                                            len(arguments)),
+                                    expr.paren)
+        return method.invoke(self, object_, arguments)
+
+    def evaluate_arguments(self, expr: Call) -> List[Any]:
+        arguments: List[Any] = []
+        argument: Union[Expr, Stmt]
+        for argument in expr.arguments:
+            arguments.append(self.evaluate(argument))
+        return arguments
 
-            func: LoxCallable = callee
-            if len(arguments) != func.arity:
-                raise PyloxRuntimeError("Expected {} arguments but got {}."
-                                        .format(func.arity,
-                                                len(arguments)),
-                                        expr_or_stmt.paren)
+    def call(self,
+             expr: Call,
+             callee: Any,
+             arguments: List[Any]) -> Optional[Any]:
+        if not isinstance(callee, LoxCallable):
+            raise PyloxRuntimeError("Can only call functions and classes.",
+                                    expr.paren)
+
+        func: LoxCallable = callee
+        if len(arguments) != func.arity:
+            raise PyloxRuntimeError("Expected {} arguments but got {}."
+                                    .format(func.arity,
+                                            len(arguments)),
+                                    expr.paren)
+        try:
             return func.call(self, arguments)
+        except PyloxRuntimeError as error:
+            raise error.at(expr.paren.line_number)
 
-        elif isinstance(expr_or_stmt, Get):
+    def visit_get_expr(self, expr: Get) -> Optional[Any]:
+        return self.get_property(self.evaluate(expr.object), expr)
 
-            object_: Any = self.evaluate(expr_or_stmt.object)
-            if isinstance(object_, LoxInstance):
-                return object_.get(expr_or_stmt.name)
-            raise PyloxRuntimeError("Only instances have properties.",
-                                    expr_or_stmt.name)
+    def get_property(self, object_: Any, expr: Get) -> Optional[Any]:
+        if isinstance(object_, LoxInstance):
+            return object_.get(expr.name, self.inline_cache(expr))
+        raise PyloxRuntimeError("Only instances have properties.",
+                                expr.name)
 
-        elif isinstance(expr_or_stmt, Expression):
+    @staticmethod
+    def inline_cache(expr: Union[Get, Set, Super]) -> InlineCache:
+        if expr.cache is None:
+            expr.cache = InlineCache((expr.method if isinstance(expr, Super)
+                                      else expr.name).lexeme)
+        return expr.cache
+
+    def visit_expression_stmt(self, stmt: Expression) -> None:
+        value: Optional[Any] = self.evaluate(stmt.expression)
+        if self.session.repl:
+            self.session.output.write(Interpreter.stringify(value) + "\n")
+        return None
 
-            value = self.evaluate(expr_or_stmt.expression)
-            if pylox.Lox.Lox.repl: print(Interpreter.stringify(value))
-            return None
+    def visit_function_stmt(self, stmt: Function) -> None:
+
+        # Declare the function first: it may capture itself.
+        self.define(stmt.resolution, None)
+        layout: Layout = stmt.layout
+        function: LoxFunction = \
+            LoxFunction(stmt,
+                        layout,
+                        self._environment.capture(layout.upvalues),
+                        False)
+        self.store(stmt.resolution, stmt.name, function)
+        return None
 
-        elif isinstance(expr_or_stmt, Function):
+    def visit_print_stmt(self, stmt: Print) -> None:
+        value: Optional[Any] = self.evaluate(stmt.expression)
+        self.session.output.write(Interpreter.stringify(value) + "\n")
+        return None
 
-            function: LoxFunction = LoxFunction(expr_or_stmt,
-                                                self._environment,
-                                                False)
-            self._environment.define(expr_or_stmt.name.lexeme, function)
-            return None
+    def visit_return_stmt(self, stmt: Return) -> None:
+        value: Optional[Any] = None
+        if stmt.value is not None:
+            value = self.evaluate(stmt.value)
+        raise ReturnException(value)
+
+    def visit_var_stmt(self, stmt: Var) -> None:
+        value: Optional[Any] = None
+        if stmt.initializer is not None:
+            value = self.evaluate(stmt.initializer)
+        self.define(stmt.resolution, value)
+        return None
 
-        elif isinstance(expr_or_stmt, Print):
+    def visit_assign_expr(self, expr: Assign) -> Optional[Any]:
+        value: Optional[Any] = self.evaluate(expr.value)
+        self.store(expr.resolution, expr.name, value)
+        return value
 
-            value = self.evaluate(expr_or_stmt.expression)
-            print(Interpreter.stringify(value))
-            return None
+    def visit_block_stmt(self, stmt: Block) -> None:
 
-        if isinstance(expr_or_stmt, Return):
+        # The block's locals have their own slots in the current
+        # environment.
+        for expr_or_stmt in stmt.exprs_or_stmts:
+            self.execute(expr_or_stmt)
+        return None
 
-            value = None
-            if expr_or_stmt.value is not None:
-                value = self.evaluate(expr_or_stmt.value)
-            raise ReturnException(value)
+    def visit_class_stmt(self, stmt: Class) -> None:
+        super_class: Any = None
+        if stmt.super_class is not None:
+            super_class = self.evaluate(stmt.super_class)
+            if not isinstance(super_class, LoxClass):
+                raise PyloxRuntimeError("Superclass must be a class.",
+                                        stmt.super_class.name)
+        self.define(stmt.resolution, None)
+        if stmt.super_class is not None:
+            self.define(stmt.super_resolution, super_class)
+        methods: Dict[str, LoxFunction] = {}
+        method: Function
+        for method in stmt.methods:
+            layout: Layout = method.layout
+            function: LoxFunction = \
+                LoxFunction(method,
+                            layout,
+                            self._environment.capture(layout.upvalues),
+                            method.name.lexeme == "init")
+            methods[method.name.lexeme] = function
+        klass: LoxClass = LoxClass(stmt.name.lexeme,
+                                   super_class,
+                                   methods)
+        self.store(stmt.resolution, stmt.name, klass)
+        return None
 
-        elif isinstance(expr_or_stmt, Var):
+    def visit_if_stmt(self, stmt: If) -> None:
+        if self.is_truthy(self.evaluate(stmt.condition)):
+            self.execute(stmt.then_branch)
+        elif stmt.else_branch is not None:
+            self.execute(stmt.else_branch)
+        return None
 
-            value = None
-            if expr_or_stmt.initializer is not None:
-                value = self.evaluate(expr_or_stmt.initializer)
-            self._environment.define(expr_or_stmt.name.lexeme, value)
-            return None
+    def visit_logical_expr(self, expr: Logical) -> Optional[Any]:
+        left: Optional[Any] = self.evaluate(expr.left)
+        if expr.operator.token_type == TokenType.OR:
+            if self.is_truthy(left): return left
+        else:
+            if not self.is_truthy(left): return left
+        return self.evaluate(expr.right)
+
+    def visit_set_expr(self, expr: Set) -> Optional[Any]:
+        object_: Any = self.evaluate(expr.object)
+        if not isinstance(object_, LoxInstance):
+            raise PyloxRuntimeError("Only instances have fields.",
+                                    expr.name)
+
+        value: Any = self.evaluate(expr.value)
+        object_.set(expr.name, value, self.inline_cache(expr))
+        return value
+
+    def visit_super_expr(self, expr: Super) -> Optional[Any]:
+        super_class: LoxClass = self.load(expr.resolution, expr.keyword)
+        object_: LoxInstance = self.load(expr.receiver, expr.keyword)
+
+        method: LoxFunction = \
+            self.inline_cache(expr).lookup(super_class)
+        if method is None:
+            raise PyloxRuntimeError("Undefined property '{}'."
+                                    .format(expr.method.lexeme),
+                                    expr.method)
+
+        return method.bind(object_)
+
+    def visit_this_expr(self, expr: This) -> Optional[Any]:
+        return self.look_up_variable(expr.keyword, expr)
+
+    def visit_while_stmt(self, stmt: While) -> None:
+        while self.is_truthy(self.evaluate(stmt.condition)):
+            self.execute(stmt.body)
+        return None
 
-        elif isinstance(expr_or_stmt, Assign):
+    def visit_for_stmt(self, stmt: For) -> None:
+        if stmt.initializer is not None:
+            self.execute(stmt.initializer)
+        counter: Optional[Tuple[int, float]] = self.counter(stmt)
+        if counter is not None:
+            self.count(stmt, *counter)
+            return None
+        while (stmt.condition is None or
+               self.is_truthy(self.evaluate(stmt.condition))):
+            self.execute(stmt.body)
+            if stmt.increment is not None:
+                self.evaluate(stmt.increment)
+        return None
 
-            value = self.evaluate(expr_or_stmt.value)
-            distance: int = self._locals.get(expr_or_stmt)
-            if distance is not None:
-                self._environment.assign_at(distance,
-                                            expr_or_stmt.name,
-                                            value)
+    def count(self, stmt: For, slot: int, step: float) -> None:
+        """
+        Run a loop that ``counter`` recognized, comparing and stepping the
+        counter in place of evaluating the condition and the increment.
+        The counter is still read from and written back to its slot, as
+        the body may use or change it; if it is not a number by the time
+        it is stepped, the increment is evaluated, to fail as it would.
+        """
+
+        slots: List[Any] = self._environment.slots
+        condition: Binary = stmt.condition
+        compare: Callable[[float, float], bool] = \
+            self.comparisons[condition.operator.token_type]
+        while True:
+            value: Any = slots[slot]
+            limit: Any = self.evaluate(condition.right)
+            Interpreter.check_number_operands(condition.operator,
+                                              value,
+                                              limit)
+            if not compare(value, limit):
+                break
+            self.execute(stmt.body)
+            value = slots[slot]
+            if isinstance(value, float):
+                slots[slot] = value + step
             else:
-                self._globals.assign(expr_or_stmt.name, value)
-            return value
+                self.evaluate(stmt.increment)
+        return None
 
-        elif isinstance(expr_or_stmt, Block):
+    def evaluate(self, expr: Union[Expr, Stmt]) -> Optional[Any]:
+        return expr.accept(self)
 
-            self.execute_block(expr_or_stmt.exprs_or_stmts,
-                               Environment(self._environment))
+    def resolve(self,
+                expr_or_stmt: Union[Expr, Stmt],
+                resolution: Resolution) -> None:
+        expr_or_stmt.resolution = resolution
+
+    def resolve_global(self,
+                       expr_or_stmt: Union[Expr, Stmt],
+                       name: Token) -> None:
+        expr_or_stmt.resolution = (Interpreter.GLOBAL,
+                                   self._globals.index(name.lexeme))
+
+    def resolve_receiver(self, expr: Super, resolution: Resolution) -> None:
+        expr.receiver = resolution
+
+    def resolve_super_class(self, stmt: Class, resolution: Resolution) -> None:
+        stmt.super_resolution = resolution
+
+    def resolve_function(self, function: Function, layout: Layout) -> None:
+        function.layout = layout
+
+    def resolve_script(self, layout: Layout) -> None:
+        self._script = layout
+
+    def counter(self, stmt: For) -> Optional[Tuple[int, float]]:
+        """
+        If ``stmt`` is a counting loop, return the slot of its counter and
+        the step it is incremented by.
+
+        A counting loop declares its counter, tests it against a limit,
+        which may be any expression, and increments it by a constant, as
+        in ``for (var i = 0; i < n; i = i + 1)``. The counter must be a
+        plain local: one that closures capture lives in a cell, which they
+        may change at any time.
+        """
+
+        if not isinstance(stmt.initializer, Var): return None
+        resolution: Resolution = stmt.initializer.resolution
+        if resolution[0] != Interpreter.LOCAL: return None
+
+        condition: Optional[Union[Expr, Stmt]] = stmt.condition
+        if not (isinstance(condition, Binary) and
+                condition.operator.token_type in self.comparisons and
+                isinstance(condition.left, Variable) and
+                condition.left.resolution is resolution):
             return None
 
-        elif isinstance(expr_or_stmt, Class):
-
-            super_class: Any = None
-            if expr_or_stmt.super_class is not None:
-                super_class = self.evaluate(expr_or_stmt.super_class)
-                if not isinstance(super_class, LoxClass):
-                    PyloxRuntimeError("Superclass must be a class.",
-                                      expr_or_stmt.super_class.name)
-            self._environment.define(expr_or_stmt.name.lexeme, None)
-            if expr_or_stmt.super_class is not None:
-                self._environment = Environment(self._environment)
-                self._environment.define("super", super_class)
-            methods: Dict[str, LoxFunction] = {}
-            method: Function
-            for method in expr_or_stmt.methods:
-                function: LoxFunction = \
-                    LoxFunction(method,
-                                self._environment,
-                                method.name.lexeme == "init")
-                methods[method.name.lexeme] = function
-            klass: LoxClass = LoxClass(expr_or_stmt.name.lexeme,
-                                       super_class,
-                                       methods)
-            if super_class is not None:
-                self._environment = self._environment.enclosing
-            self._environment.assign(expr_or_stmt.name,
-                                     klass)
+        increment: Optional[Union[Expr, Stmt]] = stmt.increment
+        if not (isinstance(increment, Assign) and
+                increment.resolution is resolution):
             return None
-
-        elif isinstance(expr_or_stmt, If):
-
-            if self.is_truthy(self.evaluate(expr_or_stmt.condition)):
-                self.execute(expr_or_stmt.then_branch)
-            elif expr_or_stmt.else_branch is not None:
-                self.execute(expr_or_stmt.else_branch)
+        value: Union[Expr, Stmt] = increment.value
+        if not (isinstance(value, Binary) and
+                value.operator.token_type in (TokenType.PLUS,
+                                              TokenType.MINUS) and
+                isinstance(value.left, Variable) and
+                value.left.resolution is resolution and
+                isinstance(value.right, Literal) and
+                isinstance(value.right.value, float)):
             return None
-
-        elif isinstance(expr_or_stmt, Logical):
-
-            left = self.evaluate(expr_or_stmt.left)
-            if expr_or_stmt.operator.token_type == TokenType.OR:
-                if self.is_truthy(left): return left
-            else:
-                if not self.is_truthy(left): return left
-            return self.evaluate(expr_or_stmt.right)
-
-        elif isinstance(expr_or_stmt, Set):
-
-            object_: Any = self.evaluate(expr_or_stmt.object)
-            if not isinstance(object_, LoxInstance):
-                raise PyloxRuntimeError("Only instances have fields.",
-                                        expr_or_stmt.name)
-
-            value: Any = self.evaluate(expr_or_stmt.value)
-            object_.set(expr_or_stmt.name, value)
-            return value
-
-        elif isinstance(expr_or_stmt, Super):
-
-            distance: int = self._locals[expr_or_stmt]
-            super_class: LoxClass = \
-                self._environment.get_at(distance, "super")
-
-            # "this" is always one level nearer than "super"'s
-            # environment.
-            object_: LoxInstance = self._environment.get_at(distance - 1,
-                                                            "this")
-
-            method: LoxFunction = \
-                super_class.find_method(expr_or_stmt.method.lexeme)
-            if method is None:
-                raise PyloxRuntimeError("Undefined property '{}'."
-                                        .format(expr_or_stmt.method.lexeme),
-                                        expr_or_stmt.method)
-
-            return method.bind(object_)
-
-        elif isinstance(expr_or_stmt, This):
-
-            return self.look_up_variable(expr_or_stmt.keyword, expr_or_stmt)
-
-        elif isinstance(expr_or_stmt, While):
-
-            while self.is_truthy(self.evaluate(expr_or_stmt.condition)):
-                self.execute(expr_or_stmt.body)
-            return None
-
-        else:
-
-            raise RuntimeError("Invalid expression: {}".format(expr_or_stmt))
-
-    def evaluate(self, expr: Union[Expr, Stmt]) -> Optional[Any]:
-        return expr.accept(self)
-
-    def resolve(self, expr: Expr, depth: int) -> None:
-        self._locals[expr] = depth
+        step: float = value.right.value
+        if value.operator.token_type == TokenType.MINUS:
+            step = -step
+        return (resolution[1], step)
 
     def execute(self, expr_or_stmt: Union[Expr, Stmt]) -> None:
         expr_or_stmt.accept(self)
@@ -344,12 +543,49 @@ class Interpreter(ExprVisitor, StmtVisitor):
     def look_up_variable(self,
                          name: Token,
                          expr: Expr) -> Any:
-        distance: int = self._locals.get(expr)
-        if distance is not None:
-            return self._environment.get_at(distance,
-                                            name.lexeme)
+        return self.load(expr.resolution, name)
+
+    def load(self, resolution: Resolution, name: Token) -> Any:
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+            return self._environment.slots[index]
+        if kind == Interpreter.CELL:
+            return self._environment.slots[index][0]
+        if kind == Interpreter.UPVALUE:
+            return self._environment.cells[index][0]
+        return self._globals.get_global(index, name)
+
+    def store(self, resolution: Resolution, name: Token, value: Any) -> None:
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+            self._environment.slots[index] = value
+        elif kind == Interpreter.CELL:
+            self._environment.slots[index][0] = value
+        elif kind == Interpreter.UPVALUE:
+            self._environment.cells[index][0] = value
         else:
-            return self._globals.get(name)
+            self._globals.assign_global(index, name, value)
+
+    def define(self, resolution: Resolution, value: Any) -> None:
+        """
+        Bind a newly declared variable to ``value``. A captured local
+        gets a new cell, so closures created by earlier executions of
+        the declaration (e.g., in a loop) keep their own variable.
+        """
+
+        kind: int
+        index: int
+        kind, index = resolution
+        if kind == Interpreter.LOCAL:
+            self._environment.slots[index] = value
+        elif kind == Interpreter.CELL:
+            self._environment.slots[index] = [value]
+        else:
+            self._globals.slots[index] = value
 
 
 class LoxCallable:
@@ -370,40 +606,107 @@ class LoxCallable:
         raise NotImplementedError()
 
 
-class Clock(LoxCallable):
+class Native(LoxCallable):
+    """
+    A Python function exposed to Lox (see ``native``). Engines call
+    ``function`` directly with the values of the arguments, which is the
+    way to call it from Python too.
+    """
+
+    name: str
+    function: Callable[..., Any]
 
-    def __init__(self):
+    def __init__(self, name: str, arity: int, function: Callable[..., Any]):
         super().__init__(self)
+        self.name = name
+        self._arity = arity
+        self.function = function
 
-    def call(self, interpreter: Interpreter, arguments: List[Any]) -> float:
-        return time.time()
+    def call(self, interpreter: Interpreter, arguments: List[Any]) -> Any:
+        return self.function(*arguments)
 
     def __str__(self):
         return "<native fn>"
 
+    def __repr__(self):
+        return "<native fn {}/{}>".format(self.name, self._arity)
+
+
+# The natives every ``Interpreter`` defines as globals when it is created
+# (see ``native``), by name.
+natives: Dict[str, Native] = {}
+
+
+def native(arity: int,
+           name: Optional[str] = None) -> Callable[[Callable[..., Any]],
+                                                   Callable[..., Any]]:
+    """
+    Register the decorated function as a native taking ``arity``
+    arguments, named ``name`` in Lox or else after the function, e.g.::
+
+        @native(2)
+        def hypot(x: float, y: float) -> float:
+            return math.hypot(x, y)
+
+    The function is passed Lox values (floats, strings, booleans, None
+    and Lox objects) and must return one. It should check its arguments
+    and raise a ``PyloxRuntimeError`` without a location for bad ones;
+    the error is reported at the line of the call. Interpreters created
+    before a native is registered do not see it.
+    """
+
+    def register(function: Callable[..., Any]) -> Callable[..., Any]:
+        lox_name: str = name if name is not None else function.__name__
+        natives[lox_name] = Native(lox_name, arity, function)
+        return function
+    return register
+
 
 class LoxFunction(LoxCallable):
+    """
+    A function or method, holding only the cells of the variables it
+    captures from enclosing functions. A bound method also holds its
+    receiver, which is passed in the first slot of each call.
+    """
 
     _declaration: Function
-    _closure: Environment
+    _layout: Layout
+    _cells: List[List[Any]]
     _is_initializer: bool
+    _receiver: Optional["LoxInstance"]
 
     def __init__(self,
                  declaration: Function,
-                 closure: Environment,
-                 is_initializer: bool):
+                 layout: Layout,
+                 cells: List[List[Any]],
+                 is_initializer: bool,
+                 receiver: Optional["LoxInstance"] = None):
         super().__init__(self)
-        self._closure = closure
         self._declaration = declaration
+        self._layout = layout
+        self._cells = cells
         self._is_initializer = is_initializer
+        self._receiver = receiver
         self._arity = len(self._declaration.params)
 
     def bind(self, instance: "LoxInstance") -> "LoxFunction":
-        environment: Environment = Environment(self._closure)
-        environment.define("this", instance)
         return LoxFunction(self._declaration,
-                           environment,
-                           self._is_initializer)
+                           self._layout,
+                           self._cells,
+                           self._is_initializer,
+                           instance)
+
+    def environment(self,
+                    receiver: Optional["LoxInstance"],
+                    arguments: List[Any]) -> Environment:
+        layout: Layout = self._layout
+        slots: List[Any] = ([receiver, *arguments] if layout.receiver
+                            else list(arguments))
+        slots += [None]*(layout.slot_count - len(slots))
+        slot: int
+        for slot in layout.cell_slots:
+            slots[slot] = [slots[slot]]
+        return Environment(slots, self._cells)
 
     def __str__(self):
         return "<fn {}>".format(self._declaration.name.lexeme)
@@ -411,52 +714,78 @@ class LoxFunction(LoxCallable):
     def __repr__(self):
         return str(self)
 
-    def call(self, interpreter: Interpreter, arguments: List[Any]) -> None:
+    def call(self, interpreter: Interpreter, arguments: List[Any]) -> Any:
+        return self.invoke(interpreter, self._receiver, arguments)
 
-        environment: Environment = Environment(self._closure)
-        for i, param in enumerate(self._declaration.params):
-            environment.define(param.lexeme,
-                               arguments[i])
+    def invoke(self,
+               interpreter: Interpreter,
+               receiver: Optional["LoxInstance"],
+               arguments: List[Any]) -> Any:
+        """
+        Call the function with ``receiver`` as "this", as if it were
+        bound to it.
+        """
 
         try:
             interpreter.execute_block(self._declaration.body,
-                                      environment)
+                                      self.environment(receiver, arguments))
         except ReturnException as return_value:
             if self._is_initializer:
-                return self._closure.get_at(0, "this")
+                return receiver
             return return_value.value
         if self._is_initializer:
-            return self._closure.get_at(0, "this")
+            return receiver
         return None
 
 
 class LoxClass(LoxCallable):
+    """
+    A class and its methods.
+
+    ``methods`` holds the methods the class itself declares, while
+    ``method_table`` flattens in everything it inherits, so a lookup is a
+    single dict access however deep the hierarchy goes. Classes cannot
+    change once declared, so the table is built when the class is.
+    """
 
     name: str
-    superclass: "LoxClass"
+    super_class: Optional["LoxClass"]
     methods: Dict[str, LoxFunction]
+    method_table: Dict[str, LoxFunction]
+    initializer: Optional[LoxFunction]
+    shape: "Shape"
 
     def __init__(self,
                  name: str,
                  super_class: "LoxClass",
                  methods: Dict[str, LoxFunction]):
         super().__init__(self)
-        self.super_class = super_class
         self.name = name
         self.methods = methods
+        self.shape = Shape(self)
+        self.inherit(super_class)
+
+    def inherit(self, super_class: Optional["LoxClass"]) -> None:
+        self.super_class = super_class
+        self.method_table = ({} if super_class is None
+                             else dict(super_class.method_table))
+        self.method_table.update(self.methods)
+        self.initializer = self.method_table.get("init")
+
+    def add_method(self, name: str, method: LoxFunction) -> None:
+        self.methods[name] = method
+        self.method_table[name] = method
+        if name == "init":
+            self.initializer = method
 
     @property
     def arity(self) -> int:
-        initializer: Optional[LoxFunction] = self.find_method("init")
-        if initializer is None:
+        if self.initializer is None:
             return 0
-        return initializer.arity
+        return self.initializer.arity
 
     def find_method(self, name: str) -> Optional[LoxFunction]:
-        if name in self.methods:
-            return self.methods[name]
-        if self.super_class is not None:
-            return self.super_class.find_method(name)
+        return self.method_table.get(name)
 
     def __str__(self):
         return self.name
@@ -465,32 +794,97 @@ class LoxClass(LoxCallable):
              interpreter: Interpreter,
              arguments: List[Any]) -> "LoxInstance":
         instance: LoxInstance = LoxInstance(self)
-        initializer: Optional[LoxFunction] = self.find_method("init")
-        if initializer is not None:
-            initializer.bind(instance).call(interpreter, arguments)
+        if self.initializer is not None:
+            self.initializer.invoke(interpreter, instance, arguments)
         return instance
 
 
+class Shape:
+    """
+    The hidden class of a ``LoxInstance``: which slot in its ``values``
+    each of its fields occupies.
+
+    Every class starts its instances off on one empty shape, and adding a
+    field moves an instance along a transition to a shape with one more
+    slot. Transitions are cached, so instances whose fields are set in
+    the same order (typically by the same ``init``) share their shapes.
+    """
+
+    __slots__ = ("klass", "slots", "transitions")
+
+    klass: "LoxClass"
+    slots: Dict[str, int]
+    transitions: Dict[str, "Shape"]
+
+    def __init__(self, klass: "LoxClass", slots: Dict[str, int] = None):
+        self.klass = klass
+        self.slots = {} if slots is None else slots
+        self.transitions = {}
+
+    def with_field(self, name: str) -> "Shape":
+        shape: Optional[Shape] = self.transitions.get(name)
+        if shape is None:
+            slots: Dict[str, int] = dict(self.slots)
+            slots[name] = len(slots)
+            shape = self.transitions[name] = Shape(self.klass, slots)
+        return shape
+
+
 class LoxInstance:
 
+    __slots__ = ("klass", "shape", "values")
+
     klass: LoxClass
-    fields: Dict[str, Any] = {}
+    shape: Shape
+    values: List[Any]
 
     def __init__(self, klass: LoxClass):
         self.klass = klass
+        self.shape = klass.shape
+        self.values = []
+
+    @property
+    def fields(self) -> Dict[str, Any]:
+        return {name: self.values[slot]
+                for name, slot in self.shape.slots.items()}
+
+    def field(self,
+              name: Token,
+              cache: Optional[InlineCache] = None) -> Optional[int]:
+        return (self.shape.slots.get(name.lexeme) if cache is None
+                else cache.field(self.shape))
+
+    def get(self, name: Token, cache: Optional[InlineCache] = None) -> Any:
+        slot: Optional[int] = self.field(name, cache)
+        if slot is not None:
+            return self.values[slot]
+        return self.find_method(name, cache).bind(self)
+
+    def find_method(self,
+                    name: Token,
+                    cache: Optional[InlineCache] = None) -> LoxFunction:
+        method: Optional[LoxFunction] = \
+            (self.klass.find_method(name.lexeme) if cache is None
+             else cache.lookup(self.klass))
+        if method is None:
+            raise PyloxRuntimeError("Undefined property '{}'."
+                                    .format(name.lexeme),
+                                    name)
+        return method
+
+    def set(self,
+            name: Token,
+            value: Any,
+            cache: Optional[InlineCache] = None) -> None:
+        slot: Optional[int] = self.field(name, cache)
+        if slot is None:
+            self.add_field(name.lexeme, value)
+        else:
+            self.values[slot] = value
 
-    def get(self, name: Token) -> Any:
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
-        method: Optional[LoxFunction] = self.klass.find_method(name.lexeme)
-        if method is not None:
-            return method.bind(self)
-        raise PyloxRuntimeError("Undefined property '{}'."
-                                .format(name.lexeme),
-                                name)
-
-    def set(self, name: Token, value: Any) -> None:
-        self.fields[name.lexeme] = value
+    def add_field(self, name: str, value: Any) -> None:
+        self.shape = self.shape.with_field(name)
+        self.values.append(value)
 
     def __str__(self):
         return self.klass.name + " instance"
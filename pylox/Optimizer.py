@@ -0,0 +1,146 @@
+from typing import Any, List, Optional, Union
+
+from .ExprOrStmt import (Binary, Block, Expr, ExprVisitor, For, Grouping, If,
+                         Literal, Logical, Stmt, StmtVisitor, Unary, While)
+from .Interpreter import Interpreter
+from .PyloxRuntimeError import PyloxRuntimeError
+from .TokenType import TokenType
+
+
+class Optimizer(ExprVisitor, StmtVisitor):
+    """
+    Simplifies a parsed program before it is resolved.
+
+    Operators whose operands are all literals are replaced by their
+    result, groupings are unwrapped, logical operators with a literal on
+    the left are reduced to the operand they would yield, ``if``
+    statements with a literal condition are replaced by the branch that
+    would be taken and loops whose literal condition is false are
+    removed (but for the initializer of a ``for`` loop).
+
+    Results are computed by the ``Interpreter`` itself, so they are
+    exactly what it would have computed at run time; an operation that
+    would fail at run time (say, ``-"a"``) is left in place, so that it
+    still fails then, in the same way.
+    """
+
+    _interpreter: Interpreter
+
+    def __init__(self, interpreter: Interpreter):
+        self._interpreter = interpreter
+
+    def optimize_multi(
+            self,
+            exprs_or_stmts: List[Union[Expr, Stmt]]) -> List[Union[Expr, Stmt]]:
+        """
+        Simplify a list of statements, leaving out any that are removed.
+        """
+
+        optimized: List[Union[Expr, Stmt]] = []
+        expr_or_stmt: Union[Expr, Stmt]
+        for expr_or_stmt in exprs_or_stmts:
+            result: Optional[Union[Expr, Stmt]] = self.optimize(expr_or_stmt)
+            if result is not None:
+                optimized.append(result)
+        return optimized
+
+    def optimize(self,
+                 expr_or_stmt: Union[Expr, Stmt]) -> Optional[Union[Expr, Stmt]]:
+        """
+        Return the simplified form of ``expr_or_stmt``, which may be
+        ``expr_or_stmt`` itself, or None for a statement that is removed.
+        """
+
+        return expr_or_stmt.accept(self)
+
+    def optimize_body(self, stmt: Stmt) -> Stmt:
+        """
+        Simplify a statement that cannot be left out, such as a loop body.
+        """
+
+        optimized: Optional[Union[Expr, Stmt]] = self.optimize(stmt)
+        return optimized if optimized is not None else Block([])
+
+    def visit(self, expr_or_stmt: Union[Expr, Stmt]) -> Union[Expr, Stmt]:
+
+        # Any other node stays, with its sub-expressions and statements
+        # simplified.
+        name: str
+        for name in type(expr_or_stmt).__slots__:
+            value: Any = getattr(expr_or_stmt, name)
+            if isinstance(value, (Expr, Stmt)):
+                setattr(expr_or_stmt, name, self.optimize(value))
+            elif (isinstance(value, list) and value and
+                  isinstance(value[0], (Expr, Stmt))):
+                setattr(expr_or_stmt, name, self.optimize_multi(value))
+        return expr_or_stmt
+
+    def visit_binary_expr(self, expr: Binary) -> Expr:
+        expr.left = self.optimize(expr.left)
+        expr.right = self.optimize(expr.right)
+        if isinstance(expr.left, Literal) and isinstance(expr.right, Literal):
+            return self.fold(expr)
+        return expr
+
+    def visit_unary_expr(self, expr: Unary) -> Expr:
+        expr.right = self.optimize(expr.right)
+        if isinstance(expr.right, Literal):
+            return self.fold(expr)
+        return expr
+
+    def visit_grouping_expr(self, expr: Grouping) -> Expr:
+        return self.optimize(expr.expr_or_stmt)
+
+    def visit_logical_expr(self, expr: Logical) -> Expr:
+        expr.left = self.optimize(expr.left)
+        expr.right = self.optimize(expr.right)
+        if isinstance(expr.left, Literal):
+            if (Interpreter.is_truthy(expr.left.value) ==
+                (expr.operator.token_type is TokenType.OR)):
+                return expr.left
+            return expr.right
+        return expr
+
+    def visit_if_stmt(self, stmt: If) -> Optional[Stmt]:
+        stmt.condition = self.optimize(stmt.condition)
+        stmt.then_branch = self.optimize_body(stmt.then_branch)
+        if stmt.else_branch is not None:
+            stmt.else_branch = self.optimize(stmt.else_branch)
+        if isinstance(stmt.condition, Literal):
+            if Interpreter.is_truthy(stmt.condition.value):
+                return stmt.then_branch
+            return stmt.else_branch
+        return stmt
+
+    def visit_while_stmt(self, stmt: While) -> Optional[Stmt]:
+        stmt.condition = self.optimize(stmt.condition)
+        if (isinstance(stmt.condition, Literal) and
+            not Interpreter.is_truthy(stmt.condition.value)):
+            return None
+        stmt.body = self.optimize_body(stmt.body)
+        return stmt
+
+    def visit_for_stmt(self, stmt: For) -> Optional[Stmt]:
+        if stmt.initializer is not None:
+            stmt.initializer = self.optimize(stmt.initializer)
+        if stmt.condition is not None:
+            stmt.condition = self.optimize(stmt.condition)
+            if (isinstance(stmt.condition, Literal) and
+                not Interpreter.is_truthy(stmt.condition.value)):
+
+                # The initializer still runs, in a scope of its own.
+                if stmt.initializer is None:
+                    return None
+                return Block([stmt.initializer])
+        if stmt.increment is not None:
+            stmt.increment = self.optimize(stmt.increment)
+        stmt.body = self.optimize_body(stmt.body)
+        return stmt
+
+    def fold(self, expr: Union[Binary, Unary]) -> Expr:
+        try:
+            literal: Literal = Literal(expr.accept(self._interpreter))
+        except (PyloxRuntimeError, ArithmeticError):
+            return expr
+        literal.line_number = expr.operator.line_number
+        return literal
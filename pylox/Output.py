@@ -0,0 +1,79 @@
+import sys
+from typing import Callable, List, Optional, TextIO
+
+
+class Output:
+    """
+    Where a session's ``print`` statements, REPL results and error
+    messages go: a buffer in front of a sink, which is anything with a
+    ``write`` method taking a string (a file, an ``io.StringIO``, a
+    ``ListSink``, a ``NullSink``...), or None for whatever ``sys.stdout``
+    is when the buffer is flushed.
+
+    Text is written to the sink a buffer's worth at a time rather than a
+    line at a time, and always in whole lines. The interpreter flushes
+    the buffer when it finishes running a program, including when the
+    program fails, and error messages are flushed as soon as they are
+    written, after any output before them.
+    """
+
+    __slots__ = ("sink", "limit", "_buffer", "_size")
+
+    sink: Optional[TextIO]
+
+    # How many characters to buffer before writing them out.
+    limit: int
+
+    _buffer: List[str]
+    _size: int
+
+    def __init__(self, sink: Optional[TextIO] = None, limit: int = 1 << 16):
+        self.sink = sink
+        self.limit = limit
+        self._buffer = []
+        self._size = 0
+
+    def __repr__(self):
+        return "<Output to {!r}>".format(self.sink)
+
+    def write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.limit:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write out the buffer, and then flush the sink too if it has its
+        own buffering (like a file or a pipe), so that nothing is held
+        back after a program finishes or fails.
+        """
+
+        if self._buffer:
+            text: str = "".join(self._buffer)
+            self._buffer.clear()
+            self._size = 0
+            sink: TextIO = self.sink if self.sink is not None else sys.stdout
+            sink.write(text)
+            flush: Optional[Callable[[], None]] = getattr(sink, "flush", None)
+            if flush is not None:
+                flush()
+
+
+class ListSink(list):
+    """
+    A sink that collects the lines written to it.
+    """
+
+    def write(self, text: str) -> None:
+        self.extend(text.splitlines())
+
+
+class NullSink:
+    """
+    A sink that throws away everything written to it, for when only the
+    time it takes to run a program matters.
+    """
+
+    def write(self, text: str) -> None:
+        pass
@@ -1,11 +1,12 @@
-from typing import List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 import pylox
 from .ExprOrStmt import (Assign, Binary, Block, Call, Class, Expr, Expression,
-                         Get, Grouping, Function, If, Literal, Logical, Print,
-                         Return, Set, Stmt, Super, This, Var, While, Unary,
-                         Variable)
+                         For, Get, Grouping, Function, If, Literal, Logical,
+                         Print, Return, Set, Stmt, Super, This, Var, While,
+                         Unary, Variable)
 from .Token import Token
+from .TokenStream import TokenBuffer, TokenStream
 from .TokenType import TokenType
 
 
@@ -14,16 +15,50 @@ class ParseError(RuntimeError):
 
 
 class Parser:
-
-    tokens: List[Token]
-    current: int
-
-    def __init__(self, tokens: List[Token]):
-        self.current = 0
-        self.tokens = tokens
+    """
+    A recursive descent parser, which parses operator expressions by
+    precedence climbing rather than with a method per level of
+    precedence. It reads its tokens through a cursor:
+    either a ``TokenStream``, or a ``TokenBuffer`` that pulls tokens from
+    any other iterable one at a time as it needs them, so they can be
+    produced lazily (see ``StreamingScanner``) and need not all be kept.
+    """
+
+    # The session that syntax errors are reported to.
+    session: "pylox.Session"
+    tokens: Union[TokenStream, TokenBuffer]
+
+    # Binary and logical operators are parsed by precedence climbing (see
+    # ``binary``) over this table of how tightly each binds.
+    OR: int = 1
+    AND: int = 2
+    EQUALITY: int = 3
+    COMPARISON: int = 4
+    TERM: int = 5
+    FACTOR: int = 6
+    precedences: Dict[TokenType, int] = \
+        {TokenType.OR:            OR,
+         TokenType.AND:           AND,
+         TokenType.BANG_EQUAL:    EQUALITY,
+         TokenType.EQUAL_EQUAL:   EQUALITY,
+         TokenType.GREATER:       COMPARISON,
+         TokenType.GREATER_EQUAL: COMPARISON,
+         TokenType.LESS:          COMPARISON,
+         TokenType.LESS_EQUAL:    COMPARISON,
+         TokenType.MINUS:         TERM,
+         TokenType.PLUS:          TERM,
+         TokenType.SLASH:         FACTOR,
+         TokenType.STAR:          FACTOR}
+
+    def __init__(self,
+                 tokens: Iterable[Token],
+                 session: Optional["pylox.Session"] = None):
+        self.session = session if session is not None else pylox.Lox.Lox
+        self.tokens = (tokens if isinstance(tokens, TokenStream)
+                       else TokenBuffer(tokens))
 
     def __repr__(self):
-        return str(self.tokens)
+        return "<Parser over {!r}>".format(self.tokens)
 
     def parse(self) -> List[Union[Expr, Stmt]]:
         exprs_or_stmts: List[Union[Expr, Stmt]] = []
@@ -75,16 +110,7 @@ class Parser:
         self.consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
         body: Stmt = self.statement()
 
-        if increment is not None:
-            body = Block([body, Expression(increment)])
-
-        if condition is None: condition = Literal(True)
-        body = While(condition, body)
-
-        if initializer is not None:
-            body = Block([initializer, body])
-
-        return body
+        return For(initializer, condition, increment, body)
 
     def if_statement(self) -> Stmt:
         self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
@@ -193,7 +219,7 @@ class Parser:
         return exprs_or_stmts
 
     def assignment(self) -> Expr:
-        expr: Expr = self.or_()
+        expr: Expr = self.binary(Parser.OR)
 
         if self.match(TokenType.EQUAL):
             equals: Token = self.previous()
@@ -210,64 +236,36 @@ class Parser:
 
         return expr
 
-    def or_(self) -> Expr:
-        expr: Expr = self.and_()
-
-        while self.match(TokenType.OR):
-            operator: Token = self.previous()
-            right: Expr = self.and_()
-            expr = Logical(expr, operator, right)
-
-        return expr
-
-    def and_(self) -> Expr:
-        expr: Expr = self.equality()
-        while self.match(TokenType.AND):
-            operator: Token = self.previous()
-            right: Expr = self.equality()
-            expr = Logical(expr, operator, right)
+    def binary(self, precedence: int) -> Expr:
+        """
+        Parse a chain of binary (and logical) operators that bind at least
+        as tightly as ``precedence``. Each operand on the right takes the
+        operators that bind more tightly than its own, which makes all of
+        them left-associative.
+        """
 
-        return expr
-
-    def equality(self) -> Expr:
-        expr: Expr = self.comparison()
-        while self.match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-            operator: Token = self.previous()
-            right: Expr = self.comparison()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    def comparison(self) -> Expr:
-        expr: Expr = self.addition()
-        while self.match(TokenType.GREATER,
-                         TokenType.GREATER_EQUAL,
-                         TokenType.LESS,
-                         TokenType.LESS_EQUAL):
-            operator: Token = self.previous()
-            right: Expr = self.addition()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    def addition(self) -> Expr:
-        expr: Expr = self.multiplication()
-        while self.match(TokenType.MINUS,
-                         TokenType.PLUS):
-            operator: Token = self.previous()
-            right: Expr = self.multiplication()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    def multiplication(self) -> Expr:
+        tokens: Union[TokenStream, TokenBuffer] = self.tokens
+        precedences: Dict[TokenType, int] = self.precedences
         expr: Expr = self.unary()
-        while self.match(TokenType.SLASH, TokenType.STAR):
-            operator: Token = self.previous()
-            right = self.unary()
-            expr = Binary(expr, operator, right)
-        return expr
+        while True:
+            token_type: TokenType = tokens.current_type
+            operator_precedence: Optional[int] = precedences.get(token_type)
+            if (operator_precedence is None or
+                operator_precedence < precedence):
+                return expr
+            tokens.advance()
+            operator: Token = tokens.previous()
+            right: Expr = self.binary(operator_precedence + 1)
+            if token_type is TokenType.OR or token_type is TokenType.AND:
+                expr = Logical(expr, operator, right)
+            else:
+                expr = Binary(expr, operator, right)
 
     def unary(self) -> Expr:
-        if self.match(TokenType.BANG, TokenType.MINUS):
-            operator: Token = self.previous()
+        token_type: TokenType = self.tokens.current_type
+        if token_type is TokenType.BANG or token_type is TokenType.MINUS:
+            self.tokens.advance()
+            operator: Token = self.tokens.previous()
             right: Expr = self.unary()
             return Unary(operator, right)
         return self.call()
@@ -290,37 +288,55 @@ class Parser:
     def call(self) -> Expr:
         expr: Expr = self.primary()
         while True:
-            if self.match(TokenType.LEFT_PAREN):
+            token_type: TokenType = self.tokens.current_type
+            if token_type is TokenType.LEFT_PAREN:
+                self.tokens.advance()
                 expr = self.finish_call(expr)
-            elif self.match(TokenType.DOT):
+            elif token_type is TokenType.DOT:
+                self.tokens.advance()
                 name: Token = self.consume(TokenType.IDENTIFIER,
                                            "Expect property name after '.'.")
                 expr = Get(expr, name)
             else:
-                break
-        return expr
+                return expr
+
+    def literal(self, value: Any) -> Literal:
+        """
+        Consume the current token as a literal with ``value``, without
+        building a ``Token`` for it.
+        """
+
+        literal: Literal = Literal(value)
+        literal.line_number = self.tokens.current_line_number()
+        self.tokens.advance()
+        return literal
 
     def primary(self) -> Expr:
-        if self.match(TokenType.FALSE):
-            return Literal(False)
-        if self.match(TokenType.TRUE):
-            return Literal(True)
-        if self.match(TokenType.NIL):
-            return Literal(None)
-        if self.match(TokenType.NUMBER, TokenType.STRING):
-            return Literal(self.previous().literal)
-        if self.match(TokenType.SUPER):
-            key_word: Token = self.previous()
+        token_type: TokenType = self.tokens.current_type
+        if token_type is TokenType.IDENTIFIER:
+            return Variable(self.advance())
+        if token_type is TokenType.NUMBER or token_type is TokenType.STRING:
+            token: Token = self.advance()
+            literal: Literal = Literal(token.literal)
+            literal.line_number = token.line_number
+            return literal
+        if token_type is TokenType.FALSE:
+            return self.literal(False)
+        if token_type is TokenType.TRUE:
+            return self.literal(True)
+        if token_type is TokenType.NIL:
+            return self.literal(None)
+        if token_type is TokenType.THIS:
+            return This(self.advance())
+        if token_type is TokenType.SUPER:
+            key_word: Token = self.advance()
             self.consume(TokenType.DOT,
                          "Expect '.' after 'super'.")
             method: Token = self.consume(TokenType.IDENTIFIER,
                                          "Expect superclass method name.")
             return Super(key_word, method)
-        if self.match(TokenType.THIS):
-            return This(self.previous())
-        if self.match(TokenType.IDENTIFIER):
-            return Variable(self.previous())
-        if self.match(TokenType.LEFT_PAREN):
+        if token_type is TokenType.LEFT_PAREN:
+            self.tokens.advance()
             expr: Union[Expr, Stmt] = self.expression()
             self.consume(TokenType.RIGHT_PAREN,
                          "Expect ')' after expression.")
@@ -328,10 +344,9 @@ class Parser:
         raise self.error(self.peek(), "Expect expression.")
 
     def match(self, *token_types: TokenType) -> bool:
-        for token_type in token_types:
-            if self.check(token_type):
-                self.advance()
-                return True
+        if self.tokens.current_type in token_types:
+            self.tokens.advance()
+            return True
         return False
 
     def consume(self, token_type: TokenType, message: str) -> Token:
@@ -339,25 +354,23 @@ class Parser:
         raise self.error(self.peek(), message)
 
     def check(self, token_type: TokenType) -> bool:
-        if self.is_at_end(): return False
-        return self.peek().token_type == token_type
+        return self.tokens.current_type is token_type
 
     def advance(self) -> Token:
-        if not self.is_at_end(): self.current += 1
-        return self.previous()
+        self.tokens.advance()
+        return self.tokens.previous()
 
     def is_at_end(self) -> bool:
-        return self.peek().token_type == TokenType.EOF
+        return self.tokens.current_type is TokenType.EOF
 
     def peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.tokens.peek()
 
     def previous(self) -> Token:
-        return self.tokens[self.current - 1]
+        return self.tokens.previous()
 
-    @staticmethod
-    def error(token: Token, message: str) -> ParseError:
-        pylox.Lox.Lox.token_error(token, message)
+    def error(self, token: Token, message: str) -> ParseError:
+        self.session.token_error(token, message)
         return ParseError()
 
     def synchronize(self) -> None:
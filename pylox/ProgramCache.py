@@ -0,0 +1,156 @@
+import gc
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .Environment import Layout
+from .ExprOrStmt import Expr, Stmt
+from .IncrementalParser import nodes
+from .Interpreter import Interpreter
+from .version import __version__
+
+
+class ProgramCache:
+    """
+    A directory of parsed and resolved programs, so that running a script
+    whose source has not changed skips scanning, parsing and resolving.
+
+    Each entry is the pickled AST of a program, which carries what the
+    ``Resolver`` worked out about it, and is named after a hash of the
+    source, the pylox version, the format of the entries and whether the
+    program was optimized. Global variables are resolved to
+    indices that depend on the order names were first seen in the
+    running process, so the entry keeps the name behind each global index
+    and ``load`` maps them to this process's indices.
+    """
+
+    directory: Path
+
+    # The layout of the pickled AST and resolution. Bump it whenever the
+    # AST classes or what the resolver stores on them change, so that
+    # entries written before are ignored rather than unpickled into
+    # nodes of the wrong shape.
+    format_version: int = 3
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+
+    def __repr__(self):
+        return "<ProgramCache at {}>".format(self.directory)
+
+    def path(self, source: str, optimize: bool = False) -> Path:
+        digest: str = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return self.directory / "{}.{}.{}{}.pickle".format(
+            digest,
+            __version__,
+            self.format_version,
+            ".optimized" if optimize else "")
+
+    def load(self,
+             source: str,
+             interpreter: Interpreter,
+             optimize: bool = False) -> Optional[List[Union[Expr, Stmt]]]:
+        """
+        Return the cached program for ``source`` (optimized or not), with
+        its resolution installed in ``interpreter``, or None if there is
+        none.
+        """
+
+        # Unpickling a tree allocates many objects and nothing to collect,
+        # so the cyclic garbage collector is kept from scanning it.
+        gc_was_enabled: bool = gc.isenabled()
+        gc.disable()
+        try:
+            with self.path(source, optimize).open("rb") as cache_file:
+                exprs_or_stmts: List[Union[Expr, Stmt]]
+                script: Layout
+                global_names: Dict[int, str]
+                (exprs_or_stmts,
+                 script,
+                 global_names) = pickle.load(cache_file)
+        except Exception:
+            # Treat a missing, unreadable or outdated entry as a miss; it
+            # is rewritten once the program has been resolved again.
+            return None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        indices: Dict[int, int] = {
+            index: interpreter._globals.index(name)
+            for index, name in global_names.items()}
+        if any(index != new_index for index, new_index in indices.items()):
+            node: Union[Expr, Stmt]
+            name: str
+            resolution: Any
+            for (node,
+                 name,
+                 resolution) in self.global_resolutions(exprs_or_stmts):
+                setattr(node,
+                        name,
+                        (Interpreter.GLOBAL, indices[resolution[1]]))
+        interpreter.resolve_script(script)
+        return exprs_or_stmts
+
+    def store(self,
+              source: str,
+              interpreter: Interpreter,
+              exprs_or_stmts: List[Union[Expr, Stmt]],
+              optimize: bool = False) -> None:
+        """
+        Save ``exprs_or_stmts``, just resolved from ``source`` by
+        ``interpreter`` (and optimized first, if ``optimize``).
+
+        This must happen before the program runs, while its property
+        access sites have no inline caches yet.
+        """
+
+        global_names: Dict[int, str] = {}
+        resolution: Any
+        for _, _, resolution in self.global_resolutions(exprs_or_stmts):
+            global_names[resolution[1]] = \
+                interpreter._globals.names[resolution[1]]
+
+        try:
+            data: bytes = pickle.dumps((exprs_or_stmts,
+                                        interpreter._script,
+                                        global_names),
+                                       pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Too deeply nested to pickle; just don't cache it.
+            return
+
+        # Write to a temporary file and move it into place, so that
+        # concurrent runs never see a partial entry. As with __pycache__,
+        # a directory that cannot be written to just means no caching.
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(dir=self.directory,
+                                    suffix=".tmp",
+                                    delete=False) as temporary_file:
+                temporary_file.write(data)
+            os.replace(temporary_file.name, self.path(source, optimize))
+        except OSError:
+            pass
+
+    @staticmethod
+    def global_resolutions(exprs_or_stmts: List[Union[Expr, Stmt]]
+                ) -> Iterator[Tuple[Union[Expr, Stmt], str, Any]]:
+        """
+        Yield every node of ``exprs_or_stmts`` that has a global variable
+        resolved for it, the attribute it is in and the resolution.
+        """
+
+        expr_or_stmt: Union[Expr, Stmt]
+        for expr_or_stmt in exprs_or_stmts:
+            node: Union[Expr, Stmt]
+            for node in nodes(expr_or_stmt):
+                name: str
+                for name in type(node).__slots__:
+                    value: Any = getattr(node, name)
+                    if (isinstance(value, tuple)
+                            and value[0] == Interpreter.GLOBAL):
+                        yield node, name, value
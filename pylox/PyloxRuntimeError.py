@@ -1,12 +1,34 @@
+from typing import Optional
+
 from .Token import Token
 
 
 class PyloxRuntimeError(RuntimeError):
 
-    token: Token
+    token: Optional[Token]
     message: str
+    line_number: Optional[int]
 
-    def __init__(self, message: str, token: Token = None):
+    def __init__(self,
+                 message: str,
+                 token: Token = None,
+                 line_number: Optional[int] = None):
         super()
         self.token = token
         self.message = message
+
+        # Errors raised by the bytecode VM have no token, only the line
+        # recorded for the failing instruction.
+        if line_number is None and token is not None:
+            line_number = token.line_number
+        self.line_number = line_number
+
+    def at(self, line_number: int) -> "PyloxRuntimeError":
+        """
+        Locate the error at ``line_number`` if it has no location yet, as
+        errors raised by natives do not, and return it.
+        """
+
+        if self.line_number is None:
+            self.line_number = line_number
+        return self
@@ -1,23 +1,77 @@
 from enum import auto, Enum
-from typing import Union, List
+from typing import Dict, List, Optional, Tuple, Union
 
-import pylox
 from .ExprOrStmt import (Assign, Binary, Block, Call, Class, Expr, Expression,
-                         ExprVisitor, Function, Get, Grouping, If, Literal,
-                         Logical, Print, Return, Set, Stmt, StmtVisitor,
-                         Super, This, Variable, Var, While)
+                         ExprVisitor, For, Function, Get, Grouping, If,
+                         Literal, Logical, Print, Return, Set, Stmt,
+                         StmtVisitor, Super, This, Unary, Variable, Var,
+                         While)
+from .Environment import Layout, Resolution
 from .Interpreter import Interpreter
 from .Token import Token
 
 
+class Local:
+    """
+    A local variable.
+
+    ``resolution`` is shared by the variable's declaration and by every
+    access to it from its own function. It starts out as
+    ``[Interpreter.LOCAL, slot]`` and switches to ``Interpreter.CELL`` as
+    soon as a closure captures the variable.
+    """
+
+    slot: int
+    resolution: List[int]
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.resolution = [Interpreter.LOCAL, slot]
+
+    def capture(self) -> None:
+        self.resolution[0] = Interpreter.CELL
+
+
+class FunctionScope:
+    """
+    The function (or top-level script) being resolved: its ``Layout`` and
+    the number of its slots in use by the scopes that are currently open.
+    """
+
+    enclosing: Optional["FunctionScope"]
+    layout: Layout
+    slots_in_use: int
+
+    def __init__(self, enclosing: Optional["FunctionScope"], layout: Layout):
+        self.enclosing = enclosing
+        self.layout = layout
+        self.slots_in_use = 0
+
+    def add_local(self) -> Local:
+        local: Local = Local(self.slots_in_use)
+        self.slots_in_use += 1
+        self.layout.slot_count = max(self.layout.slot_count,
+                                     self.slots_in_use)
+        return local
+
+
 class ScopeDict(dict):
     """
     Sub-class of ``dict`` that enforces keys of type ``str`` and values
     of type ``bool``.
+
+    Every name also gets a ``Local`` with its own slot in the
+    ``Environment`` of the function the scope belongs to. Slots are
+    reused once the scope has ended.
     """
 
-    def __init__(self, *args, **kwargs):
+    function: FunctionScope
+    locals: Dict[str, Local]
+
+    def __init__(self, function: FunctionScope, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.function = function
+        self.locals = {}
 
     def __setitem__(self, key: str, val: bool) -> None:
         if not isinstance(key, str):
@@ -27,6 +81,8 @@ class ScopeDict(dict):
             raise ValueError("{} is not of type {}!"
                              .format(val, bool))
         else:
+            if key not in self.locals:
+                self.locals[key] = self.function.add_local()
             dict.__setitem__(self, key, val)
 
 
@@ -47,12 +103,15 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     _interpreter: Interpreter
     _scopes: List[ScopeDict]
+    _function: FunctionScope
     _current_function: FunctionType
     _current_class: ClassType = ClassType.NONE
 
     def __init__(self, interpreter: Interpreter):
         self._interpreter = interpreter
         self._scopes = []
+        self._function = FunctionScope(None, Layout())
+        self._interpreter.resolve_script(self._function.layout)
         self._current_function = FunctionType.NONE
 
     def visit(self, expr_or_stmt: Union[Expr, Stmt]) -> None:
@@ -68,29 +127,31 @@ class Resolver(ExprVisitor, StmtVisitor):
             scope: ScopeDict
             enclosing_class: ClassType = self._current_class
             self._current_class = ClassType.CLASS
-            self.declare(expr_or_stmt.name)
+            self.declare(expr_or_stmt.name, expr_or_stmt)
             self.define(expr_or_stmt.name)
             if (expr_or_stmt.super_class is not None and
                 expr_or_stmt.name.lexeme == expr_or_stmt.super_class.name.lexeme):
-                pylox.Lox.Lox.token_error(expr_or_stmt.super_class.name,
-                                          "A class cannot inherit from itself.")
+                self.error(expr_or_stmt.super_class.name,
+                           "A class cannot inherit from itself.")
             if expr_or_stmt.super_class is not None:
-                self.current_class = ClassType.SUBCLASS
+                self._current_class = ClassType.SUBCLASS
                 self.resolve_single(expr_or_stmt.super_class)
+
+            # "super" is a local of the code that declares the class,
+            # which its methods capture; "this" is a local of each method.
             if expr_or_stmt.super_class is not None:
                 self.begin_scope()
                 scope = self._scopes[-1]
                 scope["super"] = True
-            self.begin_scope()
-            scope = self._scopes[-1]
-            scope["this"] = True
+                self._interpreter.resolve_super_class(
+                    expr_or_stmt,
+                    scope.locals["super"].resolution)
             method: Function
             for method in expr_or_stmt.methods:
                 declaration: FunctionType = FunctionType.METHOD
                 if method.name.lexeme == "init":
                     declaration = FunctionType.INITIALIZER
                 self.resolve_function(method, declaration)
-            self.end_scope()
             if expr_or_stmt.super_class is not None:
                 self.end_scope()
             self._current_class = enclosing_class
@@ -99,9 +160,23 @@ class Resolver(ExprVisitor, StmtVisitor):
 
             self.resolve_single(expr_or_stmt.expression)
 
+        elif isinstance(expr_or_stmt, For):
+
+            # The loop variable is scoped to the loop, and is one variable
+            # for all of its iterations.
+            self.begin_scope()
+            if expr_or_stmt.initializer is not None:
+                self.resolve_single(expr_or_stmt.initializer)
+            if expr_or_stmt.condition is not None:
+                self.resolve_single(expr_or_stmt.condition)
+            self.resolve_single(expr_or_stmt.body)
+            if expr_or_stmt.increment is not None:
+                self.resolve_single(expr_or_stmt.increment)
+            self.end_scope()
+
         elif isinstance(expr_or_stmt, Function):
 
-            self.declare(expr_or_stmt.name)
+            self.declare(expr_or_stmt.name, expr_or_stmt)
             self.define(expr_or_stmt.name)
             self.resolve_function(expr_or_stmt, FunctionType.FUNCTION)
 
@@ -119,19 +194,19 @@ class Resolver(ExprVisitor, StmtVisitor):
         elif isinstance(expr_or_stmt, Return):
 
             if self._current_function == FunctionType.NONE:
-                pylox.Lox.Lox.token_error(expr_or_stmt.keyword,
-                                          "Cannot return from top-level code.")
+                self.error(expr_or_stmt.keyword,
+                           "Cannot return from top-level code.")
 
             if expr_or_stmt.value is not None:
                 if self._current_function == FunctionType.INITIALIZER:
-                    pylox.Lox.Lox.token_error(expr_or_stmt.keyword,
-                                              "Cannot return a value from an "
-                                              "initializer.")
+                    self.error(expr_or_stmt.keyword,
+                               "Cannot return a value from an "
+                               "initializer.")
                 self.resolve_single(expr_or_stmt.value)
 
         elif isinstance(expr_or_stmt, Var):
 
-            self.declare(expr_or_stmt.name)
+            self.declare(expr_or_stmt.name, expr_or_stmt)
             if expr_or_stmt.initializer is not None:
                 self.resolve_single(expr_or_stmt.initializer)
             self.define(expr_or_stmt.name)
@@ -145,9 +220,9 @@ class Resolver(ExprVisitor, StmtVisitor):
 
             if (self._scopes and
                 self._scopes[-1].get(expr_or_stmt.name.lexeme) == False):
-                pylox.Lox.Lox.token_error(expr_or_stmt.name,
-                                          "Cannot read local variable in its "
-                                          "own initializer.")
+                self.error(expr_or_stmt.name,
+                           "Cannot read local variable in its "
+                           "own initializer.")
             self.resolve_local(expr_or_stmt, expr_or_stmt.name)
 
         elif isinstance(expr_or_stmt, Assign):
@@ -184,7 +259,7 @@ class Resolver(ExprVisitor, StmtVisitor):
             self.resolve_single(expr_or_stmt.left)
             self.resolve_single(expr_or_stmt.right)
 
-        elif isinstance(expr_or_stmt, Logical):
+        elif isinstance(expr_or_stmt, Unary):
 
             self.resolve_single(expr_or_stmt.right)
 
@@ -196,21 +271,24 @@ class Resolver(ExprVisitor, StmtVisitor):
         elif isinstance(expr_or_stmt, Super):
 
             if self._current_class == ClassType.NONE:
-                pylox.Lox.Lox.token_error(expr_or_stmt.keyword,
-                                          "Cannot use 'super' outside of a "
-                                          "class.")
+                self.error(expr_or_stmt.keyword,
+                           "Cannot use 'super' outside of a "
+                           "class.")
             elif self._current_class != ClassType.SUBCLASS:
-                pylox.Lox.Lox.token_error(expr_or_stmt.keyword,
-                                          "Cannot use 'super' in a class with"
-                                          " no superclass.")
+                self.error(expr_or_stmt.keyword,
+                           "Cannot use 'super' in a class with"
+                           " no superclass.")
             self.resolve_local(expr_or_stmt, expr_or_stmt.keyword)
+            receiver: Optional[Resolution] = self.look_up("this")
+            if receiver is not None:
+                self._interpreter.resolve_receiver(expr_or_stmt, receiver)
 
         elif isinstance(expr_or_stmt, This):
 
             if self._current_class == ClassType.NONE:
-                pylox.Lox.Lox.token_error(expr_or_stmt.keyword,
-                                          "Cannot use 'this' outside of a "
-                                          "class.")
+                self.error(expr_or_stmt.keyword,
+                           "Cannot use 'this' outside of a "
+                           "class.")
                 return None
             self.resolve_local(expr_or_stmt,
                                expr_or_stmt.keyword)
@@ -228,31 +306,55 @@ class Resolver(ExprVisitor, StmtVisitor):
 
         enclosing_function: FunctionType = self._current_function
         self._current_function: FunctionType = type_
+        layout: Layout = Layout(type_ in (FunctionType.METHOD,
+                                          FunctionType.INITIALIZER))
+        self._interpreter.resolve_function(function, layout)
+        self._function = FunctionScope(self._function, layout)
         self.begin_scope()
+        scope: ScopeDict = self._scopes[-1]
+
+        # The receiver, if any, and the parameters come first, in the
+        # order the arguments are passed.
+        if layout.receiver:
+            scope["this"] = True
         param: Token
         for param in function.params:
             self.declare(param)
             self.define(param)
         self.resolve_multi(function.body)
+        entry_slots: int = len(function.params) + layout.receiver
+        layout.cell_slots = [local.slot for local in scope.locals.values()
+                             if local.slot < entry_slots and
+                             local.resolution[0] == Interpreter.CELL]
         self.end_scope()
+        self._function = self._function.enclosing
         self._current_function = enclosing_function
 
     def begin_scope(self) -> None:
-        self._scopes.append(ScopeDict())
+        self._scopes.append(ScopeDict(self._function))
         return
 
     def end_scope(self) -> None:
-        self._scopes.pop()
+        scope: ScopeDict = self._scopes.pop()
+        scope.function.slots_in_use -= len(scope.locals)
         return
 
-    def declare(self, name: Token) -> None:
-        if not self._scopes: return
+    def declare(self,
+                name: Token,
+                declaration: Optional[Stmt] = None) -> None:
+        if not self._scopes:
+            if declaration is not None:
+                self._interpreter.resolve_global(declaration, name)
+            return
         scope: ScopeDict = self._scopes[-1]
         if name.lexeme in scope:
-            pylox.Lox.Lox.token_error(name,
-                                      "Variable with this name already "
-                                      "declared in this scope.")
+            self.error(name,
+                       "Variable with this name already "
+                       "declared in this scope.")
         scope[name.lexeme] = False
+        if declaration is not None:
+            self._interpreter.resolve(declaration,
+                                      scope.locals[name.lexeme].resolution)
 
     def define(self, name: Token) -> None:
         if not self._scopes: return
@@ -260,10 +362,47 @@ class Resolver(ExprVisitor, StmtVisitor):
         scope[name.lexeme] = True
 
     def resolve_local(self, expr: Expr, name: Token) -> None:
-        max_scope_i: int = len(self._scopes) - 1
-        i: int = int(max_scope_i)
-        while i >= 0:
-            if name.lexeme in self._scopes[i]:
-                self._interpreter.resolve(expr, max_scope_i - i)
-                return
-            i -= 1
+        resolution: Optional[Resolution] = self.look_up(name.lexeme)
+        if resolution is None:
+
+            # Not found: assume it is global.
+            self._interpreter.resolve_global(expr, name)
+        else:
+            self._interpreter.resolve(expr, resolution)
+
+    def look_up(self, lexeme: str) -> Optional[Resolution]:
+        i: int
+        for i in range(len(self._scopes) - 1, -1, -1):
+            scope: ScopeDict = self._scopes[i]
+            if lexeme in scope:
+                local: Local = scope.locals[lexeme]
+                if scope.function is self._function:
+                    return local.resolution
+                local.capture()
+                return (Interpreter.UPVALUE,
+                        self.add_upvalue(self._function,
+                                         scope.function,
+                                         local))
+        return None
+
+    def add_upvalue(self,
+                    function: FunctionScope,
+                    owner: FunctionScope,
+                    local: Local) -> int:
+        """
+        Make ``local``, which belongs to the enclosing function ``owner``,
+        an upvalue of ``function`` (and of every function in between) and
+        return its index in ``function``'s ``Environment.cells``.
+        """
+
+        upvalue: Tuple[bool, int] = (True, local.slot)
+        if function.enclosing is not owner:
+            upvalue = (False,
+                       self.add_upvalue(function.enclosing, owner, local))
+        upvalues: List[Tuple[bool, int]] = function.layout.upvalues
+        if upvalue not in upvalues:
+            upvalues.append(upvalue)
+        return upvalues.index(upvalue)
+
+    def error(self, token: Token, message: str) -> None:
+        self._interpreter.session.token_error(token, message)
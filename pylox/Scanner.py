@@ -1,12 +1,21 @@
-from typing import Any, Dict, List, Optional
+import codecs
+import re
+import sys
+from io import StringIO
+from mmap import mmap
+from typing import (Any, Callable, Dict, Iterator, List, Match, Optional,
+                    Pattern, TextIO, Union)
 
 import pylox
 from .Token import Token
+from .TokenStream import TokenStream, token_type_codes
 from .TokenType import TokenType
 
 
 class Scanner:
 
+    # The session that errors are reported to.
+    session: "pylox.Session"
     source: str
     tokens: List[Token]
     start: int
@@ -31,7 +40,10 @@ class Scanner:
          "var":    TokenType.VAR,
          "while":  TokenType.WHILE}
 
-    def __init__(self, source: str):
+    def __init__(self,
+                 source: str,
+                 session: Optional["pylox.Session"] = None):
+        self.session = session if session is not None else pylox.Lox.Lox
         self.source = source
         self.tokens = []
         self.start = 0
@@ -106,7 +118,7 @@ class Scanner:
                     else:
                         self.advance()
                 if not found_end_block_comment:
-                    pylox.Lox.Lox.error(self.line_number,
+                    self.session.error(self.line_number,
                                         "Unterminated block comment.")
                 if self.is_at_end(): return
                 found_newline: bool = False
@@ -119,7 +131,7 @@ class Scanner:
                     elif self.is_at_end():
                         break
                     else:
-                        pylox.Lox.Lox.error(self.line_number,
+                        self.session.error(self.line_number,
                                             "Unterminated block comment.")
                         self.advance()
             else:
@@ -140,18 +152,21 @@ class Scanner:
             elif self.is_alpha(c):
                 self.identifier()
             else:
-                pylox.Lox.Lox.error(self.line_number, "Unexpected character.")
+                self.session.error(self.line_number, "Unexpected character.")
 
     def identifier(self) -> None:
         while self.is_alphanumeric(self.peek()): self.advance()
 
-        # See if the identifier is a reserved word.
-        text: str = self.source[self.start:self.current]
+        # Names are interned, so that every token for the same name shares
+        # one string, and the dicts it is looked up in (scopes, global
+        # indices, shapes, method tables) can match it by identity.
+        text: str = sys.intern(self.source[self.start:self.current])
 
+        # See if the identifier is a reserved word.
         token_type: TokenType = self.keywords.get(text)
         if token_type is None:
             token_type = TokenType.IDENTIFIER
-        self.add_token(token_type)
+        self.tokens.append(Token(token_type, text, None, self.line_number))
 
     def number(self) -> None:
         while self.is_digit(self.peek()): self.advance()
@@ -174,7 +189,7 @@ class Scanner:
 
         # Unterminated string.
         if self.is_at_end():
-            pylox.Lox.Lox.error(self.line_number, "Unterminated string.")
+            self.session.error(self.line_number, "Unterminated string.")
             return
 
         # The closing "."
@@ -225,3 +240,405 @@ class Scanner:
                                literal: Optional[Any]) -> None:
         text: str = self.source[self.start:self.current]
         self.tokens.append(Token(token_type, text, literal, self.line_number))
+
+
+class RegexScanner(Scanner):
+    """
+    A scanner that matches a whole lexeme at a time with one compiled
+    regular expression instead of stepping through the source character
+    by character. It produces the same tokens, line numbers and errors
+    as ``Scanner``.
+    """
+
+    operators: Dict[str, TokenType] = \
+        {"(":  TokenType.LEFT_PAREN,
+         ")":  TokenType.RIGHT_PAREN,
+         "{":  TokenType.LEFT_BRACE,
+         "}":  TokenType.RIGHT_BRACE,
+         ",":  TokenType.COMMA,
+         ".":  TokenType.DOT,
+         "-":  TokenType.MINUS,
+         "+":  TokenType.PLUS,
+         ";":  TokenType.SEMICOLON,
+         "/":  TokenType.SLASH,
+         "*":  TokenType.STAR,
+         "!":  TokenType.BANG,
+         "!=": TokenType.BANG_EQUAL,
+         "=":  TokenType.EQUAL,
+         "==": TokenType.EQUAL_EQUAL,
+         ">":  TokenType.GREATER,
+         ">=": TokenType.GREATER_EQUAL,
+         "<":  TokenType.LESS,
+         "<=": TokenType.LESS_EQUAL}
+
+    # Alternatives are tried in order, so comments come before the
+    # slash operator. Anything that matches none of them is an
+    # unexpected character, one at a time.
+    lexeme_pattern: Pattern = re.compile(
+        r"(?P<space>[ \t\r\n]+)"
+        r"|(?P<line_comment>//[^\n]*)"
+        r"|(?P<block_comment>/\*)"
+        r"|(?P<identifier>[A-Za-z_][A-Za-z0-9_]*)"
+        r"|(?P<number>[0-9]+(?:\.[0-9]+)?)"
+        r"|(?P<string>\"[^\"]*\"?)"
+        r"|(?P<operator>[!=<>]=?|[(){},.\-+;/*])"
+        r"|(?P<unexpected>.)",
+        re.DOTALL)
+
+    # How far past a lexeme the pattern may need to look to know it has
+    # ended: a number followed by "." is only complete once the character
+    # after the "." is known not to be a digit.
+    lookahead: int = 2
+
+    def scan_tokens(self) -> List[Token]:
+        self.tokens.extend(self.lex())
+        return self.tokens
+
+    def lex(self) -> Iterator[Token]:
+        keywords: Dict[str, TokenType] = self.keywords
+        operators: Dict[str, TokenType] = self.operators
+        identifier: TokenType = TokenType.IDENTIFIER
+        number: TokenType = TokenType.NUMBER
+        intern: Callable[[str], str] = sys.intern
+        lookahead: int = self.lookahead
+        line_number: int = self.line_number
+        while not self.is_at_end() or self.fill():
+            source: str = self.source
+            limit: int = len(source) - lookahead
+            lexeme_match: Match
+            for lexeme_match in self.lexeme_pattern.finditer(source,
+                                                             self.current):
+                # A lexeme this close to the end of the text read so far
+                # may carry on in text that has not been read yet.
+                if lexeme_match.end() > limit:
+                    self.current = lexeme_match.start()
+                    if self.fill():
+                        break
+                    limit = len(source)
+                kind: str = lexeme_match.lastgroup
+                text: str = lexeme_match.group()
+                if kind == "space":
+                    line_number += text.count("\n")
+                elif kind == "identifier":
+                    text = intern(text)
+                    yield Token(keywords.get(text, identifier),
+                                text,
+                                None,
+                                line_number)
+                elif kind == "operator":
+                    yield Token(operators[text], text, None, line_number)
+                elif kind == "number":
+                    yield Token(number, text, float(text), line_number)
+                elif kind == "string":
+                    line_number += text.count("\n")
+                    if len(text) > 1 and text.endswith("\""):
+                        yield Token(TokenType.STRING,
+                                    text,
+                                    text[1:-1],
+                                    line_number)
+                    else:
+                        self.session.error(line_number,
+                                            "Unterminated string.")
+                elif kind == "unexpected":
+                    self.session.error(line_number, "Unexpected character.")
+                elif kind == "block_comment":
+                    # The comment decides where scanning picks up again.
+                    self.current = lexeme_match.end()
+                    self.line_number = line_number
+                    self.block_comment()
+                    line_number = self.line_number
+                    break
+            else:
+                self.current = len(source)
+
+        self.line_number = line_number
+        yield Token(TokenType.EOF, "", None, line_number)
+
+    def fill(self) -> bool:
+        """
+        Read more of the source, if there is more to read. The whole
+        source is known up front here, so there never is.
+        """
+
+        return False
+
+    def block_comment(self) -> None:
+        """
+        Skip the rest of a block comment whose opening "/*" has been
+        consumed, along with the rest of the line it ends on, which may
+        only hold whitespace.
+        """
+
+        close: int = self.source.find("*/", self.current)
+        while close == -1:
+            # Where to pick the search up again, relative to the current
+            # position, which filling moves; a "*" may end the old text.
+            searched: int = max(len(self.source) - self.current - 1, 0)
+            if not self.fill():
+                self.line_number += self.source.count("\n", self.current)
+                self.current = len(self.source)
+                self.session.error(self.line_number,
+                                    "Unterminated block comment.")
+                return
+            close = self.source.find("*/", self.current + searched)
+        self.line_number += self.source.count("\n", self.current, close)
+        self.current = close + 2
+        while not self.is_at_end() or self.fill():
+            c: str = self.advance()
+            if c == "\n":
+                self.line_number += 1
+                break
+            if c != " " and c != "\t":
+                self.session.error(self.line_number,
+                                    "Unterminated block comment.")
+
+
+class ColumnarScanner(RegexScanner):
+    """
+    A ``RegexScanner`` that records its tokens in a ``TokenStream``
+    instead of building a ``Token`` for each of them.
+    """
+
+    type_codes: Dict[str, int] = \
+        {lexeme: token_type_codes[token_type]
+         for lexeme, token_type in list(Scanner.keywords.items()) +
+                                   list(RegexScanner.operators.items())}
+
+    def scan_tokens(self) -> TokenStream:
+        source: str = self.source
+        tokens: TokenStream = TokenStream(source)
+        append_type: Callable[[int], None] = tokens.types.append
+        append_start: Callable[[int], None] = tokens.starts.append
+        append_end: Callable[[int], None] = tokens.ends.append
+        append_line_number: Callable[[int], None] = \
+            tokens.line_numbers.append
+        type_codes: Dict[str, int] = self.type_codes
+        identifier: int = token_type_codes[TokenType.IDENTIFIER]
+        number: int = token_type_codes[TokenType.NUMBER]
+        string: int = token_type_codes[TokenType.STRING]
+        line_number: int = self.line_number
+        while not self.is_at_end():
+            lexeme_match: Match
+            for lexeme_match in self.lexeme_pattern.finditer(source,
+                                                             self.current):
+                kind: str = lexeme_match.lastgroup
+                if kind == "space":
+                    line_number += source.count("\n",
+                                                lexeme_match.start(),
+                                                lexeme_match.end())
+                    continue
+                if kind == "identifier":
+                    append_type(type_codes.get(lexeme_match.group(),
+                                               identifier))
+                elif kind == "operator":
+                    append_type(type_codes[lexeme_match.group()])
+                elif kind == "number":
+                    append_type(number)
+                elif kind == "string":
+                    line_number += source.count("\n",
+                                                lexeme_match.start(),
+                                                lexeme_match.end())
+                    if (lexeme_match.end() - lexeme_match.start() < 2 or
+                        source[lexeme_match.end() - 1] != "\""):
+                        self.session.error(line_number,
+                                            "Unterminated string.")
+                        continue
+                    append_type(string)
+                elif kind == "unexpected":
+                    self.session.error(line_number, "Unexpected character.")
+                    continue
+                elif kind == "block_comment":
+                    # The comment decides where scanning picks up again.
+                    self.current = lexeme_match.end()
+                    self.line_number = line_number
+                    self.block_comment()
+                    line_number = self.line_number
+                    break
+                else:
+                    continue
+                append_start(lexeme_match.start())
+                append_end(lexeme_match.end())
+                append_line_number(line_number)
+            else:
+                self.current = len(source)
+
+        self.line_number = line_number
+        tokens.append(TokenType.EOF, len(source), len(source), line_number)
+        tokens.seek(0)
+        return tokens
+
+
+class StreamingScanner(RegexScanner):
+    """
+    A ``RegexScanner`` that reads its source from a text stream a chunk
+    at a time, and whose ``lex`` yields tokens as it goes, so that
+    neither the whole source nor the whole token list need to be held
+    in memory at once.
+    """
+
+    stream: TextIO
+    chunk_size: int
+
+    def __init__(self,
+                 source: Union[str, TextIO],
+                 chunk_size: int = 1 << 16,
+                 session: Optional["pylox.Session"] = None):
+        super().__init__("", session)
+        self.stream = StringIO(source) if isinstance(source, str) else source
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[Token]:
+        return self.lex()
+
+    def fill(self) -> bool:
+        chunk: str = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+
+        # Only the text from the current position on is still needed.
+        self.source = self.source[self.current:] + chunk
+        self.current = 0
+        return True
+
+
+class MappedScanner(RegexScanner):
+    """
+    A ``RegexScanner`` over UTF-8 encoded bytes, typically a memory-mapped
+    file, so that the source is never decoded into a ``str`` as a whole.
+    Only the lexemes that make it into tokens are sliced out and decoded.
+    """
+
+    source: Union[bytes, mmap]
+
+    keywords: Dict[bytes, TokenType] = \
+        {keyword.encode(): token_type
+         for keyword, token_type in Scanner.keywords.items()}
+
+    operators: Dict[bytes, TokenType] = \
+        {operator.encode(): token_type
+         for operator, token_type in RegexScanner.operators.items()}
+
+    # As for ``RegexScanner``, except that an unexpected character may
+    # take up several bytes.
+    lexeme_pattern: Pattern = re.compile(
+        RegexScanner.lexeme_pattern.pattern
+        .replace(r"(?P<unexpected>.)",
+                 r"(?P<unexpected>[\xc0-\xff][\x80-\xbf]*|.)")
+        .encode(),
+        re.DOTALL)
+
+    # How many bytes to check the encoding of at a time.
+    chunk_size: int = 1 << 16
+
+    def __init__(self,
+                 source: Union[bytes, mmap],
+                 session: Optional["pylox.Session"] = None):
+        super().__init__("", session)
+        self.source = source
+
+    def scan_tokens(self) -> List[Token]:
+        self.check_encoding()
+        return super().scan_tokens()
+
+    def check_encoding(self) -> None:
+        """
+        Raise the same ``UnicodeDecodeError`` as reading the source in as
+        text would if it is not UTF-8, decoding it a chunk at a time and
+        throwing each chunk away.
+        """
+
+        source: Union[bytes, mmap] = self.source
+        decoder: codecs.IncrementalDecoder = \
+            codecs.getincrementaldecoder("utf-8")()
+        start: int
+        for start in range(0, len(source), self.chunk_size):
+            end: int = min(start + self.chunk_size, len(source))
+
+            # Bytes of a character split across chunks are held back by
+            # the decoder, so errors are reported relative to them.
+            pending: int = len(decoder.getstate()[0])
+            try:
+                decoder.decode(source[start:end], end == len(source))
+            except UnicodeDecodeError as error:
+                offset: int = start - pending
+                raise UnicodeDecodeError(error.encoding,
+                                         bytes(source[:offset + error.end]),
+                                         offset + error.start,
+                                         offset + error.end,
+                                         error.reason) from None
+
+    def lex(self) -> Iterator[Token]:
+        keywords: Dict[bytes, TokenType] = self.keywords
+        operators: Dict[bytes, TokenType] = self.operators
+        identifier: TokenType = TokenType.IDENTIFIER
+        number: TokenType = TokenType.NUMBER
+        intern: Callable[[str], str] = sys.intern
+        line_number: int = self.line_number
+        while not self.is_at_end():
+            lexeme_match: Match
+            for lexeme_match in self.lexeme_pattern.finditer(self.source,
+                                                             self.current):
+                kind: str = lexeme_match.lastgroup
+                text: bytes = lexeme_match.group()
+                if kind == "space":
+                    line_number += text.count(b"\n")
+                elif kind == "identifier":
+                    yield Token(keywords.get(text, identifier),
+                                intern(text.decode()),
+                                None,
+                                line_number)
+                elif kind == "operator":
+                    yield Token(operators[text],
+                                text.decode(),
+                                None,
+                                line_number)
+                elif kind == "number":
+                    yield Token(number, text.decode(), float(text),
+                                line_number)
+                elif kind == "string":
+                    line_number += text.count(b"\n")
+                    if len(text) > 1 and text.endswith(b"\""):
+                        lexeme: str = text.decode()
+                        yield Token(TokenType.STRING,
+                                    lexeme,
+                                    lexeme[1:-1],
+                                    line_number)
+                    else:
+                        self.session.error(line_number,
+                                            "Unterminated string.")
+                elif kind == "unexpected":
+                    self.session.error(line_number, "Unexpected character.")
+                elif kind == "block_comment":
+                    # The comment decides where scanning picks up again.
+                    self.current = lexeme_match.end()
+                    self.line_number = line_number
+                    self.block_comment()
+                    line_number = self.line_number
+                    break
+            else:
+                self.current = len(self.source)
+
+        self.line_number = line_number
+        yield Token(TokenType.EOF, "", None, line_number)
+
+    def block_comment(self) -> None:
+        source: Union[bytes, mmap] = self.source
+        close: int = source.find(b"*/", self.current)
+        if close == -1:
+            self.line_number += source[self.current:].count(b"\n")
+            self.current = len(source)
+            self.session.error(self.line_number,
+                                "Unterminated block comment.")
+            return
+        self.line_number += source[self.current:close].count(b"\n")
+        self.current = close + 2
+        while not self.is_at_end():
+            c: bytes = source[self.current:self.current + 1]
+            self.current += 1
+            if c == b"\n":
+                self.line_number += 1
+                break
+            # Continuation bytes belong to a character already reported.
+            if c != b" " and c != b"\t" and not b"\x80" <= c < b"\xc0":
+                self.session.error(self.line_number,
+                                    "Unterminated block comment.")
@@ -0,0 +1,237 @@
+import sys
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, TextIO, Type, Union
+
+from . import Stdlib  # Registers the standard library's natives.
+from .Interpreter import Interpreter
+from .Optimizer import Optimizer
+from .Output import Output
+from .Parser import Parser
+from .ProgramCache import ProgramCache
+from .PyloxRuntimeError import PyloxRuntimeError
+from .Resolver import Resolver
+from .Scanner import (ColumnarScanner, MappedScanner, RegexScanner, Scanner,
+                      StreamingScanner)
+from .ExprOrStmt import Expr, Stmt
+from .Token import Token
+from .TokenType import TokenType
+
+
+class Session:
+    """
+    Runs Lox code with an ``Interpreter`` of its own, and so its own
+    global variables, and keeps track of the errors in it.
+
+    Sessions share nothing, so a process can keep any number of them and
+    run scripts in each independently, e.g.::
+
+        session = pylox.Session(engine="closure")
+        session.run("var greeting = \"hi\";")
+        session.run("print greeting;")
+
+    Scanners, parsers and interpreters report errors to the session they
+    are created for; those created without one report to ``Lox.Lox``,
+    the session of the command line.
+    """
+
+    interpreter: Interpreter
+
+    # Where what scripts print and error messages go (see ``Output``).
+    output: Output
+    had_error: bool
+    had_runtime_error: bool
+    repl: bool
+
+    # Scanning engines: "char" steps through the source a character at a
+    # time, "regex" matches whole lexemes with one compiled pattern,
+    # "columnar" does the same but stores the tokens compactly in a
+    # ``TokenStream``, and "stream" reads scripts a chunk at a time and
+    # hands tokens to the parser as they are found. All of them produce
+    # the same tokens and errors.
+    scanners: Dict[str, Type[Scanner]] = {"char": Scanner,
+                                          "columnar": ColumnarScanner,
+                                          "regex": RegexScanner,
+                                          "stream": StreamingScanner}
+    scanner: str
+
+    # Whether to scan script files straight from a memory map of their
+    # bytes (with ``MappedScanner``) rather than reading them in first.
+    # This applies to files only, and for them it takes the place of
+    # ``scanner``.
+    memory_map: bool
+
+    # Where to keep parsed and resolved programs so that running one again
+    # skips the front end, if anywhere. Memory-mapped and streamed scripts
+    # are never cached, since the point of those is to not hold the
+    # whole source.
+    cache: Optional[ProgramCache]
+
+    # Whether to simplify programs (see ``Optimizer``) before resolving
+    # them.
+    optimize: bool
+
+    def __init__(self,
+                 engine: str = Interpreter.engine,
+                 scanner: str = "char",
+                 memory_map: bool = False,
+                 cache: Optional[ProgramCache] = None,
+                 optimize: bool = False,
+                 sink: Optional[TextIO] = None):
+        self.output = Output(sink)
+        self.interpreter = Interpreter(self)
+        self.interpreter.engine = engine
+        self.had_error = False
+        self.had_runtime_error = False
+        self.repl = False
+        self.scanner = scanner
+        self.memory_map = memory_map
+        self.cache = cache
+        self.optimize = optimize
+
+    def __repr__(self):
+        return "<Session ({} engine)>".format(self.interpreter.engine)
+
+    def main(self, args: List[str]) -> None:
+        """
+        Run the script named in ``args``, if any, or else a REPL, and exit
+        with the status the command line should.
+        """
+
+        if len(args) > 1:
+            print("Usage: pylox [script]")
+            sys.exit(64)
+        elif len(args) == 1:
+            path : Path = Path(args[0]).absolute()
+            if not path.exists():
+                raise RuntimeError("{} does not exist!".format(path))
+            self.run_file(path)
+
+            # Indicate an error in the exit code.
+            if self.had_error:
+                sys.exit(65)
+            if self.had_runtime_error:
+                sys.exit(70)
+        else:
+            self.repl = True
+            self.run_prompt()
+
+    def run(self, source: str) -> None:
+        """
+        Run ``source`` in this session, after whatever it ran before.
+        ``had_error`` and ``had_runtime_error`` then say how it went.
+        """
+
+        self.had_error = False
+        self.had_runtime_error = False
+        self.run_from_string(source)
+
+    def run_file(self, path: Path) -> None:
+        if self.memory_map:
+            self.run_mapped_file(path)
+        else:
+            with path.open() as input_file:
+                self.run_from_stream(input_file)
+
+    def run_prompt(self, keyboard_interrupt: bool = False) -> None:
+        while True:
+            print("> ", end="")
+            try:
+                if not keyboard_interrupt:
+                    self.run_from_string(input())
+                else:
+                    raise KeyboardInterrupt()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+            self.had_error = False
+
+    def run_mapped_file(self, path: Path) -> None:
+        with path.open("rb") as input_file:
+            # Empty files cannot be mapped.
+            if path.stat().st_size == 0:
+                self.run_tokens(
+                    MappedScanner(b"", session=self).scan_tokens())
+                return
+            with mmap(input_file.fileno(), 0, access=ACCESS_READ) as source:
+                self.run_tokens(
+                    MappedScanner(source, session=self).scan_tokens())
+
+    def run_from_stream(self, stream: TextIO) -> None:
+        if self.scanners[self.scanner] is StreamingScanner:
+            self.run_tokens(StreamingScanner(stream, session=self))
+        else:
+            self.run_from_string(stream.read())
+
+    def run_from_string(self, source: str) -> None:
+        if self.cache is not None:
+            self.run_cached(source, self.cache)
+            return
+        scanner: Scanner = self.scanners[self.scanner](source,
+                                                       session=self)
+        self.run_tokens(scanner.scan_tokens())
+
+    def run_cached(self, source: str, cache: ProgramCache) -> None:
+        exprs_or_stmts: Optional[List[Union[Expr, Stmt]]] = \
+            cache.load(source, self.interpreter, self.optimize)
+        if exprs_or_stmts is None:
+            scanner: Scanner = self.scanners[self.scanner](source,
+                                                           session=self)
+            exprs_or_stmts = self.resolve_tokens(scanner.scan_tokens())
+            if exprs_or_stmts is None: return
+            cache.store(source,
+                        self.interpreter,
+                        exprs_or_stmts,
+                        self.optimize)
+        self.interpreter.interpret(exprs_or_stmts)
+
+    def run_tokens(self, tokens: Iterable[Token]) -> None:
+        exprs_or_stmts: Optional[List[Union[Expr, Stmt]]] = \
+            self.resolve_tokens(tokens)
+        if exprs_or_stmts is not None:
+            self.interpreter.interpret(exprs_or_stmts)
+
+    def resolve_tokens(
+            self,
+            tokens: Iterable[Token]) -> Optional[List[Union[Expr, Stmt]]]:
+        parser: Parser = Parser(tokens, self)
+        exprs_or_stmts: List[Union[Expr, Stmt]] = parser.parse()
+
+        # Stop if there was a syntax error.
+        if self.had_error: return None
+
+        if self.optimize:
+            exprs_or_stmts = \
+                Optimizer(self.interpreter).optimize_multi(exprs_or_stmts)
+
+        resolver: Resolver = Resolver(self.interpreter)
+        resolver.resolve_multi(exprs_or_stmts)
+
+        # Stop if there was a resolution error.
+        if self.had_error: return None
+
+        return exprs_or_stmts
+
+    def error(self, line_number: int, message: str) -> None:
+        self.report(line_number, "", message)
+
+    def report(self, line_number: int, where: str, message: str) -> None:
+        self.output.write("[line {}] Error {}: {}\n".format(line_number,
+                                                          where,
+                                                          message))
+        self.output.flush()
+        self.had_error = True
+
+    def token_error(self, token: Token, message: str) -> None:
+        if token.token_type == TokenType.EOF:
+            self.report(token.line_number, "at end", message)
+        else:
+            self.report(token.line_number,
+                        "at '{}'".format(token.lexeme),
+                        message)
+
+    def run_time_error(self, error: PyloxRuntimeError) -> None:
+        self.output.write("{}\n[line {}]\n".format(error.message,
+                                                   error.line_number))
+        self.output.flush()
+        self.had_runtime_error = True
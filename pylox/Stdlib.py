@@ -0,0 +1,299 @@
+import math
+import random
+import re
+import time
+from reprlib import recursive_repr
+from typing import Any, Dict, List, Optional, Pattern
+
+from .Interpreter import Interpreter, native
+from .PyloxRuntimeError import PyloxRuntimeError
+
+
+# The standard library: natives every interpreter defines (see ``native``)
+# for string handling, math and containers, which would be slow to write
+# in Lox itself. Their arguments are checked in the same way as the
+# operands of Lox's operators, and bad ones are runtime errors.
+
+
+class LoxList:
+    """
+    A list of values, made by ``list()``, backed by a Python list. Lists
+    are objects, so a list is only equal to itself.
+    """
+
+    __slots__ = ("values",)
+
+    values: List[Any]
+
+    def __init__(self, values: Optional[List[Any]] = None):
+        self.values = values if values is not None else []
+
+    @recursive_repr("[...]")
+    def __str__(self):
+        return "[{}]".format(", ".join(map(Interpreter.stringify,
+                                           self.values)))
+
+
+class LoxMap:
+    """
+    A map from keys to values, made by ``map()``, backed by a Python
+    dict. Keys are the same when ``==`` says they are, except for
+    objects (instances, functions, lists and maps), which are only the
+    same key as themselves.
+    """
+
+    __slots__ = ("values",)
+
+    values: Dict[Any, Any]
+
+    def __init__(self):
+        self.values = {}
+
+    @recursive_repr("{...}")
+    def __str__(self):
+        return "{{{}}}".format(", ".join(
+            "{}: {}".format(Interpreter.stringify(key),
+                            Interpreter.stringify(value))
+            for key, value in self.values.items()))
+
+
+def check_number(value: Any) -> float:
+    if not isinstance(value, float):
+        raise PyloxRuntimeError("Argument must be a number.")
+    return value
+
+
+def check_string(value: Any) -> str:
+    if not isinstance(value, str):
+        raise PyloxRuntimeError("Argument must be a string.")
+    return value
+
+
+def check_list(value: Any) -> LoxList:
+    if not isinstance(value, LoxList):
+        raise PyloxRuntimeError("Argument must be a list.")
+    return value
+
+
+def check_map(value: Any) -> LoxMap:
+    if not isinstance(value, LoxMap):
+        raise PyloxRuntimeError("Argument must be a map.")
+    return value
+
+
+def check_integer(value: Any) -> int:
+    if not check_number(value).is_integer():
+        raise PyloxRuntimeError("Argument must be a whole number.")
+    return int(value)
+
+
+def check_index(value: Any, length: int) -> int:
+    """
+    Check that ``value`` is a whole number indexing a sequence of
+    ``length`` items, counting from the end if negative, and return it
+    as a (non-negative) ``int``.
+    """
+
+    index: int = check_integer(value)
+    if index < 0:
+        index += length
+    if not 0 <= index < length:
+        raise PyloxRuntimeError("Index out of range.")
+    return index
+
+
+# Time.
+
+@native(0)
+def clock() -> float:
+    return time.time()
+
+
+# Strings.
+
+@native(1, "len")
+def len_(value: Any) -> float:
+    if isinstance(value, str):
+        return float(len(value))
+    if isinstance(value, (LoxList, LoxMap)):
+        return float(len(value.values))
+    raise PyloxRuntimeError("Argument must be a string, list or map.")
+
+
+@native(1, "str")
+def str_(value: Any) -> str:
+    return Interpreter.stringify(value)
+
+
+# A number literal as the scanner reads one, optionally negated.
+number_pattern: Pattern = re.compile(r"-?[0-9]+(?:\.[0-9]+)?")
+
+
+@native(1)
+def num(value: Any) -> Optional[float]:
+    """
+    The number ``value`` spells out, written as in Lox source, or nil if
+    it is not one.
+    """
+
+    if number_pattern.fullmatch(check_string(value)) is None:
+        return None
+    return float(value)
+
+
+@native(3)
+def substr(string: Any, start: Any, end: Any) -> str:
+    return check_string(string)[check_integer(start):check_integer(end)]
+
+
+@native(2)
+def find(string: Any, substring: Any) -> float:
+    return float(check_string(string).find(check_string(substring)))
+
+
+@native(3)
+def replace(string: Any, old: Any, new: Any) -> str:
+    return check_string(string).replace(check_string(old),
+                                        check_string(new))
+
+
+@native(1)
+def upper(string: Any) -> str:
+    return check_string(string).upper()
+
+
+@native(1)
+def lower(string: Any) -> str:
+    return check_string(string).lower()
+
+
+@native(2)
+def split(string: Any, separator: Any) -> LoxList:
+    check_string(string)
+    if not check_string(separator):
+        raise PyloxRuntimeError("Separator must not be empty.")
+    return LoxList(string.split(separator))
+
+
+@native(2)
+def join(items: Any, separator: Any) -> str:
+    return check_string(separator).join(map(Interpreter.stringify,
+                                            check_list(items).values))
+
+
+# Math.
+
+@native(1, "abs")
+def abs_(x: Any) -> float:
+    return math.fabs(check_number(x))
+
+
+@native(1)
+def floor(x: Any) -> float:
+    check_number(x)
+    return float(math.floor(x)) if math.isfinite(x) else x
+
+
+@native(1)
+def ceil(x: Any) -> float:
+    check_number(x)
+    return float(math.ceil(x)) if math.isfinite(x) else x
+
+
+@native(1)
+def sqrt(x: Any) -> float:
+    if check_number(x) < 0:
+        raise PyloxRuntimeError("Argument must not be negative.")
+    return math.sqrt(x)
+
+
+@native(2, "pow")
+def pow_(x: Any, y: Any) -> float:
+    try:
+        return math.pow(check_number(x), check_number(y))
+    except (OverflowError, ValueError):
+        raise PyloxRuntimeError("Result is not a number.")
+
+
+@native(2, "min")
+def min_(x: Any, y: Any) -> float:
+    return min(check_number(x), check_number(y))
+
+
+@native(2, "max")
+def max_(x: Any, y: Any) -> float:
+    return max(check_number(x), check_number(y))
+
+
+@native(0, "random")
+def random_() -> float:
+    return random.random()
+
+
+# Containers.
+
+@native(0, "list")
+def list_() -> LoxList:
+    return LoxList()
+
+
+@native(0, "map")
+def map_() -> LoxMap:
+    return LoxMap()
+
+
+@native(2)
+def push(items: Any, value: Any) -> None:
+    check_list(items).values.append(value)
+
+
+@native(1)
+def pop(items: Any) -> Any:
+    values: List[Any] = check_list(items).values
+    if not values:
+        raise PyloxRuntimeError("Cannot pop from an empty list.")
+    return values.pop()
+
+
+@native(2)
+def get(container: Any, key: Any) -> Any:
+    """
+    The item of a list at an index, or the value of a map for a key (nil
+    if it has none).
+    """
+
+    if isinstance(container, LoxList):
+        return container.values[check_index(key, len(container.values))]
+    return check_map(container).values.get(key)
+
+
+@native(3, "set")
+def set_(container: Any, key: Any, value: Any) -> Any:
+    if isinstance(container, LoxList):
+        container.values[check_index(key, len(container.values))] = value
+    else:
+        check_map(container).values[key] = value
+    return value
+
+
+@native(2)
+def has(mapping: Any, key: Any) -> bool:
+    return key in check_map(mapping).values
+
+
+@native(2)
+def remove(container: Any, key: Any) -> Any:
+    """
+    Remove the item of a list at an index, or the value of a map for a
+    key (if it has one), and return it.
+    """
+
+    if isinstance(container, LoxList):
+        return container.values.pop(check_index(key,
+                                                len(container.values)))
+    return check_map(container).values.pop(key, None)
+
+
+@native(1)
+def keys(mapping: Any) -> LoxList:
+    return LoxList(list(check_map(mapping).values))
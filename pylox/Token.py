@@ -5,6 +5,8 @@ from .TokenType import TokenType
 
 class Token:
 
+    __slots__ = ("token_type", "lexeme", "literal", "line_number")
+
     token_type: TokenType
     lexeme: str
     literal: Any
@@ -3,6 +3,12 @@ from enum import auto, Enum
 
 class TokenType(Enum):
 
+    # Members are only ever compared by identity, so they are hashed by
+    # identity too, rather than by ``Enum.__hash__`` (in Python), which
+    # makes looking them up in a dict (such as the parser's table of
+    # operator precedences) much cheaper.
+    __hash__ = object.__hash__
+
     # Single-character tokens.
     LEFT_PAREN = auto()
     RIGHT_PAREN = auto()
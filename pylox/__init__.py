@@ -5,11 +5,20 @@ pylox_package_dir_path: Path = Path(__file__).absolute().parent
 from pylox import ExprOrStmt
 from pylox import Lox
 from pylox.AstPrinter import AstPrinter
+from pylox.ClosureCompiler import ClosureCompiler
 from pylox.Environment import Environment
-from pylox.Interpreter import Interpreter
+from pylox.IncrementalParser import IncrementalParser
+from pylox.Interpreter import Interpreter, Native, native
+from pylox.Optimizer import Optimizer
+from pylox.Output import ListSink, NullSink, Output
 from pylox.Parser import Parser
+from pylox.ProgramCache import ProgramCache
 from pylox.PyloxRuntimeError import PyloxRuntimeError
 from pylox.Return import Return
-from pylox.Scanner import Scanner
+from pylox.Scanner import (ColumnarScanner, MappedScanner, RegexScanner,
+                           Scanner, StreamingScanner)
+from pylox.Session import Session
 from pylox.Token import Token
+from pylox.TokenStream import TokenStream
 from pylox.TokenType import TokenType
+from pylox import vm
@@ -1,9 +1,133 @@
+import argparse
+import json
 import sys
+from pathlib import Path
 
 import pylox
+from pylox.Batch import read_manifest, run_batch
+
+class ArgumentParser(argparse.ArgumentParser):
+    """
+    An argument parser that exits with the usage error status (64) that
+    ``plox`` has always used, rather than argparse's 2.
+    """
+
+    def error(self, message):
+        self.print_usage(sys.stderr)
+        self.exit(64, "{}: error: {}\n".format(self.prog, message))
+
+
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(
+            "must be a positive integer, not {}".format(value))
+    return number
+
+
+def options_parser():
+    """
+    Options shared by running one script and running a batch of them.
+    """
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--engine",
+                        choices=pylox.Interpreter.engines,
+                        default=pylox.Interpreter.engine,
+                        help="Execution engine.")
+
+    # Memory-mapped scripts have a scanner of their own.
+    scanning = parser.add_mutually_exclusive_group()
+    scanning.add_argument("--scanner",
+                          choices=sorted(pylox.Session.scanners),
+                          default="char",
+                          help="Scanning engine.")
+    scanning.add_argument("--mmap",
+                          action="store_true",
+                          help="Scan the script from a memory map of the "
+                               "file instead of reading it in. Cannot be "
+                               "combined with --scanner.")
+
+    parser.add_argument("--optimize",
+                        action="store_true",
+                        help="Fold constant expressions and prune dead "
+                             "branches before running.")
+    parser.add_argument("--cache-dir",
+                        help="Directory in which to cache parsed and "
+                             "resolved scripts, so that unchanged ones skip "
+                             "scanning, parsing and resolving next time.")
+    return parser
+
+
+def batch(args):
+    parser = ArgumentParser(
+        prog="plox batch",
+        parents=[options_parser()],
+        description="Run many Lox scripts in a pool of worker processes and "
+                    "report, as one JSON object per line and in the order "
+                    "given, each script's path, exit code, output and "
+                    "run time in seconds.")
+    parser.add_argument("scripts",
+                        nargs="*",
+                        help="Lox scripts to run.")
+    parser.add_argument("--manifest",
+                        action="append",
+                        default=[],
+                        help="File listing Lox scripts to run, one per line. "
+                             "May be given more than once.")
+    parser.add_argument("--workers",
+                        type=positive_int,
+                        help="Number of worker processes. Defaults to the "
+                             "number of CPUs.")
+    args = parser.parse_args(args)
+    paths = list(args.scripts)
+    for manifest in args.manifest:
+        paths.extend(read_manifest(manifest))
+    failed = False
+    for result in run_batch(paths,
+                            workers=args.workers,
+                            engine=args.engine,
+                            scanner=args.scanner,
+                            memory_map=args.mmap,
+                            cache_dir=args.cache_dir,
+                            optimize=args.optimize):
+        print(json.dumps(result.as_dict()), flush=True)
+        failed = failed or result.exit_code != 0
+    if failed:
+        sys.exit(1)
+
 
 def main():
-    pylox.Lox.Lox.run(sys.argv[1:])
+    # A script called "batch" in the current directory is still run as a
+    # script.
+    if sys.argv[1:2] == ["batch"] and not Path("batch").is_file():
+        batch(sys.argv[2:])
+        return
+    parser = ArgumentParser(prog="plox",
+                                     parents=[options_parser()],
+                                     description="Python Lox interpreter. "
+                                                 "Run \"plox batch -h\" for "
+                                                 "running many scripts at "
+                                                 "once (unless there is a "
+                                                 "script called \"batch\" "
+                                                 "in the current directory, "
+                                                 "which \"plox batch\" "
+                                                 "runs instead).")
+
+    # Take any number of scripts and leave checking that there is at most
+    # one to ``Session.main``, which exits with the usage error status
+    # (64) if not, as ``plox`` always has.
+    parser.add_argument("script",
+                        nargs="*",
+                        help="Lox script to run. Starts a REPL if omitted.")
+    args = parser.parse_args(sys.argv[1:])
+    pylox.Lox.Lox.interpreter.engine = args.engine
+    pylox.Lox.Lox.scanner = args.scanner
+    pylox.Lox.Lox.memory_map = args.mmap
+    pylox.Lox.Lox.optimize = args.optimize
+    if args.cache_dir is not None:
+        pylox.Lox.Lox.cache = pylox.ProgramCache(args.cache_dir)
+    pylox.Lox.Lox.main(args.script)
 
 
 if __name__ == "__main__":
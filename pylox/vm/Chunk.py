@@ -0,0 +1,182 @@
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+class OpCode(IntEnum):
+
+    # Constants and literals.
+    CONSTANT = 0
+    NIL = 1
+    TRUE = 2
+    FALSE = 3
+    POP = 4
+
+    # Variables.
+    GET_LOCAL = 5
+    SET_LOCAL = 6
+    GET_GLOBAL = 7
+    DEFINE_GLOBAL = 8
+    SET_GLOBAL = 9
+    GET_UPVALUE = 10
+    SET_UPVALUE = 11
+    CLOSE_UPVALUE = 12
+
+    # Properties.
+    GET_PROPERTY = 13
+    SET_PROPERTY = 14
+    CHECK_INSTANCE = 15
+    GET_SUPER = 16
+
+    # Operators.
+    EQUAL = 17
+    NOT_EQUAL = 18
+    GREATER = 19
+    GREATER_EQUAL = 20
+    LESS = 21
+    LESS_EQUAL = 22
+    ADD = 23
+    SUBTRACT = 24
+    MULTIPLY = 25
+    DIVIDE = 26
+    NOT = 27
+    NEGATE = 28
+
+    # Statements and control flow.
+    PRINT = 29
+    JUMP = 30
+    JUMP_IF_FALSE = 31
+    JUMP_IF_TRUE = 32
+    POP_JUMP_IF_FALSE = 33
+    LOOP = 34
+
+    # Functions and classes.
+    CALL = 35
+    CLOSURE = 36
+    RETURN = 37
+    CLASS = 38
+    INHERIT = 39
+    METHOD = 40
+    INVOKE = 41
+
+
+# Instructions whose operand is an index into the globals table rather than
+# into the constant pool.
+global_ops: Tuple[OpCode, ...] = (OpCode.GET_GLOBAL,
+                                  OpCode.DEFINE_GLOBAL,
+                                  OpCode.SET_GLOBAL)
+
+
+# Number of operand bytes that follow each instruction. ``CLOSURE`` is
+# additionally followed by two bytes per captured upvalue and ``INVOKE``
+# has a two-byte constant followed by a one-byte argument count.
+operand_widths: Dict[OpCode, int] = \
+    {OpCode.CONSTANT:          2,
+     OpCode.GET_LOCAL:         1,
+     OpCode.SET_LOCAL:         1,
+     OpCode.GET_GLOBAL:        2,
+     OpCode.DEFINE_GLOBAL:     2,
+     OpCode.SET_GLOBAL:        2,
+     OpCode.GET_UPVALUE:       1,
+     OpCode.SET_UPVALUE:       1,
+     OpCode.GET_PROPERTY:      2,
+     OpCode.SET_PROPERTY:      2,
+     OpCode.GET_SUPER:         2,
+     OpCode.JUMP:              2,
+     OpCode.JUMP_IF_FALSE:     2,
+     OpCode.JUMP_IF_TRUE:      2,
+     OpCode.POP_JUMP_IF_FALSE: 2,
+     OpCode.LOOP:              2,
+     OpCode.CALL:              1,
+     OpCode.CLOSURE:           2,
+     OpCode.CLASS:             2,
+     OpCode.METHOD:            2,
+     OpCode.INVOKE:            3}
+
+
+class Chunk:
+    """
+    A compiled sequence of bytecode.
+
+    ``code`` holds the instructions and their operands (multi-byte operands
+    are big-endian), ``constants`` is the constant pool referenced by
+    two-byte indices and ``lines`` records the source line of every byte in
+    ``code`` so runtime errors can be reported.
+    """
+
+    code: array
+    constants: List[Any]
+    lines: array
+    _constant_indices: Dict[Tuple[type, Any], int]
+
+    def __init__(self):
+        self.code = array("B")
+        self.constants = []
+        self.lines = array("I")
+        self._constant_indices = {}
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    def write(self, byte: int, line_number: int) -> None:
+        self.code.append(byte)
+        self.lines.append(line_number)
+
+    def add_constant(self, value: Any) -> int:
+
+        # Numbers and strings are interned so that, e.g., a property name
+        # used many times only occupies one slot. The type is part of the
+        # key since ``1.0 == True`` in Python, and numbers are keyed by
+        # their exact representation since ``-0.0 == 0.0``.
+        if isinstance(value, (float, str)):
+            key: Tuple[type, Any] = (type(value),
+                                     value.hex() if isinstance(value, float)
+                                     else value)
+            if key not in self._constant_indices:
+                self._constant_indices[key] = len(self.constants)
+                self.constants.append(value)
+            return self._constant_indices[key]
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def disassemble(self,
+                    name: str,
+                    global_names: Sequence[str] = ()) -> str:
+        lines: List[str] = ["== {} ==".format(name)]
+        offset: int = 0
+        while offset < len(self.code):
+            op: OpCode = OpCode(self.code[offset])
+            width: int = operand_widths.get(op, 0)
+            operand: int = 0
+            i: int
+            for i in range(width):
+                operand = (operand << 8) | self.code[offset + 1 + i]
+            text: str = "{:04d} {:4d} {:<17}".format(offset,
+                                                     self.lines[offset],
+                                                     op.name)
+            if op == OpCode.INVOKE:
+                text += " {:4d} '{}' ({} args)".format(
+                    operand >> 8, self.constants[operand >> 8], operand & 0xff)
+            elif width:
+                text += " {:4d}".format(operand)
+                if op in (OpCode.JUMP,
+                          OpCode.JUMP_IF_FALSE,
+                          OpCode.JUMP_IF_TRUE,
+                          OpCode.POP_JUMP_IF_FALSE):
+                    text += " -> {}".format(offset + 3 + operand)
+                elif op == OpCode.LOOP:
+                    text += " -> {}".format(offset + 3 - operand)
+                elif op in global_ops:
+                    if operand < len(global_names):
+                        text += " '{}'".format(global_names[operand])
+                elif width == 2:
+                    text += " '{}'".format(self.constants[operand])
+            offset += 1 + width
+            if op == OpCode.CLOSURE:
+                for _ in range(self.constants[operand].upvalue_count):
+                    text += " {}{}".format("local " if self.code[offset]
+                                           else "upvalue ",
+                                           self.code[offset + 1])
+                    offset += 2
+            lines.append(text)
+        return "\n".join(lines)
@@ -0,0 +1,542 @@
+from enum import auto, Enum
+from typing import List, Optional, Tuple, Union
+
+import pylox
+from ..Environment import GlobalEnvironment
+from ..ExprOrStmt import (Assign, Block, Binary, Call, Class, Expr,
+                          ExprVisitor, Expression, For, Function, If, Literal,
+                          Logical, Get, Grouping, Print, Return, Set, Stmt,
+                          StmtVisitor, Super, This, Unary, Variable, Var,
+                          While)
+from ..InlineCache import InlineCache
+from ..Token import Token
+from ..TokenType import TokenType
+from .Chunk import Chunk, OpCode
+from .Objects import VMFunction
+
+
+class FunctionType(Enum):
+    FUNCTION = auto()
+    INITIALIZER = auto()
+    METHOD = auto()
+    SCRIPT = auto()
+
+
+class Local:
+
+    name: str
+    depth: int
+    is_captured: bool
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class FunctionState:
+    """
+    Per-function compilation state: the function being built, the locals
+    currently on its stack window and the variables it captures from
+    enclosing functions.
+    """
+
+    enclosing: Optional["FunctionState"]
+    function: VMFunction
+    type_: FunctionType
+    locals: List[Local]
+    upvalues: List[Tuple[bool, int]]
+    scope_depth: int
+
+    def __init__(self,
+                 enclosing: Optional["FunctionState"],
+                 function: VMFunction,
+                 type_: FunctionType):
+        self.enclosing = enclosing
+        self.function = function
+        self.type_ = type_
+        self.upvalues = []
+        self.scope_depth = 0
+
+        # Slot zero holds the function being called or, in methods, the
+        # receiver.
+        self.locals = [Local("this" if type_ in (FunctionType.METHOD,
+                                                 FunctionType.INITIALIZER)
+                             else "",
+                             0)]
+
+
+class Compiler(ExprVisitor, StmtVisitor):
+    """
+    Compile the statements produced by ``Parser.parse`` into bytecode for
+    the ``VM``.
+
+    The program must already have passed the ``Resolver``, so the static
+    errors it reports (e.g., returning from top-level code) are not checked
+    again here. Scopes are resolved the same way, though: locals live in
+    stack slots and variables captured by closures become upvalues. Globals
+    are interned in ``globals_`` at compile time and addressed by their
+    index in its table. Errors are reported to ``session``.
+    """
+
+    session: "pylox.Session"
+    _globals: GlobalEnvironment
+    _state: Optional[FunctionState]
+    _line_number: int
+
+    # Limits imposed by the operand widths.
+    max_locals: int = 256
+    max_upvalues: int = 256
+    max_constants: int = 65536
+    max_globals: int = 65536
+    max_jump: int = 65535
+
+    def __init__(self,
+                 globals_: GlobalEnvironment,
+                 session: Optional["pylox.Session"] = None):
+        self.session = session if session is not None else pylox.Lox.Lox
+        self._globals = globals_
+        self._state = None
+        self._line_number = 1
+
+    def compile(self, exprs_or_stmts: List[Union[Expr, Stmt]]) -> VMFunction:
+        self._state = FunctionState(None, VMFunction(), FunctionType.SCRIPT)
+        self.compile_multi(exprs_or_stmts)
+        return self.end_function(self._line_number)
+
+    @property
+    def chunk(self) -> Chunk:
+        return self._state.function.chunk
+
+    def compile_single(self, expr_or_stmt: Union[Expr, Stmt]) -> None:
+        expr_or_stmt.accept(self)
+
+    def compile_multi(self,
+                      exprs_or_stmts: List[Union[Expr, Stmt]]) -> None:
+        for expr_or_stmt in exprs_or_stmts:
+            self.compile_single(expr_or_stmt)
+
+    def visit(self, expr_or_stmt: Union[Expr, Stmt]) -> None:
+        raise RuntimeError("Invalid expression: {}".format(expr_or_stmt))
+
+    # Emitting bytecode.
+
+    def emit(self, line_number: int, *bytes_: int) -> None:
+        self._line_number = line_number
+        byte: int
+        for byte in bytes_:
+            self.chunk.write(byte, line_number)
+
+    def emit_short(self, op: OpCode, operand: int, line_number: int) -> None:
+        self.emit(line_number, op, (operand >> 8) & 0xff, operand & 0xff)
+
+    def make_constant(self, value, line_number: int) -> int:
+        constant: int = self.chunk.add_constant(value)
+        if constant >= self.max_constants:
+            self.session.error(line_number,
+                               "Too many constants in one chunk.")
+            return 0
+        return constant
+
+    def emit_constant(self, op: OpCode, value, line_number: int) -> None:
+        self.emit_short(op, self.make_constant(value, line_number),
+                        line_number)
+
+    def emit_global(self, op: OpCode, name: Token) -> None:
+        index: int = self._globals.index(name.lexeme)
+        if index >= self.max_globals:
+            self.session.token_error(name, "Too many global variables.")
+            index = 0
+        self.emit_short(op, index, name.line_number)
+
+    def emit_jump(self, op: OpCode, line_number: int) -> int:
+        self.emit(line_number, op, 0xff, 0xff)
+        return len(self.chunk) - 2
+
+    def patch_jump(self, offset: int) -> None:
+
+        # -2 to adjust for the bytecode for the jump offset itself.
+        jump: int = len(self.chunk) - offset - 2
+        if jump > self.max_jump:
+            self.session.error(self.chunk.lines[offset],
+                               "Too much code to jump over.")
+        self.chunk.code[offset] = (jump >> 8) & 0xff
+        self.chunk.code[offset + 1] = jump & 0xff
+
+    def emit_loop(self, loop_start: int, line_number: int) -> None:
+        offset: int = len(self.chunk) - loop_start + 3
+        if offset > self.max_jump:
+            self.session.error(line_number, "Loop body too large.")
+        self.emit_short(OpCode.LOOP, offset, line_number)
+
+    def emit_return(self, line_number: int) -> None:
+        if self._state.type_ == FunctionType.INITIALIZER:
+            self.emit(line_number, OpCode.GET_LOCAL, 0)
+        else:
+            self.emit(line_number, OpCode.NIL)
+        self.emit(line_number, OpCode.RETURN)
+
+    def end_function(self, line_number: int) -> VMFunction:
+        self.emit_return(line_number)
+        function: VMFunction = self._state.function
+        function.upvalue_count = len(self._state.upvalues)
+        self._state = self._state.enclosing
+        return function
+
+    # Scopes and variables.
+
+    def begin_scope(self) -> None:
+        self._state.scope_depth += 1
+
+    def end_scope(self, line_number: int) -> None:
+        state: FunctionState = self._state
+        state.scope_depth -= 1
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals[-1].is_captured:
+                self.emit(line_number, OpCode.CLOSE_UPVALUE)
+            else:
+                self.emit(line_number, OpCode.POP)
+            state.locals.pop()
+
+    def add_local(self, name: Token) -> None:
+        if len(self._state.locals) >= self.max_locals:
+            self.session.token_error(name,
+                                     "Too many local variables in "
+                                     "function.")
+            return
+        self._state.locals.append(Local(name.lexeme,
+                                        self._state.scope_depth))
+
+    def define_variable(self, name: Token) -> None:
+        """
+        Bind the value on top of the stack to ``name``. Locals simply stay
+        in their stack slot; globals are moved into the globals table.
+        """
+
+        if self._state.scope_depth > 0:
+            self.add_local(name)
+            return
+        self.emit_global(OpCode.DEFINE_GLOBAL, name)
+
+    @staticmethod
+    def resolve_local(state: FunctionState, name: str) -> int:
+        i: int
+        for i in range(len(state.locals) - 1, -1, -1):
+            if state.locals[i].name == name:
+                return i
+        return -1
+
+    def add_upvalue(self,
+                    state: FunctionState,
+                    is_local: bool,
+                    index: int,
+                    name: Token) -> int:
+        upvalue: Tuple[bool, int] = (is_local, index)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+        if len(state.upvalues) >= self.max_upvalues:
+            self.session.token_error(name,
+                                     "Too many closure variables in "
+                                     "function.")
+            return 0
+        state.upvalues.append(upvalue)
+        return len(state.upvalues) - 1
+
+    def resolve_upvalue(self, state: FunctionState, name: Token) -> int:
+        if state.enclosing is None:
+            return -1
+
+        local: int = self.resolve_local(state.enclosing, name.lexeme)
+        if local != -1:
+            state.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(state, True, local, name)
+
+        upvalue: int = self.resolve_upvalue(state.enclosing, name)
+        if upvalue != -1:
+            return self.add_upvalue(state, False, upvalue, name)
+
+        return -1
+
+    def named_variable(self, name: Token, assign: bool = False) -> None:
+        slot: int = self.resolve_local(self._state, name.lexeme)
+        if slot != -1:
+            self.emit(name.line_number,
+                      OpCode.SET_LOCAL if assign else OpCode.GET_LOCAL,
+                      slot)
+            return
+
+        slot = self.resolve_upvalue(self._state, name)
+        if slot != -1:
+            self.emit(name.line_number,
+                      OpCode.SET_UPVALUE if assign else OpCode.GET_UPVALUE,
+                      slot)
+            return
+
+        self.emit_global(OpCode.SET_GLOBAL if assign else OpCode.GET_GLOBAL,
+                         name)
+
+    # Expressions.
+
+    def visit_literal_expr(self, expr: Literal) -> None:
+
+        # Literals the parser made know their line; those made otherwise
+        # inherit the line of the previous instruction.
+        line_number: int = (expr.line_number if expr.line_number is not None
+                            else self._line_number)
+        if expr.value is None:
+            self.emit(line_number, OpCode.NIL)
+        elif expr.value is True:
+            self.emit(line_number, OpCode.TRUE)
+        elif expr.value is False:
+            self.emit(line_number, OpCode.FALSE)
+        else:
+            self.emit_constant(OpCode.CONSTANT, expr.value, line_number)
+
+    def visit_grouping_expr(self, expr: Grouping) -> None:
+        self.compile_single(expr.expr_or_stmt)
+
+    def visit_variable_expr(self, expr: Variable) -> None:
+        self.named_variable(expr.name)
+
+    def visit_assign_expr(self, expr: Assign) -> None:
+        self.compile_single(expr.value)
+        self.named_variable(expr.name, assign=True)
+
+    def visit_this_expr(self, expr: This) -> None:
+        self.named_variable(expr.keyword)
+
+    def visit_super_expr(self, expr: Super) -> None:
+        self.named_variable(Token(TokenType.THIS,
+                                  "this",
+                                  None,
+                                  expr.keyword.line_number))
+        self.named_variable(expr.keyword)
+        self.emit_constant(OpCode.GET_SUPER,
+                           InlineCache(expr.method.lexeme),
+                           expr.method.line_number)
+
+    def visit_unary_expr(self, expr: Unary) -> None:
+        self.compile_single(expr.right)
+        self.emit(expr.operator.line_number,
+                  OpCode.NOT if expr.operator.token_type == TokenType.BANG
+                  else OpCode.NEGATE)
+
+    binary_ops = {TokenType.BANG_EQUAL:    OpCode.NOT_EQUAL,
+                  TokenType.EQUAL_EQUAL:   OpCode.EQUAL,
+                  TokenType.GREATER:       OpCode.GREATER,
+                  TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+                  TokenType.LESS:          OpCode.LESS,
+                  TokenType.LESS_EQUAL:    OpCode.LESS_EQUAL,
+                  TokenType.MINUS:         OpCode.SUBTRACT,
+                  TokenType.PLUS:          OpCode.ADD,
+                  TokenType.SLASH:         OpCode.DIVIDE,
+                  TokenType.STAR:          OpCode.MULTIPLY}
+
+    def visit_binary_expr(self, expr: Binary) -> None:
+        self.compile_single(expr.left)
+        self.compile_single(expr.right)
+        self.emit(expr.operator.line_number,
+                  self.binary_ops[expr.operator.token_type])
+
+    def visit_logical_expr(self, expr: Logical) -> None:
+        self.compile_single(expr.left)
+        line_number: int = expr.operator.line_number
+        end_jump: int = \
+            self.emit_jump(OpCode.JUMP_IF_TRUE
+                           if expr.operator.token_type == TokenType.OR
+                           else OpCode.JUMP_IF_FALSE,
+                           line_number)
+        self.emit(line_number, OpCode.POP)
+        self.compile_single(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_call_expr(self, expr: Call) -> None:
+
+        # A method call looks the method up only after the arguments are
+        # evaluated, so it is only used when that cannot be observed (the
+        # lookup may fail).
+        if (isinstance(expr.callee, Get) and
+            not any(self.has_effects(argument)
+                    for argument in expr.arguments)):
+            self.compile_single(expr.callee.object)
+            self.compile_multi(expr.arguments)
+            self.emit_constant(OpCode.INVOKE,
+                               InlineCache(expr.callee.name.lexeme),
+                               expr.callee.name.line_number)
+            self.emit(expr.paren.line_number, len(expr.arguments))
+            return
+        self.compile_single(expr.callee)
+        self.compile_multi(expr.arguments)
+        self.emit(expr.paren.line_number, OpCode.CALL, len(expr.arguments))
+
+    def has_effects(self, expr: Union[Expr, Stmt]) -> bool:
+        """
+        Whether evaluating ``expr`` could be observed, i.e., print
+        something or fail.
+        """
+
+        if isinstance(expr, (Literal, This)):
+            return False
+        if isinstance(expr, Grouping):
+            return self.has_effects(expr.expr_or_stmt)
+
+        # Unlike globals, locals and upvalues are always defined.
+        if isinstance(expr, Variable):
+            return (self.resolve_local(self._state, expr.name.lexeme) == -1 and
+                    self.resolve_upvalue(self._state, expr.name) == -1)
+        return True
+
+    def visit_get_expr(self, expr: Get) -> None:
+        self.compile_single(expr.object)
+        self.emit_constant(OpCode.GET_PROPERTY,
+                           InlineCache(expr.name.lexeme),
+                           expr.name.line_number)
+
+    def visit_set_expr(self, expr: Set) -> None:
+        self.compile_single(expr.object)
+
+        # The object must be checked before the value is evaluated, as the
+        # tree-walker does, unless evaluating the value cannot be observed.
+        if self.has_effects(expr.value):
+            self.emit(expr.name.line_number, OpCode.CHECK_INSTANCE)
+        self.compile_single(expr.value)
+        self.emit_constant(OpCode.SET_PROPERTY,
+                           InlineCache(expr.name.lexeme),
+                           expr.name.line_number)
+
+    # Statements.
+
+    def visit_expression_stmt(self, stmt: Expression) -> None:
+        self.compile_single(stmt.expression)
+        line_number: int = self._line_number
+        self.emit(line_number,
+                  OpCode.PRINT if self.session.repl else OpCode.POP)
+
+    def visit_print_stmt(self, stmt: Print) -> None:
+        self.compile_single(stmt.expression)
+        self.emit(self._line_number, OpCode.PRINT)
+
+    def visit_var_stmt(self, stmt: Var) -> None:
+        self._line_number = stmt.name.line_number
+        if stmt.initializer is None:
+            self.emit(stmt.name.line_number, OpCode.NIL)
+        else:
+            self.compile_single(stmt.initializer)
+        self.define_variable(stmt.name)
+
+    def visit_block_stmt(self, stmt: Block) -> None:
+        self.begin_scope()
+        self.compile_multi(stmt.exprs_or_stmts)
+        self.end_scope(self._line_number)
+
+    def visit_if_stmt(self, stmt: If) -> None:
+        self.compile_single(stmt.condition)
+        line_number: int = self._line_number
+        then_jump: int = self.emit_jump(OpCode.POP_JUMP_IF_FALSE,
+                                        line_number)
+        self.compile_single(stmt.then_branch)
+        if stmt.else_branch is None:
+            self.patch_jump(then_jump)
+            return
+        else_jump: int = self.emit_jump(OpCode.JUMP, line_number)
+        self.patch_jump(then_jump)
+        self.compile_single(stmt.else_branch)
+        self.patch_jump(else_jump)
+
+    def visit_while_stmt(self, stmt: While) -> None:
+        loop_start: int = len(self.chunk)
+        self.compile_single(stmt.condition)
+        line_number: int = self._line_number
+        exit_jump: int = self.emit_jump(OpCode.POP_JUMP_IF_FALSE,
+                                        line_number)
+        self.compile_single(stmt.body)
+        self.emit_loop(loop_start, line_number)
+        self.patch_jump(exit_jump)
+
+    def visit_for_stmt(self, stmt: For) -> None:
+        self.begin_scope()
+        if stmt.initializer is not None:
+            self.compile_single(stmt.initializer)
+        loop_start: int = len(self.chunk)
+        exit_jump: Optional[int] = None
+        if stmt.condition is not None:
+            self.compile_single(stmt.condition)
+            exit_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE,
+                                       self._line_number)
+        self.compile_single(stmt.body)
+        if stmt.increment is not None:
+            self.compile_single(stmt.increment)
+            self.emit(self._line_number, OpCode.POP)
+        self.emit_loop(loop_start, self._line_number)
+        if exit_jump is not None:
+            self.patch_jump(exit_jump)
+        self.end_scope(self._line_number)
+
+    def visit_return_stmt(self, stmt: Return) -> None:
+        if stmt.value is None:
+            self.emit_return(stmt.keyword.line_number)
+            return
+        self.compile_single(stmt.value)
+        self.emit(stmt.keyword.line_number, OpCode.RETURN)
+
+    def function(self, stmt: Function, type_: FunctionType) -> None:
+        function: VMFunction = VMFunction(stmt.name.lexeme)
+        function.arity = len(stmt.params)
+        self._state = FunctionState(self._state, function, type_)
+        self.begin_scope()
+        param: Token
+        for param in stmt.params:
+            self.add_local(param)
+        self.compile_multi(stmt.body)
+
+        # No need to end the scope: returning discards the whole frame.
+        state: FunctionState = self._state
+        self.end_function(self._line_number)
+
+        line_number: int = stmt.name.line_number
+        self.emit_constant(OpCode.CLOSURE, function, line_number)
+        is_local: bool
+        index: int
+        for is_local, index in state.upvalues:
+            self.emit(line_number, 1 if is_local else 0, index)
+
+    def visit_function_stmt(self, stmt: Function) -> None:
+
+        # A local function is marked initialized before its body is
+        # compiled so that it can refer to itself.
+        if self._state.scope_depth > 0:
+            self.add_local(stmt.name)
+            self.function(stmt, FunctionType.FUNCTION)
+            return
+        self.function(stmt, FunctionType.FUNCTION)
+        self.define_variable(stmt.name)
+
+    def visit_class_stmt(self, stmt: Class) -> None:
+        name: Token = stmt.name
+        self.emit_constant(OpCode.CLASS, name.lexeme, name.line_number)
+        self.define_variable(name)
+
+        if stmt.super_class is not None:
+            self.begin_scope()
+            self.compile_single(stmt.super_class)
+            self.add_local(Token(TokenType.SUPER,
+                                 "super",
+                                 None,
+                                 stmt.super_class.name.line_number))
+            self.named_variable(name)
+            self.emit(stmt.super_class.name.line_number, OpCode.INHERIT)
+
+        self.named_variable(name)
+        method: Function
+        for method in stmt.methods:
+            self.function(method,
+                          FunctionType.INITIALIZER
+                          if method.name.lexeme == "init"
+                          else FunctionType.METHOD)
+            self.emit_constant(OpCode.METHOD,
+                               method.name.lexeme,
+                               method.name.line_number)
+        self.emit(name.line_number, OpCode.POP)
+
+        if stmt.super_class is not None:
+            self.end_scope(name.line_number)
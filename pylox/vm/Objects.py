@@ -0,0 +1,98 @@
+from typing import Any, List, Optional
+
+from ..Interpreter import LoxInstance
+from .Chunk import Chunk
+
+
+class VMFunction:
+    """
+    A compiled function: its bytecode plus what the VM needs to set up a
+    call frame for it. Created once by the ``Compiler`` and stored in the
+    constant pool of the enclosing function.
+    """
+
+    name: Optional[str]
+    arity: int
+    upvalue_count: int
+    chunk: Chunk
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.arity = 0
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __str__(self):
+        if self.name is None:
+            return "<script>"
+        return "<fn {}>".format(self.name)
+
+    def __repr__(self):
+        return str(self)
+
+
+class Upvalue:
+    """
+    A captured variable.
+
+    While the variable is still on the VM stack, ``cells`` is the stack
+    itself and ``index`` is the variable's slot. Closing the upvalue moves
+    the value into a private one-element list, so reads and writes are
+    always ``cells[index]``.
+    """
+
+    __slots__ = ("cells", "index")
+
+    cells: List[Any]
+    index: int
+
+    def __init__(self, cells: List[Any], index: int):
+        self.cells = cells
+        self.index = index
+
+    def close(self) -> None:
+        self.cells = [self.cells[self.index]]
+        self.index = 0
+
+
+class VMClosure:
+
+    __slots__ = ("function", "upvalues")
+
+    function: VMFunction
+    upvalues: List[Upvalue]
+
+    def __init__(self, function: VMFunction, upvalues: List[Upvalue]):
+        self.function = function
+        self.upvalues = upvalues
+
+    @property
+    def arity(self) -> int:
+        return self.function.arity
+
+    def bind(self, instance: LoxInstance) -> "VMBoundMethod":
+        return VMBoundMethod(instance, self)
+
+    def __str__(self):
+        return str(self.function)
+
+    def __repr__(self):
+        return str(self)
+
+
+class VMBoundMethod:
+
+    __slots__ = ("receiver", "method")
+
+    receiver: LoxInstance
+    method: VMClosure
+
+    def __init__(self, receiver: LoxInstance, method: VMClosure):
+        self.receiver = receiver
+        self.method = method
+
+    def __str__(self):
+        return str(self.method)
+
+    def __repr__(self):
+        return str(self)
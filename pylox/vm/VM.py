@@ -0,0 +1,477 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..Environment import GlobalEnvironment, UNDEFINED
+from ..InlineCache import InlineCache
+from ..Interpreter import (Interpreter, LoxCallable, LoxClass, LoxInstance,
+                           Native, Shape)
+from ..PyloxRuntimeError import PyloxRuntimeError
+from .Chunk import OpCode
+from .Objects import Upvalue, VMBoundMethod, VMClosure, VMFunction
+
+
+class VM:
+    """
+    A stack-based virtual machine for the bytecode produced by the
+    ``Compiler``.
+
+    Globals are shared with the ``Interpreter`` so that natives such as
+    ``clock`` are available and so that a REPL session keeps its
+    definitions between lines. Global instructions carry the variable's
+    index in that table, so no name lookups happen at runtime. Classes and
+    instances are the interpreter's ``LoxClass``/``LoxInstance``, with
+    ``VMClosure`` methods.
+    """
+
+    _interpreter: Interpreter
+    _globals: GlobalEnvironment
+
+    # Calls nested deeper than this raise a runtime error instead of
+    # exhausting memory.
+    max_frames: int = 10000
+
+    def __init__(self, interpreter: Interpreter):
+        self._interpreter = interpreter
+        self._globals = interpreter._globals
+
+    @staticmethod
+    def error(message: str, line_number: int) -> PyloxRuntimeError:
+        return PyloxRuntimeError(message, line_number=line_number)
+
+    def run(self, function: VMFunction) -> None:
+
+        # The hot loop below keeps everything it touches in local
+        # variables; attribute and global lookups are comparatively
+        # expensive in CPython.
+        interpreter: Interpreter = self._interpreter
+        global_names: List[str] = self._globals.names
+        globals_: List[Any] = self._globals.slots
+        stringify = Interpreter.stringify
+        write = interpreter.session.output.write
+        error = self.error
+        max_frames: int = self.max_frames
+
+        CONSTANT = OpCode.CONSTANT.value
+        NIL = OpCode.NIL.value
+        TRUE = OpCode.TRUE.value
+        FALSE = OpCode.FALSE.value
+        POP = OpCode.POP.value
+        GET_LOCAL = OpCode.GET_LOCAL.value
+        SET_LOCAL = OpCode.SET_LOCAL.value
+        GET_GLOBAL = OpCode.GET_GLOBAL.value
+        DEFINE_GLOBAL = OpCode.DEFINE_GLOBAL.value
+        SET_GLOBAL = OpCode.SET_GLOBAL.value
+        GET_UPVALUE = OpCode.GET_UPVALUE.value
+        SET_UPVALUE = OpCode.SET_UPVALUE.value
+        CLOSE_UPVALUE = OpCode.CLOSE_UPVALUE.value
+        GET_PROPERTY = OpCode.GET_PROPERTY.value
+        SET_PROPERTY = OpCode.SET_PROPERTY.value
+        CHECK_INSTANCE = OpCode.CHECK_INSTANCE.value
+        GET_SUPER = OpCode.GET_SUPER.value
+        EQUAL = OpCode.EQUAL.value
+        NOT_EQUAL = OpCode.NOT_EQUAL.value
+        GREATER = OpCode.GREATER.value
+        GREATER_EQUAL = OpCode.GREATER_EQUAL.value
+        LESS = OpCode.LESS.value
+        LESS_EQUAL = OpCode.LESS_EQUAL.value
+        ADD = OpCode.ADD.value
+        SUBTRACT = OpCode.SUBTRACT.value
+        MULTIPLY = OpCode.MULTIPLY.value
+        DIVIDE = OpCode.DIVIDE.value
+        NOT = OpCode.NOT.value
+        NEGATE = OpCode.NEGATE.value
+        PRINT = OpCode.PRINT.value
+        JUMP = OpCode.JUMP.value
+        JUMP_IF_FALSE = OpCode.JUMP_IF_FALSE.value
+        JUMP_IF_TRUE = OpCode.JUMP_IF_TRUE.value
+        POP_JUMP_IF_FALSE = OpCode.POP_JUMP_IF_FALSE.value
+        LOOP = OpCode.LOOP.value
+        CALL = OpCode.CALL.value
+        CLOSURE = OpCode.CLOSURE.value
+        RETURN = OpCode.RETURN.value
+        CLASS = OpCode.CLASS.value
+        INHERIT = OpCode.INHERIT.value
+        METHOD = OpCode.METHOD.value
+        INVOKE = OpCode.INVOKE.value
+
+        closure: VMClosure = VMClosure(function, [])
+        stack: List[Any] = [closure]
+        push = stack.append
+        pop = stack.pop
+        frames: List[Tuple[VMClosure, int, int]] = []
+        open_upvalues: Dict[int, Upvalue] = {}
+
+        code = function.chunk.code
+        constants: List[Any] = function.chunk.constants
+        lines = function.chunk.lines
+        ip: int = 0
+        base: int = 0
+
+        while True:
+            op: int = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                push(stack[base + code[ip]])
+                ip += 1
+
+            elif op == CONSTANT:
+                push(constants[(code[ip] << 8) | code[ip + 1]])
+                ip += 2
+
+            elif op == GET_GLOBAL:
+                index: int = (code[ip] << 8) | code[ip + 1]
+                ip += 2
+                value: Any = globals_[index]
+                if value is UNDEFINED:
+                    raise error("Undefined variable '{}'."
+                                .format(global_names[index]),
+                                lines[ip - 1])
+                push(value)
+
+            elif op == POP_JUMP_IF_FALSE:
+                value = pop()
+                if value is None or value is False:
+                    ip += (code[ip] << 8) | code[ip + 1]
+                ip += 2
+
+            elif op == LESS:
+                b: Any = pop()
+                a: Any = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise error("Operands must be numbers.", lines[ip - 1])
+                stack[-1] = a < b
+
+            elif op == ADD:
+                b = pop()
+                a = stack[-1]
+                if isinstance(a, float) and isinstance(b, float):
+                    stack[-1] = a + b
+                elif isinstance(a, str) and isinstance(b, str):
+                    stack[-1] = a + b
+                else:
+                    raise error("Operands must be two numbers or two "
+                                "strings.",
+                                lines[ip - 1])
+
+            elif op == SUBTRACT:
+                b = pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise error("Operands must be numbers.", lines[ip - 1])
+                stack[-1] = a - b
+
+            elif op == CALL or op == INVOKE:
+                cache: Optional[InlineCache] = None
+                if op == INVOKE:
+                    cache = constants[(code[ip] << 8) | code[ip + 1]]
+                    ip += 2
+                arg_count: int = code[ip]
+                ip += 1
+                callee_slot: int = len(stack) - arg_count - 1
+                callee: Any = stack[callee_slot]
+                callee_closure: Optional[VMClosure] = None
+
+                # A method call: the receiver is in the callee's slot
+                # already, so unless the name is a field the method is
+                # called directly, without binding it first.
+                if cache is not None:
+                    if not isinstance(callee, LoxInstance):
+                        raise error("Only instances have properties.",
+                                    lines[ip - 2])
+                    shape: Shape = callee.shape
+                    slot: Optional[int] = (cache.slot if shape is cache.shape
+                                           else cache.field(shape))
+                    if slot is not None:
+                        callee = stack[callee_slot] = callee.values[slot]
+                    else:
+                        klass: LoxClass = callee.klass
+                        callee_closure = (cache.method
+                                          if klass is cache.klass
+                                          else cache.lookup(klass))
+                        if callee_closure is None:
+                            raise error("Undefined property '{}'."
+                                        .format(cache.name),
+                                        lines[ip - 2])
+
+                if callee_closure is not None:
+                    pass
+                elif type(callee) is VMClosure:
+                    callee_closure = callee
+                elif type(callee) is VMBoundMethod:
+                    stack[callee_slot] = callee.receiver
+                    callee_closure = callee.method
+                elif type(callee) is Native and callee.arity == arg_count:
+
+                    # The result replaces the callee, so the arguments are
+                    # taken straight off the stack when there are few.
+                    native_function: Callable[..., Any] = callee.function
+                    try:
+                        if arg_count == 0:
+                            stack[-1] = native_function()
+                        elif arg_count == 1:
+                            stack[-1] = native_function(pop())
+                        elif arg_count == 2:
+                            second: Any = pop()
+                            stack[-1] = native_function(pop(), second)
+                        else:
+                            result = native_function(*stack[callee_slot + 1:])
+                            del stack[callee_slot:]
+                            push(result)
+                    except PyloxRuntimeError as native_error:
+                        raise native_error.at(lines[ip - 1])
+                    continue
+                elif isinstance(callee, LoxClass):
+                    instance: LoxInstance = LoxInstance(callee)
+                    initializer: Any = callee.initializer
+                    if type(initializer) is VMClosure:
+                        stack[callee_slot] = instance
+                        callee_closure = initializer
+                    elif initializer is None:
+                        if arg_count != 0:
+                            raise error("Expected 0 arguments but got {}."
+                                        .format(arg_count),
+                                        lines[ip - 1])
+                        stack[callee_slot] = instance
+                        continue
+                if callee_closure is None:
+                    if not isinstance(callee, LoxCallable):
+                        raise error("Can only call functions and classes.",
+                                    lines[ip - 1])
+                    if arg_count != callee.arity:
+                        raise error("Expected {} arguments but got {}."
+                                    .format(callee.arity, arg_count),
+                                    lines[ip - 1])
+                    try:
+                        result: Any = callee.call(interpreter,
+                                                  stack[callee_slot + 1:])
+                    except PyloxRuntimeError as call_error:
+                        raise call_error.at(lines[ip - 1])
+                    del stack[callee_slot:]
+                    push(result)
+                    continue
+
+                if arg_count != callee_closure.function.arity:
+                    raise error("Expected {} arguments but got {}."
+                                .format(callee_closure.function.arity,
+                                        arg_count),
+                                lines[ip - 1])
+                if len(frames) >= max_frames:
+                    raise error("Stack overflow.", lines[ip - 1])
+                frames.append((closure, ip, base))
+                closure = callee_closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                lines = closure.function.chunk.lines
+                ip = 0
+                base = callee_slot
+
+            elif op == RETURN:
+                result = pop()
+                if open_upvalues:
+                    self.close_upvalues(open_upvalues, base)
+                if not frames:
+                    return
+                del stack[base:]
+                push(result)
+                closure, ip, base = frames.pop()
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                lines = closure.function.chunk.lines
+
+            elif op == POP:
+                pop()
+
+            elif op == SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+
+            elif op == GET_UPVALUE:
+                upvalue: Upvalue = closure.upvalues[code[ip]]
+                push(upvalue.cells[upvalue.index])
+                ip += 1
+
+            elif op == SET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                upvalue.cells[upvalue.index] = stack[-1]
+                ip += 1
+
+            elif op == GET_PROPERTY:
+                cache = constants[(code[ip] << 8) | code[ip + 1]]
+                ip += 2
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise error("Only instances have properties.",
+                                lines[ip - 1])
+                shape = instance.shape
+                slot = (cache.slot if shape is cache.shape
+                        else cache.field(shape))
+                if slot is not None:
+                    stack[-1] = instance.values[slot]
+                    continue
+                klass = instance.klass
+                method: Any = (cache.method if klass is cache.klass
+                               else cache.lookup(klass))
+                if method is None:
+                    raise error("Undefined property '{}'.".format(cache.name),
+                                lines[ip - 1])
+                stack[-1] = method.bind(instance)
+
+            elif op == SET_PROPERTY:
+                cache = constants[(code[ip] << 8) | code[ip + 1]]
+                ip += 2
+                value = pop()
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise error("Only instances have fields.", lines[ip - 1])
+                shape = instance.shape
+                slot = (cache.slot if shape is cache.shape
+                        else cache.field(shape))
+                if slot is None:
+                    instance.add_field(cache.name, value)
+                else:
+                    instance.values[slot] = value
+                stack[-1] = value
+
+            elif op == CHECK_INSTANCE:
+                if not isinstance(stack[-1], LoxInstance):
+                    raise error("Only instances have fields.", lines[ip - 1])
+
+            elif op == JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += (code[ip] << 8) | code[ip + 1]
+                ip += 2
+
+            elif op == JUMP_IF_TRUE:
+                value = stack[-1]
+                if value is not None and value is not False:
+                    ip += (code[ip] << 8) | code[ip + 1]
+                ip += 2
+
+            elif op == JUMP:
+                ip += ((code[ip] << 8) | code[ip + 1]) + 2
+
+            elif op == LOOP:
+                ip -= ((code[ip] << 8) | code[ip + 1]) - 2
+
+            elif op == NIL:
+                push(None)
+
+            elif op == TRUE:
+                push(True)
+
+            elif op == FALSE:
+                push(False)
+
+            elif op == EQUAL:
+                b = pop()
+                stack[-1] = Interpreter.is_equal(stack[-1], b)
+
+            elif op == NOT_EQUAL:
+                b = pop()
+                stack[-1] = not Interpreter.is_equal(stack[-1], b)
+
+            elif op in (GREATER, GREATER_EQUAL, LESS_EQUAL, MULTIPLY,
+                        DIVIDE):
+                b = pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise error("Operands must be numbers.", lines[ip - 1])
+                if op == GREATER:
+                    stack[-1] = a > b
+                elif op == GREATER_EQUAL:
+                    stack[-1] = a >= b
+                elif op == LESS_EQUAL:
+                    stack[-1] = a <= b
+                elif op == MULTIPLY:
+                    stack[-1] = a*b
+                else:
+                    stack[-1] = a/b
+
+            elif op == NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+
+            elif op == NEGATE:
+                value = stack[-1]
+                if not isinstance(value, float):
+                    raise error("Operand must be a number.", lines[ip - 1])
+                stack[-1] = -value
+
+            elif op == PRINT:
+                write(stringify(pop()) + "\n")
+
+            elif op == DEFINE_GLOBAL:
+                globals_[(code[ip] << 8) | code[ip + 1]] = pop()
+                ip += 2
+
+            elif op == SET_GLOBAL:
+                index = (code[ip] << 8) | code[ip + 1]
+                ip += 2
+                if globals_[index] is UNDEFINED:
+                    raise error("Undefined variable '{}'."
+                                .format(global_names[index]),
+                                lines[ip - 1])
+                globals_[index] = stack[-1]
+
+            elif op == CLOSURE:
+                function = constants[(code[ip] << 8) | code[ip + 1]]
+                ip += 2
+                upvalues: List[Upvalue] = []
+                for _ in range(function.upvalue_count):
+                    index = code[ip + 1]
+                    if code[ip]:
+                        slot: int = base + index
+                        upvalue = open_upvalues.get(slot)
+                        if upvalue is None:
+                            upvalue = Upvalue(stack, slot)
+                            open_upvalues[slot] = upvalue
+                        upvalues.append(upvalue)
+                    else:
+                        upvalues.append(closure.upvalues[index])
+                    ip += 2
+                push(VMClosure(function, upvalues))
+
+            elif op == CLOSE_UPVALUE:
+                self.close_upvalues(open_upvalues, len(stack) - 1)
+                pop()
+
+            elif op == GET_SUPER:
+                cache = constants[(code[ip] << 8) | code[ip + 1]]
+                ip += 2
+                super_class: LoxClass = pop()
+                method = cache.lookup(super_class)
+                if method is None:
+                    raise error("Undefined property '{}'."
+                                .format(cache.name),
+                                lines[ip - 1])
+                stack[-1] = method.bind(stack[-1])
+
+            elif op == CLASS:
+                push(LoxClass(constants[(code[ip] << 8) | code[ip + 1]],
+                              None,
+                              {}))
+                ip += 2
+
+            elif op == INHERIT:
+                klass = pop()
+                super_class = stack[-1]
+                if not isinstance(super_class, LoxClass):
+                    raise error("Superclass must be a class.",
+                                lines[ip - 1])
+                klass.inherit(super_class)
+
+            elif op == METHOD:
+                name = constants[(code[ip] << 8) | code[ip + 1]]
+                ip += 2
+                method = pop()
+                stack[-1].add_method(name, method)
+
+            else:
+                raise RuntimeError("Unknown opcode {}.".format(op))
+
+    @staticmethod
+    def close_upvalues(open_upvalues: Dict[int, Upvalue], last: int) -> None:
+        slot: int
+        for slot in [slot for slot in open_upvalues if slot >= last]:
+            open_upvalues.pop(slot).close()
@@ -0,0 +1,4 @@
+from pylox.vm.Chunk import Chunk, OpCode
+from pylox.vm.Compiler import Compiler
+from pylox.vm.Objects import Upvalue, VMBoundMethod, VMClosure, VMFunction
+from pylox.vm.VM import VM
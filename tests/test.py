@@ -1,6 +1,8 @@
-from io import StringIO
+import gc
+from io import BytesIO, StringIO, TextIOWrapper
 from contextlib import redirect_stdout
 from pathlib import Path
+from tempfile import TemporaryDirectory
 
 from unittest import TestCase
 
@@ -9,17 +11,43 @@ from pylox import Token
 from pylox import TokenType
 from pylox import Scanner
 from pylox import AstPrinter
+from pylox import ExprOrStmt
+from pylox import Interpreter
+from pylox import vm
+from pylox.Batch import read_manifest, run_batch
+from pylox.Environment import UNDEFINED
 from pylox.ExprOrStmt import Binary, Unary, Literal, Grouping
+from pylox.IncrementalParser import nodes
+from pylox.Interpreter import natives
+from pylox.PyloxRuntimeError import PyloxRuntimeError
 
 test_data_dir_path = Path(__file__).absolute().parent / "test_data"
 
 
 class LoxTest(TestCase):
 
+    engine = "tree"
+
+    def setUp(self: "LoxTest") -> None:
+        pylox.Lox.Lox.interpreter.engine = self.engine
+
+    def tearDown(self: "LoxTest") -> None:
+        pylox.Lox.Lox.interpreter.engine = Interpreter.engine
+
     def reset(self: "LoxTest") -> None:
         pylox.Lox.Lox.had_error = False
         pylox.Lox.Lox.had_runtime_error = False
 
+    def run_source(self: "LoxTest", source: str) -> str:
+        self.reset()
+        stdout = StringIO()
+        try:
+            with redirect_stdout(stdout):
+                pylox.Lox.Lox.run_from_string(source)
+            return stdout.getvalue()
+        finally:
+            stdout.close()
+
 
 class TestLox(LoxTest):
 
@@ -66,6 +94,61 @@ class TestLox(LoxTest):
         self.assertFalse(pylox.Lox.Lox.had_error)
         self.assertFalse(pylox.Lox.Lox.had_runtime_error)
 
+    def testMemoryMappedSourceFile(self: "TestLox") -> None:
+        source_file_path = test_data_dir_path / "language.lox"
+        expected = self.run_source(source_file_path.read_text())
+        self.reset()
+        stdout = StringIO()
+        pylox.Lox.Lox.memory_map = True
+        try:
+            with redirect_stdout(stdout):
+                pylox.Lox.Lox.run_file(source_file_path)
+            self.assertEqual(expected, stdout.getvalue())
+        finally:
+            pylox.Lox.Lox.memory_map = False
+            stdout.close()
+
+    def testInvalidUTF8SourceFile(self: "TestLox") -> None:
+        with TemporaryDirectory() as source_dir:
+            source_file_path = Path(source_dir) / "latin_1.lox"
+            source_file_path.write_bytes(b"print 1;\nprint \"caf\xe9\";")
+            errors = []
+            for memory_map in (False, True):
+                session = pylox.Session(memory_map=memory_map,
+                                        sink=pylox.ListSink())
+                with self.assertRaises(UnicodeDecodeError) as context:
+                    session.run_file(source_file_path)
+                errors.append(str(context.exception))
+                self.assertFalse(session.had_error)
+                self.assertEqual([], session.output.sink)
+        self.assertEqual(errors[0], errors[1])
+
+    def testProgramCache(self: "TestLox") -> None:
+        source = (test_data_dir_path / "language.lox").read_text()
+        expected = self.run_source(source)
+        with TemporaryDirectory() as cache_dir:
+            pylox.Lox.Lox.cache = pylox.ProgramCache(cache_dir)
+            try:
+                # The first run stores the program, the second loads it.
+                for _ in range(2):
+                    self.assertEqual(expected, self.run_source(source))
+                self.assertEqual(1, len(list(Path(cache_dir).iterdir())))
+                self.assertIsNotNone(
+                    pylox.Lox.Lox.cache.load(source,
+                                             pylox.Lox.Lox.interpreter))
+
+                # Optimized programs are kept apart from unoptimized ones.
+                self.assertIsNone(
+                    pylox.Lox.Lox.cache.load(source,
+                                             pylox.Lox.Lox.interpreter,
+                                             optimize=True))
+                pylox.Lox.Lox.optimize = True
+                self.assertEqual(expected, self.run_source(source))
+                self.assertEqual(2, len(list(Path(cache_dir).iterdir())))
+            finally:
+                pylox.Lox.Lox.cache = None
+                pylox.Lox.Lox.optimize = False
+
     def testInvalidBlockComment(self: "TestLox") -> None:
         self.reset()
         stdout = StringIO()
@@ -178,6 +261,83 @@ class TestLox(LoxTest):
         finally:
             stdout.close()
 
+    def testSessions(self: "TestLox") -> None:
+        self.reset()
+        first = pylox.Session(engine=self.engine)
+        second = pylox.Session(engine=self.engine)
+        stdout = StringIO()
+        try:
+            with redirect_stdout(stdout):
+                first.run("var a = \"first\";")
+                second.run("var a = 1;")
+                first.run("print a;")
+                second.run("print a + 1;")
+                second.run("print b;")
+                first.run("fun f() { return a; } print f();")
+            self.assertEqual(["first",
+                              "2",
+                              "Undefined variable 'b'.",
+                              "[line 1]",
+                              "first"],
+                             stdout.getvalue().splitlines())
+            self.assertFalse(first.had_runtime_error)
+            self.assertTrue(second.had_runtime_error)
+            self.assertFalse(pylox.Lox.Lox.had_runtime_error)
+        finally:
+            stdout.close()
+
+    def testOutputSink(self: "TestLox") -> None:
+        sink = pylox.ListSink()
+        session = pylox.Session(engine=self.engine, sink=sink)
+        session.output.limit = 8
+        session.run("for (var i = 0; i < 5; i = i + 1) print i;\n"
+                    "print \"done\" + 1;")
+        self.assertEqual(["0", "1", "2", "3", "4",
+                          "Operands must be two numbers or two strings.",
+                          "[line 2]"],
+                         sink)
+        self.assertTrue(session.had_runtime_error)
+
+        # Sinks with buffers of their own are flushed too.
+        raw = BytesIO()
+        session = pylox.Session(engine=self.engine,
+                                sink=TextIOWrapper(raw, encoding="utf-8"))
+        session.run("print 1;\nprint -nil;")
+        self.assertEqual(b"1\nOperand must be a number.\n[line 2]\n",
+                         raw.getvalue())
+
+    def testBatch(self: "TestLox") -> None:
+        names = ["language.lox", "scopes.lox", "missing.lox"]
+        with TemporaryDirectory() as batch_dir:
+            manifest = Path(batch_dir) / "manifest"
+            error = Path(batch_dir) / "error.lox"
+            manifest.write_text("# Scripts\n\n" + "\n".join(
+                str(test_data_dir_path / name) for name in names))
+            error.write_text("print -nil;")
+
+            # Scripts that break the interpreter only fail themselves.
+            latin_1 = Path(batch_dir) / "latin_1.lox"
+            latin_1.write_bytes("print \"caf\xe9\";".encode("latin-1"))
+            recursion = Path(batch_dir) / "recursion.lox"
+            recursion.write_text("print \"deep\";\n"
+                                 "fun f(n) { return f(n + 1); }\nf(0);")
+            results = list(run_batch([str(error),
+                                      str(latin_1),
+                                      str(recursion)]
+                                     + read_manifest(manifest),
+                                     workers=2,
+                                     engine=self.engine))
+        self.assertEqual([70, 65, 70, 0, 0, 66],
+                         [result.exit_code for result in results])
+        self.assertEqual("Operand must be a number.\n[line 1]\n",
+                         results[0].output)
+        self.assertTrue(results[1].output.startswith("Cannot decode"))
+        self.assertTrue(results[2].output.startswith("deep\n"))
+        for name, result in zip(names[:2], results[3:]):
+            self.assertEqual(
+                self.run_source((test_data_dir_path / name).read_text()),
+                result.output)
+
 
 class TestScanner(LoxTest):
 
@@ -245,6 +405,161 @@ class TestScanner(LoxTest):
         scanner.scan_tokens()
         self.assertFalse(pylox.Lox.Lox.had_error)
 
+    def scan(self: "TestScanner", scanner, source: str):
+        self.reset()
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            tokens = list(scanner(source))
+        return ([(token.token_type, token.lexeme, token.literal,
+                  token.line_number) for token in tokens],
+                stdout.getvalue())
+
+    def assertScannersAgree(self: "TestScanner", source: str) -> None:
+        expected = self.scan(lambda source: Scanner(source).scan_tokens(),
+                             source)
+        self.assertEqual(expected,
+                         self.scan(lambda source:
+                                       pylox.RegexScanner(source)
+                                       .scan_tokens(),
+                                   source))
+        self.assertEqual(expected,
+                         self.scan(lambda source:
+                                       pylox.MappedScanner(source.encode())
+                                       .scan_tokens(),
+                                   source))
+        self.assertEqual(expected,
+                         self.scan(lambda source:
+                                       pylox.ColumnarScanner(source)
+                                       .scan_tokens(),
+                                   source))
+
+        # Small chunks put lexemes across the boundaries between reads.
+        for chunk_size in [1, 2, 7, 1 << 16]:
+            self.assertEqual(expected,
+                             self.scan(lambda source:
+                                           pylox.StreamingScanner(
+                                               StringIO(source),
+                                               chunk_size),
+                                       source),
+                             "chunk size {}".format(chunk_size))
+
+    def testRegexScannerTestData(self: "TestScanner") -> None:
+        for source_file_path in sorted(test_data_dir_path.glob("*.lox")):
+            with self.subTest(source_file_path.name):
+                with source_file_path.open() as input_file:
+                    self.assertScannersAgree(input_file.read())
+
+    def testRegexScannerErrors(self: "TestScanner") -> None:
+        for source in ["\"multi\nline\" x",
+                       "\"unterminated\n",
+                       "/* unterminated\n block",
+                       "/* a */ b\nc",
+                       "/* a */ \t\nb /**/ /*/ */",
+                       "1.5 2. .5 3abc",
+                       "a @ é # b",
+                       "/* a */ é\n\"✓\" b",
+                       "a!=b<=c>=d==e!f=g // end",
+                       "/* a * / **\n*/ 12.75.5 b"]:
+            with self.subTest(source):
+                self.assertScannersAgree(source)
+
+    def testTokenStream(self: "TestScanner") -> None:
+        tokens = pylox.ColumnarScanner("print \"a\"\n+ 1.5;").scan_tokens()
+        self.assertEqual(6, len(tokens))
+        self.assertEqual(Token(TokenType.NUMBER, "1.5", 1.5, 2), tokens[3])
+        self.assertTrue(tokens.check(TokenType.PRINT))
+        tokens.advance()
+        self.assertEqual(Token(TokenType.STRING, "\"a\"", "a", 1),
+                         tokens.peek())
+
+        # The parser picks up wherever the stream's cursor is.
+        tree = pylox.Parser(tokens).parse()
+        self.assertIsInstance(tree[0], ExprOrStmt.Expression)
+        self.assertEqual(Token(TokenType.PLUS, "+", None, 2),
+                         tree[0].expression.operator)
+
+    def testNamesAreInterned(self: "TestScanner") -> None:
+        source = "var counter = 1; counter = counter + 1; print counter;"
+        for scanner in [Scanner(source), pylox.RegexScanner(source),
+                        pylox.MappedScanner(source.encode())]:
+            with self.subTest(type(scanner).__name__):
+                names = [token.lexeme for token in scanner.scan_tokens()
+                         if token.token_type == TokenType.IDENTIFIER]
+                self.assertEqual(4, len(names))
+                for name in names:
+                    self.assertIs(names[0], name)
+
+    def testParserPullsTokens(self: "TestScanner") -> None:
+        pulled = []
+
+        def tokens():
+            for token in Scanner("print 1;\nprint 2;").scan_tokens():
+                pulled.append(token)
+                yield token
+
+        parser = pylox.Parser(tokens())
+        parser.declaration()
+        self.assertEqual(["print", "1", ";", "print"],
+                         [token.lexeme for token in pulled])
+        self.assertEqual(1, len(parser.parse()))
+
+
+class TestIncrementalParser(LoxTest):
+
+    def interpret(self: "TestIncrementalParser", exprs_or_stmts) -> str:
+        stdout = StringIO()
+        try:
+            with redirect_stdout(stdout):
+                pylox.Lox.Lox.interpreter.interpret(exprs_or_stmts)
+            return stdout.getvalue()
+        finally:
+            stdout.close()
+
+    def testEdits(self: "TestIncrementalParser") -> None:
+        self.reset()
+        source = (test_data_dir_path / "scopes.lox").read_text()
+        parser = pylox.IncrementalParser(pylox.Lox.Lox.interpreter, source)
+        before = parser.exprs_or_stmts
+        start = source.index("set(5);")
+        after = parser.edit(start, start + len("set(5);"), "set(\n6);")
+        self.assertFalse(pylox.Lox.Lox.had_error)
+
+        # Only the declaration that was edited is new.
+        self.assertEqual([node is not before[i]
+                          for i, node in enumerate(after)],
+                         [i == 3 for i in range(len(before))])
+        output = self.interpret(after)
+        self.assertEqual(self.run_source(parser.source), output)
+
+    def testEditsAfterDeclarations(self: "TestIncrementalParser") -> None:
+        self.reset()
+        parser = pylox.IncrementalParser(pylox.Lox.Lox.interpreter,
+                                         "if (false) print 1;\n"
+                                         "print 2;\n"
+                                         "print 3;")
+        self.assertEqual("2\n3\n",
+                         self.interpret(parser.edit(20, 20, "else ")))
+        self.assertEqual(2, len(parser.exprs_or_stmts))
+
+        parser.edit(len(parser.source), len(parser.source), "\nprint (")
+        self.assertTrue(parser.had_error)
+        self.assertTrue(pylox.Lox.Lox.had_error)
+        parser.edit(len(parser.source), len(parser.source), "4);")
+        self.assertFalse(pylox.Lox.Lox.had_error)
+        self.assertEqual("2\n3\n4\n", self.interpret(parser.exprs_or_stmts))
+
+        # Reused declarations move down with the lines before them.
+        parser.edit(0, 0, "\n")
+        fresh = pylox.IncrementalParser(pylox.Lox.Lox.interpreter,
+                                        parser.source)
+        self.assertEqual(
+            *([node.line_number
+               for expr_or_stmt in exprs_or_stmts
+               for node in nodes(expr_or_stmt)
+               if isinstance(node, Literal)]
+              for exprs_or_stmts in (fresh.exprs_or_stmts,
+                                     parser.exprs_or_stmts)))
+
 
 class TestAstPrinter(TestCase):
 
@@ -255,3 +570,390 @@ class TestAstPrinter(TestCase):
                             Grouping(Literal(45.67)))
         self.assertEqual("(* (- 123) (group 45.67))",
                          AstPrinter().to_string(expression))
+
+    def testPrecedence(self):
+        tokens = Scanner("-1 - 2 * 3 / -4 - 5 < 6 == !(7 > 8) != 9;"
+                         ).scan_tokens()
+        expression = pylox.Parser(tokens).parse()[0].expression
+        self.assertEqual("(!= (== (< (- (- (- 1.0) (/ (* 2.0 3.0) (- 4.0))) "
+                         "5.0) 6.0) (! (group (> 7.0 8.0)))) 9.0)",
+                         AstPrinter().to_string(expression))
+
+    def testNodesAreSlotted(self):
+        tokens = Scanner("class A < B { m(a) { super.m(this.x = a); } }"
+                         "print -(1 + 2);").scan_tokens()
+        nodes = list(pylox.Parser(tokens).parse())
+        while nodes:
+            node = nodes.pop()
+            self.assertFalse(hasattr(node, "__dict__"), type(node).__name__)
+            for name in type(node).__slots__:
+                value = getattr(node, name)
+                for child in value if isinstance(value, list) else [value]:
+                    if isinstance(child, (ExprOrStmt.Expr, ExprOrStmt.Stmt)):
+                        nodes.append(child)
+        self.assertFalse(hasattr(tokens[0], "__dict__"))
+
+
+class TestInterpreter(LoxTest):
+
+    def testEveryNodeTypeHasHandler(self: "TestInterpreter") -> None:
+        for name, node_class in vars(ExprOrStmt).items():
+            if (not isinstance(node_class, type) or
+                node_class in (ExprOrStmt.Expr, ExprOrStmt.Stmt) or
+                not issubclass(node_class, (ExprOrStmt.Expr,
+                                            ExprOrStmt.Stmt))):
+                continue
+            base_name = "expr" if issubclass(node_class, ExprOrStmt.Expr) else "stmt"
+            method_name = "visit_{}_{}".format(name.lower(), base_name)
+            self.assertIn(method_name, vars(Interpreter),
+                          "{} has no handler".format(name))
+
+    def testSlotResolution(self: "TestInterpreter") -> None:
+        self.reset()
+        tokens = Scanner("{ var a = 1; var b = 2; { var c = a; print b; } }") \
+            .scan_tokens()
+        block = pylox.Parser(tokens).parse()[0]
+        interpreter = pylox.Lox.Lox.interpreter
+        pylox.Resolver.Resolver(interpreter).resolve_multi([block])
+        inner = block.exprs_or_stmts[2].exprs_or_stmts
+        self.assertEqual([interpreter.LOCAL, 0],
+                         inner[0].initializer.resolution)
+        self.assertEqual([interpreter.LOCAL, 1],
+                         inner[1].expression.resolution)
+        self.assertEqual([interpreter.LOCAL, 2],
+                         inner[0].resolution)
+
+    def testUpvalueResolution(self: "TestInterpreter") -> None:
+        self.reset()
+        tokens = Scanner("fun f(a) { var b; var c; "
+                         "fun g() { fun h() { return c + a; } } }") \
+            .scan_tokens()
+        f = pylox.Parser(tokens).parse()[0]
+        interpreter = pylox.Lox.Lox.interpreter
+        pylox.Resolver.Resolver(interpreter).resolve_multi([f])
+        g = f.body[2]
+        h = g.body[0]
+        self.assertEqual([interpreter.LOCAL, 1],
+                         f.body[0].resolution)
+        self.assertEqual([interpreter.CELL, 2],
+                         f.body[1].resolution)
+        self.assertEqual([0], f.layout.cell_slots)
+        self.assertEqual([(True, 2), (True, 0)],
+                         g.layout.upvalues)
+        self.assertEqual([(False, 0), (False, 1)],
+                         h.layout.upvalues)
+
+    def testClosuresOnlyHoldCapturedCells(self: "TestInterpreter") -> None:
+        output = self.run_source("var f;\n"
+                                 "fun make(big) {\n"
+                                 "  var count = 0;\n"
+                                 "  fun next() { count = count + 1; "
+                                 "return count; }\n"
+                                 "  return next;\n"
+                                 "}\n"
+                                 "f = make(\"unused\");\n"
+                                 "f(); print f();")
+        self.assertEqual("2", output.strip())
+        if self.engine != "vm":
+            f = pylox.Lox.Lox.interpreter._globals.get(
+                Token(TokenType.IDENTIFIER, "f", None, 1))
+            self.assertEqual([[2.0]], f._cells)
+
+    def testFlattenedMethodTable(self: "TestInterpreter") -> None:
+        output = self.run_source("class A { init(x) { this.x = x; } "
+                                 "get() { return this.x; } }\n"
+                                 "class B < A { get() { return 2; } }\n"
+                                 "class C < B {}\n"
+                                 "print C(1).get();")
+        self.assertEqual("2", output.strip())
+        klass = pylox.Lox.Lox.interpreter._globals.get(
+            Token(TokenType.IDENTIFIER, "C", None, 1))
+        self.assertEqual({}, klass.methods)
+        self.assertEqual({"init", "get"}, set(klass.method_table))
+        self.assertIs(klass.super_class.methods["get"],
+                      klass.find_method("get"))
+        self.assertIs(klass.find_method("init"), klass.initializer)
+        self.assertEqual(1, klass.arity)
+
+    def testInstanceShapes(self: "TestInterpreter") -> None:
+        output = self.run_source("class P { init(x, y) { this.x = x; "
+                                 "this.y = y; } }\n"
+                                 "var a = P(1, 2);\n"
+                                 "var b = P(3, 4);\n"
+                                 "var c = P(5, 6);\n"
+                                 "c.z = 7;\n"
+                                 "print a.x; print b.x; print c.z;")
+        self.assertEqual(["1", "3", "7"], output.split())
+        a, b, c = [pylox.Lox.Lox.interpreter._globals.get(
+                       Token(TokenType.IDENTIFIER, name, None, 1))
+                   for name in "abc"]
+        self.assertIs(a.shape, b.shape)
+        self.assertEqual({"x": 0, "y": 1}, a.shape.slots)
+        self.assertEqual([3.0, 4.0], b.values)
+        self.assertIs(a.shape.transitions["z"], c.shape)
+        self.assertEqual({"x": 5.0, "y": 6.0, "z": 7.0}, c.fields)
+
+    def testGlobalResolution(self: "TestInterpreter") -> None:
+        self.reset()
+        tokens = Scanner("var a = 1; print a; print undef;").scan_tokens()
+        stmts = pylox.Parser(tokens).parse()
+        interpreter = pylox.Lox.Lox.interpreter
+        pylox.Resolver.Resolver(interpreter).resolve_multi(stmts)
+        globals_ = interpreter._globals
+        self.assertEqual((interpreter.GLOBAL, globals_.index("a")),
+                         stmts[1].expression.resolution)
+        self.assertEqual((interpreter.GLOBAL, globals_.index("undef")),
+                         stmts[2].expression.resolution)
+        self.assertIs(UNDEFINED, globals_.slots[globals_.index("undef")])
+
+    def testLoop(self: "TestInterpreter") -> None:
+        self.reset()
+        stdout = StringIO()
+        try:
+            source = ("var total = 0;\n"
+                      "for (var i = 0; i < 10; i = i + 1) {\n"
+                      "  if (i > 4 and (i == 7) == false) total = total + i;\n"
+                      "}\n"
+                      "print total;")
+            with redirect_stdout(stdout):
+                pylox.Lox.Lox.run_from_string(source)
+            self.assertFalse(pylox.Lox.Lox.had_error)
+            self.assertFalse(pylox.Lox.Lox.had_runtime_error)
+            self.assertEqual("28", stdout.getvalue().strip())
+        finally:
+            stdout.close()
+
+    def testProgramsAreFreed(self: "TestInterpreter") -> None:
+
+        # Everything a program allocates, e.g., its AST and what was
+        # resolved for it, has to go with it, or a long-lived interpreter
+        # grows with every script it runs.
+        source = "fun f(a) { var b = a; return b; } f(1);"
+        self.run_source(source)
+        gc.collect()
+        objects = len(gc.get_objects())
+        for _ in range(10000):
+            pylox.Lox.Lox.run_from_string(source)
+        gc.collect()
+        self.assertFalse(pylox.Lox.Lox.had_runtime_error)
+        self.assertLess(len(gc.get_objects()) - objects, 100)
+
+    def testCountingLoop(self: "TestInterpreter") -> None:
+        interpreter = pylox.Lox.Lox.interpreter
+        loops = []
+        for source in ["for (var i = 0; i < 3; i = i + 1) print i;",
+                       "for (var i = 0; i < 3; i = i + 1) { fun f() { i; } }"]:
+            loop = pylox.Parser(Scanner(source).scan_tokens()).parse()[0]
+            pylox.Resolver.Resolver(interpreter).resolve_multi([loop])
+            loops.append(loop)
+        self.assertIsInstance(loops[0], ExprOrStmt.For)
+        self.assertEqual((0, 1.0), interpreter.counter(loops[0]))
+        self.assertIsNone(interpreter.counter(loops[1]))
+
+        output = self.run_source("for (var i = 6; i >= 0; i = i - 2) {\n"
+                                 "  if (i == 2) i = i - 1.5;\n"
+                                 "  print i;\n"
+                                 "}\n"
+                                 "for (var i = 0; i < 2; i = i + 1) i = \"a\";")
+        self.assertEqual(["6", "4", "0.5",
+                          "Operands must be two numbers or two strings.",
+                          "[line 5]"],
+                         output.splitlines())
+
+    def testOptimizer(self: "TestInterpreter") -> None:
+        tokens = Scanner("print 2 * (3 + 4);\n"
+                         "while (1 > 2) print \"never\";\n"
+                         "if (!nil) print -\"a\" + 1;").scan_tokens()
+        stmts = pylox.Optimizer(pylox.Lox.Lox.interpreter).optimize_multi(
+            pylox.Parser(tokens).parse())
+        self.assertEqual(2, len(stmts))
+        self.assertIsInstance(stmts[0].expression, Literal)
+        self.assertEqual(14.0, stmts[0].expression.value)
+        self.assertIsInstance(stmts[1], ExprOrStmt.Print)
+        self.assertIsInstance(stmts[1].expression.left, Unary)
+
+        source = "print 1 - 2 * 3;\nprint nil or \"b\";\nprint -\"a\";"
+        expected = self.run_source(source)
+        pylox.Lox.Lox.optimize = True
+        try:
+            self.assertEqual(expected, self.run_source(source))
+            self.assertTrue(pylox.Lox.Lox.had_runtime_error)
+        finally:
+            pylox.Lox.Lox.optimize = False
+
+    def testNatives(self: "TestInterpreter") -> None:
+        @pylox.native(2, "scale")
+        def scale(x, factor):
+            if not isinstance(factor, float):
+                raise PyloxRuntimeError("Factor must be a number.")
+            return x * factor
+
+        try:
+            sink = pylox.ListSink()
+            session = pylox.Session(engine=self.engine, sink=sink)
+            session.run("var words = split(\"a b c\", \" \");\n"
+                        "var counts = map();\n"
+                        "for (var i = 0; i < len(words); i = i + 1) {\n"
+                        "  set(counts, upper(get(words, i)), scale(i, 2));\n"
+                        "}\n"
+                        "print counts;\n"
+                        "print scale(1, 2, 3);")
+            session.run("print sqrt(pow(3, 2) + 16);\n"
+                        "print scale(2, \"x\");")
+            self.assertEqual(["{A: 0, B: 2, C: 4}",
+                              "Expected 2 arguments but got 3.",
+                              "[line 7]",
+                              "5",
+                              "Factor must be a number.",
+                              "[line 2]"],
+                             sink)
+
+            # Only numbers as Lox writes them convert.
+            del sink[:]
+            for text in ["12", "-1.5", "1_000", "inf", "nan", " 1e3 ",
+                         "1.", ".5", "1e3", "0x10", ""]:
+                session.run("print num(\"{}\");".format(text))
+            self.assertEqual(["12", "-1.5"] + ["nil"]*9, sink)
+        finally:
+            del natives["scale"]
+
+
+class TestEngines(LoxTest):
+
+    def assertEnginesAgree(self: "TestEngines", source: str) -> str:
+        outputs = {}
+        for engine in Interpreter.engines:
+            pylox.Lox.Lox.interpreter.engine = engine
+            outputs[engine] = (self.run_source(source),
+                               pylox.Lox.Lox.had_error,
+                               pylox.Lox.Lox.had_runtime_error)
+        expected = outputs[Interpreter.engine]
+        for engine, output in outputs.items():
+            self.assertEqual(expected, output,
+                             "{} engine differs".format(engine))
+        return expected[0]
+
+    def testTestData(self: "TestEngines") -> None:
+        for source_file_path in sorted(test_data_dir_path.glob("*.lox")):
+            with self.subTest(source_file_path.name):
+                with source_file_path.open() as input_file:
+                    self.assertEnginesAgree(input_file.read())
+
+    def testLanguage(self: "TestEngines") -> None:
+        with (test_data_dir_path / "language.lox").open() as input_file:
+            output = self.assertEnginesAgree(input_file.read())
+        self.assertEqual(["global", "global", "block", "2", "610", "-18.5",
+                          "concat", "fallback", "false", "true", "9",
+                          "A square", "square", "9", "Square",
+                          "Square instance", "<fn fib>", "4"],
+                         output.splitlines())
+
+    def testRuntimeErrors(self: "TestEngines") -> None:
+        for source in ["-\"hello\";",
+                       "1 + nil;",
+                       "print undefined;",
+                       "undefined = 1;",
+                       "var x = 1; x();",
+                       "fun f(a) {} f();",
+                       "var x = 1; print x.y;",
+                       "var x = 1; x.y = 2;",
+                       "class A {} A().missing;",
+                       "class A {} A().missing();",
+                       "fun f() { print \"f\"; }\nclass A {}\nA().missing(f());",
+                       "fun f() { print \"f\"; }\nnil.missing(f());",
+                       "class A { m(a) {} }\nA()\n.m(\n);",
+                       "var NotAClass = 1; class B < NotAClass {}",
+                       "var a = 1;\n\nprint a +\n  nil;",
+                       "fun f() {\n  return g();\n}\nfun g() {\n  return -\"x\";\n}\nf();",
+                       "class A {\n  m() {\n    return super.m();\n  }\n}\n"
+                       "class B < A {\n  m() {\n    return super.missing();\n  }\n}\n"
+                       "B().m();"]:
+            with self.subTest(source):
+                self.assertEnginesAgree(source)
+
+
+class TestVM(LoxTest):
+
+    def compile(self: "TestVM", source: str) -> "vm.VMFunction":
+        self.reset()
+        tokens = Scanner(source).scan_tokens()
+        exprs_or_stmts = pylox.Parser(tokens).parse()
+        self.assertFalse(pylox.Lox.Lox.had_error)
+        return (vm.Compiler(pylox.Lox.Lox.interpreter._globals)
+                .compile(exprs_or_stmts))
+
+    def testChunk(self: "TestVM") -> None:
+        function = self.compile("print 1 + 2;\nvar a = \"a\";")
+        ops = [line.split()[2] for line
+               in function.chunk.disassemble("test").splitlines()[1:]]
+        self.assertEqual(["CONSTANT", "CONSTANT", "ADD", "PRINT",
+                          "CONSTANT", "DEFINE_GLOBAL", "NIL", "RETURN"],
+                         ops)
+        self.assertEqual([1, 1, 1, 1, 2, 2],
+                         [function.chunk.lines[offset] for offset
+                          in (0, 3, 6, 7, 8, 11)])
+
+    def testUpvalues(self: "TestVM") -> None:
+        function = self.compile("{ var a = 1; fun f() { return a; } }")
+        closure = [constant for constant in function.chunk.constants
+                   if isinstance(constant, vm.VMFunction)][0]
+        self.assertEqual(1, closure.upvalue_count)
+        self.assertIn("CLOSE_UPVALUE",
+                      function.chunk.disassemble("test"))
+
+    def testStackOverflow(self: "TestVM") -> None:
+        pylox.Lox.Lox.interpreter.engine = "vm"
+        output = self.run_source("fun f() { f(); }\nf();")
+        self.assertTrue(pylox.Lox.Lox.had_runtime_error)
+        self.assertEqual("Stack overflow.\n[line 1]", output.strip())
+
+    def testCompileErrors(self: "TestVM") -> None:
+        pylox.Lox.Lox.interpreter.engine = "vm"
+        output = self.run_source(
+            "print \"start\";\n"
+            "fun f() {\n"
+            + "".join("  var v{} = {};\n".format(i, i) for i in range(300))
+            + "  print v299;\n}\nf();").splitlines()
+
+        # Nothing runs, and each error is on the line of its local.
+        self.assertTrue(pylox.Lox.Lox.had_error)
+        self.assertFalse(pylox.Lox.Lox.had_runtime_error)
+        self.assertNotIn("start", output)
+        self.assertEqual("[line 258] Error at 'v255': Too many local "
+                         "variables in function.",
+                         output[0])
+
+        # Upvalue indices are bytes too.
+        output = self.run_source(
+            "fun outer() {\n"
+            + "".join("  var a{} = {};\n".format(i, i) for i in range(200))
+            + "  fun middle() {\n"
+            + "".join("    var b{} = {};\n".format(i, i) for i in range(200))
+            + "    fun inner() {\n"
+            + "".join("      print a{};\n".format(i) for i in range(200))
+            + "".join("      print b{};\n".format(i) for i in range(200))
+            + "    }\n  }\n}").splitlines()
+        self.assertTrue(pylox.Lox.Lox.had_error)
+        self.assertEqual("[line 660] Error at 'b56': Too many closure "
+                         "variables in function.",
+                         output[0])
+
+
+class TestLoxClosureEngine(TestLox):
+
+    engine = "closure"
+
+
+class TestInterpreterClosureEngine(TestInterpreter):
+
+    engine = "closure"
+
+
+class TestLoxVMEngine(TestLox):
+
+    engine = "vm"
+
+
+class TestInterpreterVMEngine(TestInterpreter):
+
+    engine = "vm"
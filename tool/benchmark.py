@@ -0,0 +1,392 @@
+import argparse
+import time
+import tracemalloc
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+import pylox
+
+
+def loop_source(iterations: int) -> str:
+    """
+    A tight numeric loop, which is dominated by per-node dispatch in
+    the interpreter.
+    """
+
+    return ("var total = 0;\n"
+            "var i = 0;\n"
+            "while (i < {0}) {{\n"
+            "  if (i == i) total = total + i * 2 - (i / 2);\n"
+            "  i = i + 1;\n"
+            "}}\n"
+            "print total;\n".format(iterations))
+
+
+def fib_source(n: int) -> str:
+    """
+    Naive recursive Fibonacci, which is dominated by call overhead.
+    """
+
+    return ("fun fib(n) {{\n"
+            "  if (n < 2) return n;\n"
+            "  return fib(n - 1) + fib(n - 2);\n"
+            "}}\n"
+            "print fib({});\n".format(n))
+
+
+def locals_source(iterations: int) -> str:
+    """
+    A loop inside a function that reads and writes several locals at
+    different scope depths on every iteration.
+    """
+
+    return ("fun run() {{\n"
+            "  var a = 1;\n"
+            "  var b = 2;\n"
+            "  var sum = 0;\n"
+            "  {{\n"
+            "    var i = 0;\n"
+            "    while (i < {0}) {{\n"
+            "      var c = a + b;\n"
+            "      sum = sum + c - a - b + i;\n"
+            "      i = i + 1;\n"
+            "    }}\n"
+            "  }}\n"
+            "  return sum;\n"
+            "}}\n"
+            "print run();\n".format(iterations))
+
+
+def methods_source(iterations: int) -> str:
+    """
+    A loop that calls methods on an instance, which is dominated by
+    property lookup and bound-method creation.
+    """
+
+    return ("class Counter {{\n"
+            "  init() {{ this.count = 0; }}\n"
+            "  add(n) {{ this.count = this.count + n; }}\n"
+            "  get() {{ return this.count; }}\n"
+            "}}\n"
+            "fun run() {{\n"
+            "  var counter = Counter();\n"
+            "  var i = 0;\n"
+            "  while (i < {0}) {{\n"
+            "    counter.add(i);\n"
+            "    i = i + 1;\n"
+            "  }}\n"
+            "  return counter.get();\n"
+            "}}\n"
+            "print run();\n".format(iterations))
+
+
+def inheritance_source(iterations: int, depth: int = 20) -> str:
+    """
+    A loop that instantiates a class at the bottom of a deep hierarchy
+    and calls a method inherited from the top of it.
+    """
+
+    classes: str = "".join("class C{} < C{} {{}}\n".format(i + 1, i)
+                           for i in range(depth))
+    return ("class C0 {{\n"
+            "  init(n) {{ this.n = n; }}\n"
+            "  value() {{ return this.n; }}\n"
+            "}}\n"
+            "{1}"
+            "fun run() {{\n"
+            "  var sum = 0;\n"
+            "  var i = 0;\n"
+            "  while (i < {0}) {{\n"
+            "    sum = sum + C{2}(i).value();\n"
+            "    i = i + 1;\n"
+            "  }}\n"
+            "  return sum;\n"
+            "}}\n"
+            "print run();\n".format(iterations, classes, depth))
+
+
+def objects_source(iterations: int) -> str:
+    """
+    Builds a linked list of small instances, which keeps every one of
+    them alive until the end of the run.
+    """
+
+    return ("class Node {{\n"
+            "  init(value, next) {{\n"
+            "    this.value = value;\n"
+            "    this.next = next;\n"
+            "  }}\n"
+            "}}\n"
+            "fun run() {{\n"
+            "  var list = nil;\n"
+            "  var i = 0;\n"
+            "  while (i < {0}) {{\n"
+            "    list = Node(i, list);\n"
+            "    i = i + 1;\n"
+            "  }}\n"
+            "  return list.value;\n"
+            "}}\n"
+            "print run();\n".format(iterations))
+
+
+def parse_source(functions: int) -> str:
+    """
+    A large program of many small functions, for measuring the scanner
+    and parser and the size of the tree they build. It is only parsed,
+    never run.
+    """
+
+    return "".join("fun f{0}(a, b) {{\n"
+                   "  var c = a * {0} + b;\n"
+                   "  if (c > 10 and !(a == b)) {{\n"
+                   "    print \"big\";\n"
+                   "    c = c - 1;\n"
+                   "  }} else {{\n"
+                   "    while (c < 10) c = c + 1;\n"
+                   "  }}\n"
+                   "  return f{0}(c, a).field;\n"
+                   "}}\n".format(i) for i in range(functions))
+
+
+def natives_source(iterations: int) -> str:
+    """
+    A loop of calls to natives of the standard library, which is
+    dominated by the cost of a call.
+    """
+
+    return ("var items = list();\n"
+            "for (var i = 0; i < {}; i = i + 1) {{\n"
+            "  push(items, sqrt(abs(i - 10)));\n"
+            "}}\n"
+            "print len(items);\n".format(iterations))
+
+
+def print_source(lines: int) -> str:
+    """
+    A loop that does little but print, which is dominated by writing out
+    what it prints.
+    """
+
+    return ("for (var i = 0; i < {}; i = i + 1) print i;\n"
+            .format(lines))
+
+
+def run_source(source: str) -> float:
+    pylox.Lox.Lox.had_error = False
+    pylox.Lox.Lox.had_runtime_error = False
+    start: float = time.perf_counter()
+    pylox.Lox.Lox.run_from_string(source)
+    return time.perf_counter() - start
+
+
+def bench_natives(size: int) -> str:
+    elapsed: float = run_source(natives_source(size))
+    return ("{} iterations of 3 native calls: {:.3f}s ({:.2f}us/iteration)"
+            .format(size, elapsed, elapsed/size*1e6))
+
+
+def bench_print(size: int) -> str:
+    elapsed: float = run_source(print_source(size))
+    return ("{} lines printed: {:.3f}s ({:.2f}us/line)"
+            .format(size, elapsed, elapsed/size*1e6))
+
+
+def bench_loop(size: int) -> str:
+    elapsed: float = run_source(loop_source(size))
+    return ("{} loop iterations: {:.3f}s ({:.2f}us/iteration)"
+            .format(size, elapsed, elapsed/size*1e6))
+
+
+def bench_locals(size: int) -> str:
+    elapsed: float = run_source(locals_source(size))
+    return ("{} iterations: {:.3f}s ({:.2f}us/iteration)"
+            .format(size, elapsed, elapsed/size*1e6))
+
+
+def bench_methods(size: int) -> str:
+    elapsed: float = run_source(methods_source(size))
+    return ("{} method calls: {:.3f}s ({:.2f}us/call)"
+            .format(size, elapsed, elapsed/size*1e6))
+
+
+def bench_inheritance(size: int) -> str:
+    elapsed: float = run_source(inheritance_source(size))
+    return ("{} instances: {:.3f}s ({:.2f}us/instance)"
+            .format(size, elapsed, elapsed/size*1e6))
+
+
+def bench_objects(size: int) -> str:
+    tracemalloc.start()
+    try:
+        elapsed: float = run_source(objects_source(size))
+        peak: int = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return ("{} instances: {:.3f}s, {:.0f} bytes/instance at peak"
+            .format(size, elapsed, peak/size))
+
+
+def scan(source: str) -> Sequence[pylox.Token]:
+    return pylox.Lox.Lox.scanners[pylox.Lox.Lox.scanner](source).scan_tokens()
+
+
+def parse(source: str) -> List[pylox.ExprOrStmt.Stmt]:
+    return pylox.Parser(scan(source)).parse()
+
+
+def bench_scan(size: int) -> str:
+    source: str = parse_source(size)
+    start: float = time.perf_counter()
+    scan(source)
+    elapsed: float = time.perf_counter() - start
+
+    # As for "parse", the tokens are measured on a second, traced run.
+    tracemalloc.start()
+    try:
+        tokens: Sequence[pylox.Token] = scan(source)
+        retained: int = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return ("{:.2f}MB into {} tokens: {:.3f}s ({:.2f}MB/s), "
+            "{:.1f}MB retained"
+            .format(len(source)/2**20, len(tokens), elapsed,
+                    len(source)/2**20/elapsed, retained/2**20))
+
+
+def bench_parse(size: int) -> str:
+    source: str = parse_source(size)
+    start: float = time.perf_counter()
+    parse(source)
+    elapsed: float = time.perf_counter() - start
+
+    # Tracing slows allocation down a lot, so the tree is built again to
+    # measure its size rather than timing the traced run.
+    tracemalloc.start()
+    try:
+        tree: List[pylox.ExprOrStmt.Stmt] = parse(source)
+        retained: int = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return ("{} lines into {} statements: {:.3f}s, {:.1f}MB retained"
+            .format(source.count("\n"), len(tree), elapsed,
+                    retained/2**20))
+
+
+def scan_file(path: Path, memory_map: bool) -> Tuple[int, float, int]:
+    """
+    Scan a file, either read into a string or memory-mapped, discarding
+    the tokens. Returns the number of tokens, the time taken, and the
+    memory allocated to load the file.
+    """
+
+    start: float = time.perf_counter()
+    with path.open("rb" if memory_map else "r") as input_file:
+        tracemalloc.start()
+        try:
+            source: Union[str, mmap] = \
+                (mmap(input_file.fileno(), 0, access=ACCESS_READ)
+                 if memory_map else input_file.read())
+            loaded: int = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        scanner: pylox.RegexScanner = (pylox.MappedScanner(source)
+                                       if memory_map
+                                       else pylox.RegexScanner(source))
+        tokens: int = sum(1 for _ in scanner.lex())
+        if memory_map:
+            source.close()
+    return tokens, time.perf_counter() - start, loaded
+
+
+def bench_load(size: int) -> str:
+    chunk: str = parse_source(1000)
+    with TemporaryDirectory() as directory:
+        path: Path = Path(directory) / "load.lox"
+        with path.open("w") as output_file:
+            for _ in range(max(1, size*2**20 // len(chunk))):
+                output_file.write(chunk)
+        results: List[str] = []
+        memory_map: bool
+        for memory_map in [False, True]:
+            tokens, elapsed, loaded = scan_file(path, memory_map)
+            results.append("{} {:.3f}s ({:.1f}MB loaded)"
+                           .format("mmap" if memory_map else "read",
+                                   elapsed,
+                                   loaded/2**20))
+    return ("{}MB into {} tokens: {}"
+            .format(size, tokens, ", ".join(results)))
+
+
+def bench_fib(size: int) -> str:
+    elapsed: float = run_source(fib_source(size))
+    return "fib({}): {:.3f}s".format(size, elapsed)
+
+
+benchmarks: Dict[str, Callable[[int], str]] = {
+    "fib": bench_fib,
+    "inheritance": bench_inheritance,
+    "load": bench_load,
+    "locals": bench_locals,
+    "loop": bench_loop,
+    "methods": bench_methods,
+    "natives": bench_natives,
+    "objects": bench_objects,
+    "parse": bench_parse,
+    "print": bench_print,
+    "scan": bench_scan}
+default_sizes: Dict[str, int] = {"fib": 25,
+                                 "inheritance": 50000,
+                                 "load": 100,
+                                 "locals": 100000,
+                                 "loop": 100000,
+                                 "methods": 100000,
+                                 "natives": 100000,
+                                 "objects": 100000,
+                                 "parse": 2000,
+                                 "print": 100000,
+                                 "scan": 10000}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Run pylox benchmarks.")
+    parser.add_argument("benchmarks",
+                        nargs="*",
+                        metavar="BENCHMARK",
+                        help="Benchmarks to run: {} (default: all)."
+                             .format(", ".join(sorted(benchmarks))))
+    parser.add_argument("--size",
+                        type=int,
+                        default=None,
+                        help="Override the default problem size.")
+    parser.add_argument("--engine",
+                        choices=pylox.Interpreter.engines,
+                        default=pylox.Interpreter.engine,
+                        help="Execution engine to benchmark.")
+    parser.add_argument("--scanner",
+                        choices=sorted(pylox.Lox.Lox.scanners),
+                        default=pylox.Lox.Lox.scanner,
+                        help="Scanning engine to benchmark.")
+    parser.add_argument("--repeat",
+                        type=int,
+                        default=3,
+                        help="Number of times to run each benchmark.")
+    args = parser.parse_args(argv)
+    unknown: List[str] = sorted(set(args.benchmarks) - set(benchmarks))
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(unknown)))
+    pylox.Lox.Lox.interpreter.engine = args.engine
+    pylox.Lox.Lox.scanner = args.scanner
+
+    # What the benchmarks print is not of interest, only how long it takes.
+    pylox.Lox.Lox.output.sink = pylox.NullSink()
+    name: str
+    for name in args.benchmarks or sorted(benchmarks):
+        size: int = args.size or default_sizes[name]
+        for _ in range(args.repeat):
+            print("{}: {}".format(name, benchmarks[name](size)))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,8 @@ class GenerateAst:
         self.define_ast("ExprOrStmt",
                         ["Expr", "Stmt"],
                         [[("Assign", [("name", "Token"),
-                                      ("value", "Expr")]),
+                                      ("value", "Expr")],
+                                     [("resolution", "Optional[Resolution]")]),
                           ("Binary", [("left", "Expr"),
                                       ("operator", "Token"),
                                       ("right", "Expr")]),
@@ -20,29 +21,46 @@ class GenerateAst:
                                     ("paren", "Token"),
                                     ("arguments", "List[Union[Expr, \"Stmt\"]]")]),
                           ("Get", [("object", "Expr"),
-                                   ("name", "Token")]),
+                                   ("name", "Token")],
+                                  [("cache", "Optional[InlineCache]")]),
                           ("Grouping", [("expr_or_stmt", "Union[Expr, \"Stmt\"]")]),
-                          ("Literal", [("value", "Any")]),
+                          ("Literal", [("value", "Any")],
+                                     [("line_number", "Optional[int]")]),
                           ("Logical", [("left", "Expr"),
                                        ("operator", "Token"),
                                        ("right", "Expr")]),
                           ("Set", [("object", "Expr"),
                                    ("name", "Token"),
-                                   ("value", "Expr")]),
+                                   ("value", "Expr")],
+                                  [("cache", "Optional[InlineCache]")]),
                           ("Super", [("keyword", "Token"),
-                                     ("method", "Token")]),
-                          ("This", [("keyword", "Token")]),
+                                     ("method", "Token")],
+                                    [("resolution", "Optional[Resolution]"),
+                                     ("receiver", "Optional[Resolution]"),
+                                     ("cache", "Optional[InlineCache]")]),
+                          ("This", [("keyword", "Token")],
+                                   [("resolution", "Optional[Resolution]")]),
                           ("Unary", [("operator", "Token"),
                                      ("right", "Expr")]),
-                          ("Variable", [("name", "Token")])],
+                          ("Variable", [("name", "Token")],
+                                       [("resolution", "Optional[Resolution]")])],
                          [("Block", [("exprs_or_stmts", "List[Union[Expr, Stmt]]")]),
                           ("Expression", [("expression", "Union[Expr, Stmt]")]),
                           ("Class", [("name", "Token"),
                                      ("super_class", "Optional[Variable]"),
-                                     ("methods", "List[\"Function\"]")]),
+                                     ("methods", "List[\"Function\"]")],
+                                    [("resolution", "Optional[Resolution]"),
+                                     ("super_resolution",
+                                      "Optional[Resolution]")]),
+                          ("For", [("initializer", "Optional[Stmt]"),
+                                   ("condition", "Optional[Union[Expr, Stmt]]"),
+                                   ("increment", "Optional[Union[Expr, Stmt]]"),
+                                   ("body", "Stmt")]),
                           ("Function", [("name", "Token"),
                                         ("params", "List[Token]"),
-                                        ("body", "List[Union[Expr, Stmt]]")]),
+                                        ("body", "List[Union[Expr, Stmt]]")],
+                                       [("resolution", "Optional[Resolution]"),
+                                        ("layout", "Optional[Layout]")]),
                           ("If", [("condition", "Union[Expr, Stmt]",),
                                   ("then_branch", "Union[Expr, Stmt]"),
                                   ("else_branch", "Union[Expr, Stmt]")]),
@@ -50,17 +68,27 @@ class GenerateAst:
                           ("Return", [("keyword", "Token"),
                                       ("value", "Union[Expr, Stmt]")]),
                           ("Var", [("name", "Token"),
-                                   ("initializer", "Union[Expr, Stmt]")]),
+                                   ("initializer", "Union[Expr, Stmt]")],
+                                  [("resolution", "Optional[Resolution]")]),
                           ("While", [("condition", "Union[Expr, Stmt]"),
                                      ("body", "Stmt")])]],
-                         extra_imports=["from .Token import Token",
+                         extra_imports=["from .Environment import Layout, "
+                                        "Resolution",
+                                        "from .InlineCache import InlineCache",
+                                        "from .Token import Token",
                                         "from typing import List, Union"])
 
     def define_ast(self,
                    module_name: str,
                    base_class_names: List[str],
-                   classes_and_parameters_list: List[List[Tuple[str, List[Tuple[str, str]]]]],
+                   classes_and_parameters_list: List[List[Tuple]],
                    extra_imports : Optional[List[str]] = None) -> None:
+        """
+        Each class is given as ``(name, parameters)`` or as ``(name,
+        parameters, annotations)``, where ``annotations`` are attributes
+        that are not passed to the constructor but set to ``None`` and
+        filled in later, e.g., by the interpreter.
+        """
 
         path: Path = pylox_package_dir_path / "{}.py".format(module_name)
         with path.open("w") as file_:
@@ -69,14 +97,20 @@ class GenerateAst:
             for (base_class_name,
                  classes_and_parameters) in zip(base_class_names,
                                                 classes_and_parameters_list):
-                self.add_Visitor_class(base_class_name)
+                self.add_Visitor_class(base_class_name,
+                                       [sub_class_name
+                                        for sub_class_name, *_
+                                        in classes_and_parameters])
                 self.add_base_class(base_class_name)
 
                 # The AST classes.
-                for sub_class_name, parameters in classes_and_parameters:
+                for (sub_class_name,
+                     parameters,
+                     *annotations) in classes_and_parameters:
                     self.add_subclass(base_class_name,
                                       sub_class_name,
-                                      parameters)
+                                      parameters,
+                                      annotations[0] if annotations else [])
 
     def add_imports(self,
                     extra_imports : Optional[List[str]] = None) -> None:
@@ -89,7 +123,8 @@ class GenerateAst:
         self.print(imports_list)
 
     def add_Visitor_class(self,
-                          base_class_name: str) -> None:
+                          base_class_name: str,
+                          sub_class_names: List[str]) -> None:
         self.print("\n\nclass {0}Visitor:\n"
                    "\n"
                    "    def __str__(self) -> \"str\":\n"
@@ -98,24 +133,47 @@ class GenerateAst:
                    "    def visit(self, expr: \"{0}\") -> \"{0}Visitor\":\n"
                    "        return self".format(base_class_name))
 
+        # One method per node type so that ``accept`` can dispatch
+        # straight to the right handler. Visitors that only implement
+        # ``visit`` keep working through these defaults.
+        sub_class_name: str
+        for sub_class_name in sub_class_names:
+            self.print("\n"
+                       "    def {0}(self, {1}: \"{2}\") -> Optional[Any]:\n"
+                       "        return self.visit({1})"
+                       .format(self.visit_method_name(base_class_name,
+                                                      sub_class_name),
+                               base_class_name.lower(),
+                               sub_class_name))
+
     def add_base_class(self,
                        base_class_name: str) -> None:
         self.print("\n"
                    "\n"
                    "class {0}:\n"
                    "\n"
+                   "    __slots__ = ()\n"
+                   "\n"
                    "    def accept(self, visitor: {0}Visitor) -> Optional[Any]:\n"
                    "        return visitor.visit(self)".format(base_class_name))
 
     def add_subclass(self,
                      base_class_name: str,
                      sub_class_name: str,
-                     parameters: List[Tuple[str, str]]) -> None:
+                     parameters: List[Tuple[str, str]],
+                     annotations: List[Tuple[str, str]]) -> None:
         self.print("\n"
                    "\n"
                    "class {}({}):"
                    "\n"
                    .format(sub_class_name, base_class_name))
+
+        # Nodes are small and there can be a great many of them, so they
+        # do without a per-instance ``__dict__``.
+        slots: List[str] = ["\"{}\"".format(name)
+                             for name, _ in parameters + annotations]
+        self.print("    __slots__ = ({}{})\n"
+                   .format(", ".join(slots), "," if len(slots) == 1 else ""))
         parameter_name: str
         parameter_type: str
         for parameter in parameters:
@@ -124,6 +182,13 @@ class GenerateAst:
             self.print("    {}: {}"
                        .format(parameter_name,
                                parameter_type))
+        if annotations:
+            self.print("\n"
+                       "    # Filled in after parsing.")
+        for parameter_name, parameter_type in annotations:
+            self.print("    {}: {}"
+                       .format(parameter_name,
+                               parameter_type))
         self.print("\n"
                    "    def __init__(self, {}):"
                    .format(", ".join(["{}: {}".format(parameter, type_hint)
@@ -131,10 +196,19 @@ class GenerateAst:
         for parameter in parameters:
             parameter_name = parameter[0]
             self.print("        self.{0} = {0}".format(parameter_name))
+        for parameter_name, _ in annotations:
+            self.print("        self.{} = None".format(parameter_name))
         self.print("\n"
                    "    def accept(self, visitor: {}Visitor) -> Optional[Any]:\n"
-                   "        return visitor.visit(self)"
-                   .format(base_class_name))
+                   "        return visitor.{}(self)"
+                   .format(base_class_name,
+                           self.visit_method_name(base_class_name,
+                                                  sub_class_name)))
+
+    @staticmethod
+    def visit_method_name(base_class_name: str, sub_class_name: str) -> str:
+        return "visit_{}_{}".format(sub_class_name.lower(),
+                                    base_class_name.lower())
 
 
 def main():